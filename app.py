@@ -1,15 +1,14 @@
 from dotenv import load_dotenv
 import streamlit as st
-import os
 import time
 from src.config import Config
-from src.preprocessing import load_complaints, preprocess_dataset
-from src.indexer import ComplaintIndexer
-from src.retriever import ComplaintRetriever
+from src.retrieval_service import open_retriever
 from src.generator import BusinessAnswerGenerator
 from src.rag_pipeline import RAGPipeline
 from src.query_validator import QueryValidator
 from src.utils.logger import setup_logger
+from src.utils.timing import PhaseTimer
+from src.utils.metrics import REGISTRY, STAGE_SECONDS, Histogram, start_metrics_server
 
 # Load environment variables
 load_dotenv()
@@ -115,41 +114,35 @@ apply_custom_styling()
 def load_pipeline():
     """Load and initialize the RAG pipeline with caching"""
     try:
+        startup = PhaseTimer()
         config = Config.from_env()
-        
-        # 1. Load and preprocess data
-        # Note: Dynamic preprocessing happens inside the indexer/pipeline
-        df = load_complaints(config.DATA_PATH)
-        df_processed = preprocess_dataset(df)
-
-        # 2. Build or load index
-        indexer = ComplaintIndexer(config)
 
-        if not os.path.exists(config.VECTOR_STORE_PATH + ".index"):
-            indexer.build_index(df_processed)
-            indexer.save()
-        else:
-            indexer.load()
+        # 1. Shared retrieval server, or the saved index loaded here (built only when missing or out of date)
+        retriever = open_retriever(config, timer=startup)
 
-        # 3. Initialize pipeline components
-        retriever = ComplaintRetriever(indexer.model, indexer.index, indexer.metadatas)
-        generator = BusinessAnswerGenerator(config)
-        validator = QueryValidator(config)
-        
-        # 4. Initialize RAGPipeline
-        pipeline = RAGPipeline(retriever, generator, config)
+        # 2. Initialize pipeline components
+        with startup.phase("pipeline"):
+            generator = BusinessAnswerGenerator(config)
+            validator = QueryValidator(config)
+            
+            # 3. Initialize RAGPipeline
+            pipeline = RAGPipeline(retriever, generator, config)
         
-        return pipeline, config, validator
+        logger.info(f"Startup: {startup.report()}")
+        # Cached resource, so the endpoint starts once per server process
+        if config.METRICS_PORT:
+            start_metrics_server(config.METRICS_PORT, config.METRICS_HOST)
+        return pipeline, config, validator, startup.report()
         
     except Exception as e:
         st.error(f"Initialization Error: {str(e)}")
         logger.error(f"Pipeline initialization failed: {e}")
-        return None, None, None
+        return None, None, None, None
 
 # ---------------------------
 # UI Components
 # ---------------------------
-def render_sidebar(_config):
+def render_sidebar(_config, startup_report=None):
     """Render the sidebar with filters and info (Strict Professional)"""
     with st.sidebar:
         st.markdown("<h2 style='color: white;'>CrediTrust</h2>", unsafe_allow_html=True)
@@ -199,6 +192,8 @@ def render_sidebar(_config):
             Strict Professional Mode
             </div>
         """, unsafe_allow_html=True)
+        if startup_report:
+            st.caption(f"Startup: {startup_report}")
         
         # Build filters dictionary with only specified values
         filters = {}
@@ -221,30 +216,65 @@ def render_main_header():
         </div>
     """, unsafe_allow_html=True)
 
-def render_results(answer, chunks, processing_time):
-    """Render the analysis results with streaming effect and professional cards"""
+def render_theme_overview(cube, filters):
+    """Exact complaint counts by theme and month for the sidebar's product / market focus"""
+    if cube is None:
+        return
+    import pandas as pd
+    with st.expander("Complaint Volume by Theme", expanded=False):
+        total = cube.total(filters)
+        scope = ", ".join(filters.values()) if filters else "All products and markets"
+        st.markdown(f"<div class='metric-label'>{scope}</div><div class='metric-value'>{total:,} complaints</div>", unsafe_allow_html=True)
+        if not total:
+            return
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            themes = pd.Series(cube.theme_totals(filters), name="Complaints")
+            themes.index = [theme.replace('_', ' ').title() for theme in themes.index]
+            st.bar_chart(themes)
+        with col2:
+            monthly = pd.DataFrame({theme.replace('_', ' ').title(): cube.monthly(filters, theme)
+                                    for theme in list(cube.theme_totals(filters))[:4]})
+            monthly = monthly.drop(index="Unknown", errors="ignore")
+            st.line_chart(monthly)
+
+def render_results(answer, chunks, processing_time, first_token_time=None, stream=None, start_time=None):
+    """Render the analysis results, streaming the answer when a token stream is given"""
     st.markdown("### Strategic Analysis")
     
-    # Summary of retrieval
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown(f"<div class='metric-label'>Source Excerpts</div><div class='metric-value'>{len(chunks)}</div>", unsafe_allow_html=True)
-    with col2:
-        st.markdown(f"<div class='metric-label'>Response Latency</div><div class='metric-value'>{processing_time:.2f}s</div>", unsafe_allow_html=True)
-    with col3:
-        markets = set(c['metadata'].get('market', 'N/A') for c in chunks)
-        st.markdown(f"<div class='metric-label'>Geographic Scope</div><div class='metric-value'>{', '.join(markets)}</div>", unsafe_allow_html=True)
+    # Metrics are filled in once the answer has finished streaming
+    metrics_slot = st.empty()
     
     st.markdown("---")
     
-    # Simulated streaming for local feel if not using direct stream
-    # But since it's a generated answer, we just display it professionally
-    st.markdown(answer)
+    if stream is not None:
+        timings = {}
+        answer = st.write_stream(timed_stream(stream, start_time, timings))
+        processing_time = time.time() - start_time
+        first_token_time = timings.get('first_token', processing_time)
+    else:
+        st.markdown(answer)
+    
+    with metrics_slot.container():
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.markdown(f"<div class='metric-label'>Source Excerpts</div><div class='metric-value'>{len(chunks)}</div>", unsafe_allow_html=True)
+        with col2:
+            first_token = f"{first_token_time:.2f}s" if first_token_time is not None else "N/A"
+            st.markdown(f"<div class='metric-label'>Time to First Token</div><div class='metric-value'>{first_token}</div>", unsafe_allow_html=True)
+        with col3:
+            st.markdown(f"<div class='metric-label'>Response Latency</div><div class='metric-value'>{processing_time:.2f}s</div>", unsafe_allow_html=True)
+        with col4:
+            markets = set(c['metadata'].get('market', 'N/A') for c in chunks)
+            st.markdown(f"<div class='metric-label'>Geographic Scope</div><div class='metric-value'>{', '.join(markets)}</div>", unsafe_allow_html=True)
     
     st.markdown("---")
     st.markdown("### Retained Evidence")
     
     for i, chunk in enumerate(chunks):
+        # Comparison questions retrieve evidence per segment
+        segment = f"<span>Segment: {chunk['segment']}</span>" if chunk.get('segment') else ""
         st.markdown(f"""
             <div class="source-card">
                 <div style="display: flex; justify-content: space-between; margin-bottom: 0.5rem;">
@@ -258,9 +288,68 @@ def render_results(answer, chunks, processing_time):
                     <span>Product: {chunk['metadata'].get('product', 'N/A')}</span>
                     <span>Market: {chunk['metadata'].get('market', 'N/A')}</span>
                     <span>Channel: {chunk['metadata'].get('channel', 'N/A')}</span>
+                    {segment}
                 </div>
             </div>
         """, unsafe_allow_html=True)
+    
+    return answer, processing_time, first_token_time
+
+def render_diagnostics():
+    """Live per-stage latency and request counters of this process (also served on METRICS_PORT)"""
+    with st.expander("Diagnostics", expanded=False):
+        stages = [
+            {
+                "Stage": dict(labels)["stage"],
+                "Count": stats["count"],
+                "Mean ms": round(stats["mean"] * 1000, 1),
+                "p50 ms": round(stats["p50"] * 1000, 1),
+                "p95 ms": round(stats["p95"] * 1000, 1),
+                "p99 ms": round(stats["p99"] * 1000, 1),
+            }
+            for labels, stats in STAGE_SECONDS.summary().items()
+        ]
+        if not stages:
+            st.caption("No requests recorded yet.")
+            return
+        
+        st.markdown("**Stage latency** (slowest p95 first; estimated from histogram buckets)")
+        st.dataframe(sorted(stages, key=lambda row: row["p95 ms"], reverse=True), hide_index=True, use_container_width=True)
+        
+        distributions, values = [], []
+        for metric in REGISTRY.metrics():
+            if metric is STAGE_SECONDS:
+                continue
+            if isinstance(metric, Histogram):
+                for labels, stats in metric.summary().items():
+                    distributions.append({
+                        "Metric": metric.name + "".join(f" {name}={label}" for name, label in labels),
+                        "Count": stats["count"],
+                        "Mean": round(stats["mean"], 4),
+                        "p50": round(stats["p50"], 4),
+                        "p95": round(stats["p95"], 4),
+                    })
+            else:
+                for labels, value in metric.values().items():
+                    values.append({
+                        "Metric": metric.name + "".join(f" {name}={label}" for name, label in labels),
+                        "Value": value,
+                    })
+        
+        col1, col2 = st.columns([3, 2])
+        with col1:
+            st.markdown("**Distributions**")
+            st.dataframe(distributions, hide_index=True, use_container_width=True)
+        with col2:
+            st.markdown("**Counters and gauges**")
+            st.dataframe(values, hide_index=True, use_container_width=True)
+
+def timed_stream(stream, start_time, timings):
+    """Pass a token stream through, recording when the first piece arrived"""
+    for piece in stream:
+        if 'first_token' not in timings:
+            timings['first_token'] = time.time() - start_time
+        yield piece
 
 # ---------------------------
 # Main App Logic
@@ -274,16 +363,17 @@ def main():
         st.session_state.last_chunks = None
     
     # Load pipeline
-    rag_pipeline, config, validator = load_pipeline()
+    rag_pipeline, config, validator, startup_report = load_pipeline()
     
     if not rag_pipeline:
         return
     
     # Sidebar
-    filters = render_sidebar(config)
+    filters = render_sidebar(config, startup_report)
     
     # Header
     render_main_header()
+    render_theme_overview(rag_pipeline.theme_cube, filters)
     
     # Question Input
     query = st.text_input(
@@ -304,23 +394,29 @@ def main():
         if not is_valid:
             st.warning(validation_msg)
         else:
-            with st.spinner("Analyzing source data..."):
+            # Retrieval runs under the spinner; the answer then streams in as it is generated
+            with st.spinner("Retrieving source data..."):
                 start_time = time.time()
-                answer, chunks = rag_pipeline.run(query, config.TOP_K_RETRIEVAL, filters)
-                duration = time.time() - start_time
-                
-                st.session_state.last_answer = answer
-                st.session_state.last_chunks = chunks
-                st.session_state.last_duration = duration
-                
-                render_results(answer, chunks, duration)
+                stream, chunks = rag_pipeline.run_stream(query, config.TOP_K_RETRIEVAL, filters)
+            
+            answer, duration, first_token_time = render_results(
+                None, chunks, None, stream=stream, start_time=start_time
+            )
+            
+            st.session_state.last_answer = answer
+            st.session_state.last_chunks = chunks
+            st.session_state.last_duration = duration
+            st.session_state.last_first_token = first_token_time
     
     elif st.session_state.last_answer:
         render_results(
             st.session_state.last_answer, 
             st.session_state.last_chunks, 
-            st.session_state.last_duration
+            st.session_state.last_duration,
+            st.session_state.get('last_first_token')
         )
+    
+    render_diagnostics()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,40 @@
+import json
+import argparse
+
+def compare(baseline_path: str, candidate_path: str, threshold: float):
+    """Print per-stage p95 changes between two run_benchmarks.py reports; returns the regressions"""
+    with open(baseline_path) as f:
+        baseline = {r["chunks"]: r for r in json.load(f)["results"]}
+    with open(candidate_path) as f:
+        candidate = {r["chunks"]: r for r in json.load(f)["results"]}
+    
+    regressions = []
+    for chunks in sorted(set(baseline) & set(candidate)):
+        old, new = baseline[chunks], candidate[chunks]
+        print(f"\n{chunks} chunks")
+        print(f"{'metric':<22} {'baseline':>10} {'candidate':>10} {'change':>8}")
+        print("-" * 53)
+        
+        rows = [(f"{stage} p95 ms", old["latency"][stage]["p95_ms"], stats["p95_ms"], True)
+                for stage, stats in new["latency"].items() if stage in old["latency"]]
+        rows.append(("build chunks/s", old["build"]["chunks_per_sec"], new["build"]["chunks_per_sec"], False))
+        rows.append(("peak RSS MB", old["peak_rss_mb"], new["peak_rss_mb"], True))
+        
+        for name, before, after, lower_is_better in rows:
+            change = (after - before) / before if before else 0.0
+            worse = change > threshold if lower_is_better else change < -threshold
+            marker = "  <-- regression" if worse else ""
+            print(f"{name:<22} {before:>10.3f} {after:>10.3f} {change:>+8.1%}{marker}")
+            if worse:
+                regressions.append((chunks, name, change))
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diff two benchmark JSON reports")
+    parser.add_argument("baseline", help="Report from the reference commit")
+    parser.add_argument("candidate", help="Report from the commit under test")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change flagged as a regression")
+    args = parser.parse_args()
+    regressions = compare(args.baseline, args.candidate, args.threshold)
+    print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+    raise SystemExit(1 if regressions else 0)
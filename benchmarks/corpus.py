@@ -0,0 +1,111 @@
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Raw CFPB-style product names; map_product_to_group turns them into CrediTrust categories
+PRODUCTS = [
+    "Credit card or prepaid card",
+    "Payday loan, title loan, or personal loan",
+    "Buy now pay later (BNPL)",
+    "Checking or savings account",
+    "Money transfer, virtual currency, or money service",
+]
+MARKETS = ["Kenya", "Uganda", "Tanzania", "Rwanda"]
+CHANNELS = ["In-app", "Web", "Phone", "Email"]
+SEVERITIES = ["Low", "Medium", "High"]
+
+OPENINGS = [
+    "i was charged an annual fee that was never disclosed",
+    "my payment was marked late even though i paid before the due date",
+    "someone made unauthorized transactions on my account",
+    "customer service kept me on hold and never resolved the issue",
+    "my credit limit was decreased without any notice",
+    "the interest rate increased after the promotional period",
+    "my application was denied despite a good credit score",
+    "a money transfer to my family has been pending for days",
+    "the mobile app crashes every time i try to pay",
+    "i disputed a billing error and the chargeback was rejected",
+]
+DETAILS = [
+    "i contacted the bank several times",
+    "the representative said there was nothing they could do",
+    "i have all the receipts and statements",
+    "this has affected my credit report",
+    "i was told the issue would be escalated",
+    "no one has followed up with me since",
+    "the fees keep growing every month",
+    "i want a refund and an explanation",
+]
+
+class HashEmbeddingModel:
+    """Deterministic SentenceTransformer stand-in for large offline benchmarks.
+    
+    Each token hashes to a fixed random direction and a text embeds to the
+    normalized sum of its tokens, so texts sharing words land close together
+    at a tiny fraction of the cost of running MiniLM.
+    """
+    
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._token_vectors = {}
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+    
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self.dim), dtype='float32')
+        for row, text in enumerate(texts):
+            for token in text.lower().split():
+                embeddings[row] += self._token_vector(token)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+    
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._token_vectors.get(token)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dim).astype('float32')
+            self._token_vectors[token] = vector
+        return vector
+
+def make_corpus(num_complaints: int, seed: int = 42) -> pd.DataFrame:
+    """Synthetic preprocessed complaints, one chunk each at the default CHUNK_SIZE"""
+    rng = np.random.default_rng(seed)
+    openings = np.array(OPENINGS, dtype=object)[rng.integers(0, len(OPENINGS), num_complaints)]
+    first = np.array(DETAILS, dtype=object)[rng.integers(0, len(DETAILS), num_complaints)]
+    second = np.array(DETAILS, dtype=object)[rng.integers(0, len(DETAILS), num_complaints)]
+    
+    # A per-row reference number keeps every narrative (and its embedding) distinct
+    refs = pd.Series(rng.integers(0, 10 ** 9, num_complaints)).astype(str)
+    narratives = pd.Series(openings) + ". " + pd.Series(first) + ". " + pd.Series(second) + ". reference " + refs
+    
+    dates = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 5 * 365, num_complaints), unit="D")
+    return pd.DataFrame({
+        "Complaint ID": np.arange(1, num_complaints + 1),
+        "Product": np.array(PRODUCTS, dtype=object)[rng.integers(0, len(PRODUCTS), num_complaints)],
+        "market": np.array(MARKETS, dtype=object)[rng.integers(0, len(MARKETS), num_complaints)],
+        "Date received": dates.strftime("%Y-%m-%d"),
+        "severity": np.array(SEVERITIES, dtype=object)[rng.integers(0, len(SEVERITIES), num_complaints)],
+        "channel": np.array(CHANNELS, dtype=object)[rng.integers(0, len(CHANNELS), num_complaints)],
+        "cleaned_narrative": narratives,
+    })
+
+def make_questions(num_questions: int, seed: int = 7):
+    """Business questions, most of them naming a product and/or market so filters get exercised"""
+    rng = np.random.default_rng(seed)
+    topics = ["hidden fees", "late payments", "fraud", "customer service", "interest rates",
+              "credit limits", "application denials", "transfer delays", "app crashes", "disputes"]
+    products = ["credit card", "personal loan", "bnpl", "savings", "money transfer", None]
+    markets = MARKETS + [None]
+    questions = []
+    for _ in range(num_questions):
+        topic = topics[rng.integers(len(topics))]
+        product = products[rng.integers(len(products))]
+        market = markets[rng.integers(len(markets))]
+        question = f"What are the most common complaints about {topic}"
+        if product:
+            question += f" for {product} customers"
+        if market:
+            question += f" in {market}"
+        questions.append(question + "?")
+    return questions
@@ -0,0 +1,152 @@
+import os
+import sys
+import gc
+import json
+import time
+import resource
+import platform
+import argparse
+import subprocess
+from dataclasses import replace
+from datetime import datetime
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import Config
+from src.indexer import ComplaintIndexer
+from src.retriever import ComplaintRetriever
+from src.offline_generator import OfflineAnswerGenerator
+from src.rag_pipeline import RAGPipeline
+from benchmarks.corpus import HashEmbeddingModel, make_corpus, make_questions
+
+STAGES = ["validation", "embedding", "filtering", "search", "prompt_build", "generation", "end_to_end"]
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process so far (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+def percentiles(samples_ms):
+    return {
+        "p50_ms": float(np.percentile(samples_ms, 50)),
+        "p95_ms": float(np.percentile(samples_ms, 95)),
+        "p99_ms": float(np.percentile(samples_ms, 99)),
+        "mean_ms": float(np.mean(samples_ms)),
+    }
+
+def timed(timings, stage, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    timings[stage].append((time.perf_counter() - start) * 1000)
+    return result
+
+def benchmark_size(config, model, num_chunks: int, questions, k: int, generator_latency: float):
+    """Build an index over num_chunks synthetic chunks and time every pipeline stage"""
+    df = make_corpus(num_chunks)
+    
+    indexer = ComplaintIndexer(config, model=model)
+    gc.collect()
+    indexer.build_index(df)
+    build = dict(indexer.build_stats)
+    del df
+    
+    retriever = ComplaintRetriever(indexer.model, indexer.index, indexer.metadatas)
+    generator = OfflineAnswerGenerator(config, latency_seconds=generator_latency, first_token_seconds=0)
+    pipeline = RAGPipeline(retriever, generator, config)
+    
+    def validate(question):
+        pipeline.validator.validate_query(question)
+        return pipeline.validator.extract_filters(question)
+    
+    # Stage by stage, mirroring RAGPipeline._prepare / run
+    timings = {stage: [] for stage in STAGES}
+    for question in questions:
+        filters = timed(timings, "validation", validate, question)
+        
+        query_vector = timed(timings, "embedding", retriever.embed_query, question)
+        mask = timed(timings, "filtering", retriever._candidate_mask, filters)
+        distances, indices = timed(timings, "search", retriever._search,
+                                   np.array([query_vector], dtype='float32'), k, mask)
+        chunks = retriever._to_results(distances[0], indices[0])
+        prompt = timed(timings, "prompt_build", generator.build_prompt, chunks, question)
+        timed(timings, "generation", generator.generate_answer, prompt)
+        timed(timings, "end_to_end", pipeline.run, question, k)
+    
+    return {
+        "chunks": build["chunks"],
+        "build": {
+            "seconds": build["seconds"],
+            "chunks_per_sec": build["chunks_per_sec"],
+        },
+        "index_ntotal": int(indexer.index.ntotal),
+        "latency": {stage: percentiles(samples) for stage, samples in timings.items()},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def print_summary(result):
+    print(f"\n{result['chunks']} chunks: build {result['build']['seconds']:.1f}s "
+          f"({result['build']['chunks_per_sec']:.0f} chunks/s), peak RSS {result['peak_rss_mb']:.0f} MB")
+    print(f"{'stage':<14} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    print("-" * 44)
+    for stage, stats in result["latency"].items():
+        print(f"{stage:<14} {stats['p50_ms']:>9.3f} {stats['p95_ms']:>9.3f} {stats['p99_ms']:>9.3f}")
+
+def run(args):
+    # Nothing cached or persisted: every query and build does the full work
+    config = replace(Config.from_env(), INDEX_TYPE=args.index_type, QUERY_CACHE_SIZE=0, EMBEDDING_CACHE_PATH="")
+    if args.embedder == "hash":
+        model = HashEmbeddingModel()
+    else:
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
+    questions = make_questions(args.queries)
+    
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "settings": {
+            "index_type": args.index_type,
+            "embedder": args.embedder,
+            "queries": args.queries,
+            "k": args.k,
+            "generator_latency": args.generator_latency,
+        },
+        "results": [],
+    }
+    
+    # Sizes run smallest first, so the process-wide peak RSS is attributable to the current size
+    for num_chunks in sorted(args.sizes):
+        result = benchmark_size(config, model, num_chunks, questions, args.k, args.generator_latency)
+        report["results"].append(result)
+        print_summary(result)
+    
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline RAG benchmark with per-stage latency breakdown")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000],
+                        help="Corpus sizes in chunks (e.g. 10000 100000 1000000 5000000)")
+    parser.add_argument("--queries", type=int, default=200, help="Timed questions per size")
+    parser.add_argument("--k", type=int, default=5, help="Chunks retrieved per question")
+    parser.add_argument("--index-type", default="flat", help="INDEX_TYPE to benchmark")
+    parser.add_argument("--embedder", choices=["hash", "model"], default="hash",
+                        help="hash: deterministic stand-in (fast); model: the configured SentenceTransformer")
+    parser.add_argument("--generator-latency", type=float, default=0.0,
+                        help="Simulated LLM latency in seconds for the stub generator")
+    parser.add_argument("--output", default=f"benchmarks/results/{datetime.now():%Y%m%d_%H%M%S}.json",
+                        help="Where to write the JSON report")
+    run(parser.parse_args())
@@ -1,13 +1,17 @@
-import os
 import argparse
-from src.config import Config
-from src.preprocessing import load_complaints, preprocess_dataset
-from src.indexer import ComplaintIndexer
-from src.retriever import ComplaintRetriever
-from src.generator import BusinessAnswerGenerator
-from src.rag_pipeline import RAGPipeline
-from src.query_validator import QueryValidator
-from src.utils.logger import setup_logger
+from src.utils.timing import PhaseTimer
+
+# Heavy libraries (pandas, torch, google-genai, langchain) are imported on first use, not here
+startup = PhaseTimer()
+with startup.phase("imports"):
+    from src.config import Config
+    from src.retrieval_service import open_retriever
+    from src.generator import BusinessAnswerGenerator
+    from src.rag_pipeline import RAGPipeline
+    from src.query_validator import QueryValidator
+    from src.utils.logger import setup_logger
+    from src.utils.metrics import start_metrics_server
+    from src.utils.exceptions import IndexingError
 
 logger = setup_logger(__name__)
 
@@ -17,36 +21,40 @@ def main():
     parser.add_argument("--question", type=str, help="Business question to analyze")
     parser.add_argument("--product", type=str, help="Filter by product type")
     parser.add_argument("--market", type=str, help="Filter by market/country")
+    parser.add_argument("--date-from", type=str, metavar="YYYY-MM-DD", help="Only complaints received on or after this date")
+    parser.add_argument("--date-to", type=str, metavar="YYYY-MM-DD", help="Only complaints received on or before this date")
+    parser.add_argument("--ingest", type=str, metavar="CSV",
+                        help="Incrementally index new or changed complaints from a CSV drop")
+    parser.add_argument("--remove-complaints", nargs="+", metavar="ID",
+                        help="Remove complaints from the index by complaint ID")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="Print how long each startup phase took")
     args = parser.parse_args()
     
-    config = Config.from_env()
+    with startup.phase("config"):
+        config = Config.from_env()
+    
+    if args.ingest or args.remove_complaints:
+        update_index(config, args.ingest, args.remove_complaints)
+        return
     
     try:
-        # Load and preprocess data
-        logger.info("Loading and preprocessing CrediTrust complaint data...")
-        df = load_complaints(config.DATA_PATH)
-        df = preprocess_dataset(df)
+        # Shared retrieval server, or the saved index loaded here (built only when missing or out of date)
+        retriever = open_retriever(config, rebuild=args.rebuild_index, timer=startup)
         
-        # Initialize indexer
-        indexer = ComplaintIndexer(config)
-        
-        # Build or load index
-        if args.rebuild_index or not os.path.exists(config.VECTOR_STORE_PATH + ".index"):
-            logger.info("Building new business intelligence index...")
-            indexer.build_index(df)
-            indexer.save()
-        else:
-            logger.info("Loading existing business index...")
-            indexer.load()
-        
-        # Initialize retriever and generator
-        retriever = ComplaintRetriever(indexer.model, indexer.index, indexer.metadatas)
-        generator = BusinessAnswerGenerator(config)
-        
-        # Initialize validator WITH config parameter
-        validator = QueryValidator(config)  # ← FIXED: Pass config to validator
-        
-        rag = RAGPipeline(retriever, generator, config)
+        # Initialize generator
+        with startup.phase("pipeline"):
+            generator = BusinessAnswerGenerator(config)
+            
+            # Initialize validator WITH config parameter
+            validator = QueryValidator(config)  # ← FIXED: Pass config to validator
+            
+            rag = RAGPipeline(retriever, generator, config)
+        logger.info(f"Startup: {startup.report()}")
+        if config.METRICS_PORT:
+            start_metrics_server(config.METRICS_PORT, config.METRICS_HOST)
+        if args.startup_report:
+            print(f"⏱️  Startup: {startup.report()}")
         
         # Apply business filters if provided
         filters = {}
@@ -56,14 +64,20 @@ def main():
         if args.market:
             filters['market'] = args.market
             logger.info(f"Applying market filter: {args.market}")
+        if args.date_from:
+            filters['date_from'] = args.date_from
+        if args.date_to:
+            filters['date_to'] = args.date_to
+        if args.date_from or args.date_to:
+            logger.info(f"Applying date filter: {args.date_from or '...'} to {args.date_to or '...'}")
         
         # Interactive mode or single question
         if args.question:
-            answer, context_chunks = rag.run(args.question, config.TOP_K_RETRIEVAL, filters)
             print(f"\n🔍 **Business Question**: {args.question}")
+            stream, context_chunks = rag.run_stream(args.question, config.TOP_K_RETRIEVAL, filters)
             print("\n📈 **ANALYSIS RESULTS**")
             print("=" * 60)
-            print(answer)
+            answer = print_stream(stream)
             print("=" * 60)
             
             if context_chunks and "I couldn't find" not in answer and "error" not in answer.lower():
@@ -108,13 +122,20 @@ def main():
                         print(f"\n❌ {validation_msg}")
                         continue
                     
-                    # Run business analysis
-                    answer, context_chunks = rag.run(question, config.TOP_K_RETRIEVAL, filters)
+                    # Run business analysis, printing the answer as it is generated
+                    metrics = {}
+                    stream, context_chunks = rag.run_stream(question, config.TOP_K_RETRIEVAL, filters, metrics)
                     
                     print(f"\n📈 **ANALYSIS RESULTS**")
                     print("=" * 60)
-                    print(answer)
+                    answer = print_stream(stream)
                     print("=" * 60)
+                    if metrics.get("time_to_first_token") is not None:
+                        print(f"⏱️  First token: {metrics['time_to_first_token']:.2f}s, "
+                              f"generation: {metrics['generation_time']:.2f}s")
+                    if "rerank_time" in metrics:
+                        print(f"⏱️  Rerank: {metrics['rerank_time'] * 1000:.0f}ms "
+                              f"({metrics['rerank_scored']}/{metrics['rerank_candidates']} candidates)")
                     
                     if context_chunks and "I couldn't find" not in answer and "error" not in answer.lower():
                         print(f"\n📋 **Source Data**: {len(context_chunks)} complaint excerpts analyzed")
@@ -141,6 +162,41 @@ def main():
         logger.error(f"CrediTrust application failed: {e}")
         print(f"❌ Application error: {e}")
 
+def print_stream(stream):
+    """Print answer pieces as they arrive and return the full answer"""
+    pieces = []
+    for piece in stream:
+        print(piece, end="", flush=True)
+        pieces.append(piece)
+    print()
+    return "".join(pieces)
+
+def update_index(config, csv_path=None, remove_ids=None):
+    """Apply an incremental update to the existing index instead of rebuilding it"""
+    from src.indexer import ComplaintIndexer
+    try:
+        if config.SHARD_COUNT > 1:
+            raise IndexingError(f"Incremental updates of a sharded index (SHARD_COUNT={config.SHARD_COUNT}) are not "
+                                f"supported; update DATA_PATH and restart, or rebuild with --rebuild-index")
+        indexer = ComplaintIndexer(config)
+        indexer.load()
+        
+        # Both update the index manifest, so the next start sees the new fingerprint and counts
+        if remove_ids:
+            removed = indexer.remove_and_record(remove_ids)
+            print(f"🗑️  Removed {removed} chunks for {len(remove_ids)} complaint IDs")
+        
+        if csv_path:
+            logger.info(f"Diffing {csv_path} against indexed complaints...")
+            stats = indexer.ingest(csv_path)
+            print(f"📥 New: {stats['new']}, Changed: {stats['changed']}, Unchanged: {stats['unchanged']}, "
+                  f"Skipped: {stats['skipped']}")
+            print(f"   Chunks added: {stats['chunks_added']}, chunks superseded: {stats['chunks_removed']}")
+    
+    except Exception as e:
+        logger.error(f"Incremental index update failed: {e}")
+        print(f"❌ Index update failed: {e}")
+
 def show_available_filters(metadatas):
     """Show available business filter options"""
     products = set()
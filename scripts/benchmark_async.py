@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import itertools
+from dataclasses import replace
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import Config
+from src.indexer import ComplaintIndexer
+from src.retriever import ComplaintRetriever
+from src.offline_generator import OfflineAnswerGenerator
+from src.rag_pipeline import RAGPipeline
+
+TEMPLATES = [
+    "What are the top complaints about {product} in {market}?",
+    "What payment processing issues are customers reporting for {product} in {market}?",
+    "Analyze customer service complaint patterns for {product} in {market}",
+    "What fraud signals appear in {product} complaints from {market}?",
+]
+
+def make_questions(config, count: int):
+    """Distinct questions spread over products and markets"""
+    combos = list(itertools.product(TEMPLATES, config.PRODUCTS, config.MARKETS))
+    questions = []
+    for i in range(count):
+        template, product, market = combos[i % len(combos)]
+        question = template.format(product=product.lower(), market=market)
+        # Keep questions distinct once every combination has been used
+        questions.append(question if i < len(combos) else f"{question} (variant {i})")
+    return questions
+
+def benchmark(args):
+    # Result cache off, so every question does the full retrieval + generation work
+    config = replace(Config.from_env(), QUERY_CACHE_SIZE=0, ASYNC_MAX_CONCURRENCY=args.concurrency)
+    indexer = ComplaintIndexer(config)
+    indexer.load()
+    retriever = ComplaintRetriever(indexer.model, indexer.index, indexer.metadatas,
+                                   sparse_index=indexer.sparse_index,
+                                   hybrid_candidates=config.HYBRID_CANDIDATES, rrf_k=config.RRF_K)
+    generator = OfflineAnswerGenerator(config, latency_seconds=args.latency)
+    pipeline = RAGPipeline(retriever, generator, config)
+    questions = make_questions(config, args.questions)
+    
+    start = time.perf_counter()
+    for question in questions:
+        pipeline.run(question, args.k)
+    sequential = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    asyncio.run(pipeline.arun_many(questions, args.k))
+    concurrent = time.perf_counter() - start
+    
+    print(f"\n{len(questions)} questions, {args.latency}s simulated LLM latency, concurrency {args.concurrency}")
+    print(f"{'mode':<12} {'total s':>9} {'q/s':>8}")
+    print("-" * 31)
+    print(f"{'run':<12} {sequential:>9.2f} {len(questions) / sequential:>8.2f}")
+    print(f"{'arun_many':<12} {concurrent:>9.2f} {len(questions) / concurrent:>8.2f}")
+    print(f"\nSpeedup: {sequential / concurrent:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sequential and async pipeline throughput with an offline LLM")
+    parser.add_argument("--questions", type=int, default=40, help="Number of questions")
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated LLM latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=8, help="Generator calls in flight")
+    parser.add_argument("--k", type=int, default=5, help="Chunks retrieved per question")
+    benchmark(parser.parse_args())
@@ -0,0 +1,85 @@
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import subprocess
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+BACKENDS = ("torch", "onnx-fp32", "onnx-int8")
+
+QUERIES = [
+    "What are the top complaints about BNPL in Kenya?",
+    "What emerging issues are we seeing with mobile money transfers?",
+    "Analyze complaint trends for credit cards in Uganda",
+    "What payment processing issues are customers reporting?",
+    "Compare complaint themes between Kenya and Tanzania",
+    "What regulatory concerns are emerging from complaints?",
+    "Identify potential fraud patterns from complaints",
+    "chargeback APR dispute",
+]
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+def run_worker(backend: str, num_queries: int):
+    """Measure one backend in a fresh process, so load time and memory are its own"""
+    import numpy as np
+    from src.config import Config
+    
+    config = Config.from_env()
+    start = time.perf_counter()
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(config.EMBEDDING_MODEL_NAME, device="cpu")
+    else:
+        from src.onnx_encoder import OnnxSentenceEncoder
+        model = OnnxSentenceEncoder(config.ONNX_MODEL_DIR, quantized=backend == "onnx-int8",
+                                    num_threads=config.ONNX_THREADS)
+    load_seconds = time.perf_counter() - start
+    
+    # Warm up, then one query at a time as ComplaintRetriever.embed_query does
+    model.encode([QUERIES[0]])
+    latencies = []
+    for i in range(num_queries):
+        start = time.perf_counter()
+        model.encode([QUERIES[i % len(QUERIES)]])
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    print(json.dumps({
+        "backend": backend,
+        "load_s": load_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "peak_rss_mb": peak_rss_mb(),
+    }))
+
+def benchmark(args):
+    print(f"{'backend':<10} {'load s':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak RSS MB':>12}")
+    print("-" * 50)
+    for backend in args.backends:
+        result = subprocess.run(
+            [sys.executable, __file__, "--worker", backend, "--queries", str(args.queries)],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            print(f"{backend:<10} failed: {result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'unknown error'}")
+            continue
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        print(f"{backend:<10} {stats['load_s']:>8.2f} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+              f"{stats['peak_rss_mb']:>12.0f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-query latency, load time and memory of the query encoder backends")
+    parser.add_argument("--queries", type=int, default=200, help="Timed single-query encodes")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--worker", choices=BACKENDS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        run_worker(args.worker, args.queries)
+    else:
+        benchmark(args)
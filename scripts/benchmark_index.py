@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import argparse
+from dataclasses import replace
+
+import faiss
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import Config
+from src.vector_index import INDEX_TYPES, INDEX_STORAGE, create_index, train_index
+
+def load_vectors(config, num_vectors: int, dim: int, seed: int = 42) -> np.ndarray:
+    """Use the vectors of the saved flat index if present, otherwise a synthetic clustered corpus"""
+    index_path = config.VECTOR_STORE_PATH + ".index"
+    if os.path.exists(index_path):
+        index = faiss.read_index(index_path)
+        if isinstance(index, faiss.IndexFlat):
+            n = min(num_vectors, index.ntotal)
+            print(f"Using {n} vectors from {index_path}")
+            return index.reconstruct_n(0, n)
+    
+    print(f"Generating {num_vectors} synthetic {dim}-d vectors")
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, num_vectors // 500), dim)).astype('float32')
+    vectors = centers[rng.integers(0, len(centers), num_vectors)]
+    vectors += 0.3 * rng.normal(size=vectors.shape).astype('float32')
+    # MiniLM embeddings are unit-normalized
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def recall_at_k(ground_truth: np.ndarray, retrieved: np.ndarray) -> float:
+    """Fraction of the exact top-k neighbours found by the approximate search"""
+    hits = sum(len(set(gt) & set(r[r >= 0])) for gt, r in zip(ground_truth, retrieved))
+    return hits / ground_truth.size
+
+def benchmark(args):
+    config = Config.from_env()
+    vectors = load_vectors(config, args.num_vectors, args.dim)
+    rng = np.random.default_rng(7)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.05 * rng.normal(size=queries.shape).astype('float32')
+    
+    ground_truth = None
+    print(f"\n{'index':<10} {'storage':<8} {'build s':>8} {'MB':>9} {'B/vec':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(args.k):>10}")
+    print("-" * 76)
+    
+    # Full-precision flat first: its results are the ground truth
+    runs = [("flat", "float32")] + [(t, storage) for t in args.types for storage in args.storage
+                                    if (t, storage) != ("flat", "float32")
+                                    and (t != "ivf_pq" or storage == "float32")]
+    for index_type, storage in runs:
+        run_config = replace(config, INDEX_TYPE=index_type, INDEX_STORAGE=storage)
+        
+        start = time.perf_counter()
+        index = create_index(vectors.shape[1], run_config, len(vectors))
+        train_index(index, vectors, run_config)
+        index.add(vectors)
+        build_time = time.perf_counter() - start
+        
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+        
+        # One query at a time, as the retriever issues them
+        latencies = []
+        retrieved = np.empty((len(queries), args.k), dtype=np.int64)
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            _, indices = index.search(query.reshape(1, -1), args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            retrieved[i] = indices[0]
+        
+        if ground_truth is None:
+            ground_truth = retrieved
+        
+        print(f"{index_type:<10} {storage:<8} {build_time:>8.2f} {size_mb:>9.1f} {size_mb * 1e6 / len(vectors):>7.0f} "
+              f"{np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 95):>8.3f} "
+              f"{recall_at_k(ground_truth, retrieved):>10.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare FAISS index modes against the flat baseline")
+    parser.add_argument("--num-vectors", type=int, default=200000, help="Corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension for synthetic vectors")
+    parser.add_argument("--queries", type=int, default=500, help="Number of timed queries")
+    parser.add_argument("--k", type=int, default=5, help="Neighbours per query")
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES,
+                        help="Index types to compare with flat")
+    parser.add_argument("--storage", nargs="+", default=list(INDEX_STORAGE), choices=INDEX_STORAGE,
+                        help="Vector storage modes to try with each index type (ivf_pq only runs float32)")
+    benchmark(parser.parse_args())
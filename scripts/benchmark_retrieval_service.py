@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+import argparse
+import threading
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import Config
+from src.retrieval_service import RetrievalClient
+from scripts.benchmark_async import make_questions
+
+def run_clients(url: str, questions, clients: int, k: int):
+    """Send every question once, spread over `clients` concurrent threads; returns per-request latencies"""
+    latencies = [[] for _ in range(clients)]
+    
+    def worker(slot: int):
+        client = RetrievalClient(url)
+        for question in questions[slot::clients]:
+            start = time.perf_counter()
+            client.retrieve_chunks(question, k)
+            latencies[slot].append(time.perf_counter() - start)
+    
+    threads = [threading.Thread(target=worker, args=(slot,)) for slot in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, np.concatenate([np.array(l) for l in latencies])
+
+def benchmark(args):
+    config = Config.from_env()
+    url = args.url or config.RETRIEVAL_SERVICE_URL or f"http://{config.RETRIEVAL_SERVICE_HOST}:{config.RETRIEVAL_SERVICE_PORT}"
+    questions = make_questions(config, args.questions)
+    probe = RetrievalClient(url)
+    
+    print(f"\n{len(questions)} retrievals against {url}, k={args.k}")
+    print(f"{'clients':>8} {'total s':>9} {'q/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'batch':>7}")
+    print("-" * 54)
+    for clients in args.clients:
+        before = probe.health()
+        total, latencies = run_clients(url, questions, clients, args.k)
+        after = probe.health()
+        # Mean size of the micro-batches formed during this run
+        batches = after["batches"] - before["batches"]
+        batch_size = (after["requests"] - before["requests"]) / batches if batches else float("nan")
+        print(f"{clients:>8} {total:>9.2f} {len(questions) / total:>9.1f} "
+              f"{np.percentile(latencies, 50) * 1000:>8.1f} {np.percentile(latencies, 95) * 1000:>8.1f} {batch_size:>7.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of the retrieval server as concurrent clients grow")
+    parser.add_argument("--url", help="Server URL (default: RETRIEVAL_SERVICE_URL or the configured host/port)")
+    parser.add_argument("--questions", type=int, default=400, help="Retrievals per run")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="Concurrent client threads to try")
+    parser.add_argument("--k", type=int, default=5, help="Chunks retrieved per question")
+    benchmark(parser.parse_args())
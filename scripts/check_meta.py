@@ -1,13 +1,20 @@
-import pickle
-from collections import Counter
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import Config
+from src.metadata_store import MetadataStore
 
 def check_meta():
     try:
-        with open('vector_store/credtrust_bi_index_meta.pkl', 'rb') as f:
-            meta = pickle.load(f)
+        config = Config.from_env()
+        meta = MetadataStore.load(config.VECTOR_STORE_PATH + "_meta")
         
-        markets = Counter(m['market'] for m in meta)
-        products = Counter(m['product'] for m in meta)
+        # Distributions come straight from the dictionary-encoded columns
+        markets = meta.value_counts('market')
+        products = meta.value_counts('product')
         
         print("\n--- Metadata Distribution ---")
         print(f"Total Chunks: {len(meta)}")
@@ -0,0 +1,63 @@
+import os
+import sys
+import argparse
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import Config
+from src.onnx_encoder import INFO_FILE, OnnxSentenceEncoder, export_onnx_encoder
+
+SAMPLE_TEXTS = [
+    "What are the top complaints about BNPL in Kenya?",
+    "Identify recurring patterns in money transfer delays in Uganda.",
+    "i was charged an annual fee that was never disclosed when i opened the credit card",
+    "someone made unauthorized transactions on my account and the bank refused to refund me",
+    "customer service kept me on hold for hours and never resolved the chargeback dispute",
+    "my personal loan application was denied despite a good credit score",
+    "the mobile app crashes every time i try to make a payment",
+    "APR",
+    "",
+]
+
+def sample_texts(config, limit: int):
+    """Fixed probe sentences plus stored chunk texts when an index exists"""
+    texts = list(SAMPLE_TEXTS)
+    meta_path = config.VECTOR_STORE_PATH + "_meta"
+    if os.path.isdir(meta_path):
+        from src.metadata_store import MetadataStore
+        store = MetadataStore.load(meta_path)
+        rows = np.random.default_rng(0).choice(len(store), min(limit, len(store)), replace=False)
+        texts.extend(store.text(int(i)) for i in rows)
+    return texts
+
+def check_parity(args) -> bool:
+    config = Config.from_env()
+    if not os.path.exists(os.path.join(config.ONNX_MODEL_DIR, INFO_FILE)):
+        export_onnx_encoder(config.EMBEDDING_MODEL_NAME, config.ONNX_MODEL_DIR)
+    
+    from sentence_transformers import SentenceTransformer
+    texts = sample_texts(config, args.samples)
+    reference = SentenceTransformer(config.EMBEDDING_MODEL_NAME, device="cpu").encode(texts, batch_size=32)
+    reference /= np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    
+    passed = True
+    for quantized in (False, True):
+        encoder = OnnxSentenceEncoder(config.ONNX_MODEL_DIR, quantized=quantized)
+        cosine = (encoder.encode(texts, batch_size=32) * reference).sum(axis=1)
+        ok = cosine.min() >= args.min_cosine
+        passed &= ok
+        print(f"{'int8' if quantized else 'fp32':<5} texts={len(texts)} mean cos={cosine.mean():.5f} "
+              f"min cos={cosine.min():.5f} (threshold {args.min_cosine}) {'PASS' if ok else 'FAIL'}")
+        if not ok:
+            worst = int(np.argmin(cosine))
+            print(f"      worst: {texts[worst][:80]!r}")
+    return passed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cosine agreement of the ONNX encoders with the torch SentenceTransformer")
+    parser.add_argument("--samples", type=int, default=500, help="Stored chunks to compare, besides the probe sentences")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="Lowest acceptable cosine similarity")
+    sys.exit(0 if check_parity(parser.parse_args()) else 1)
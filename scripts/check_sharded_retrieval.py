@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import argparse
+from dataclasses import replace
+
+import numpy as np
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import Config
+from src.indexer import ComplaintIndexer
+from src.retriever import ComplaintRetriever
+from src.sharded_retriever import ShardedComplaintRetriever
+from src.retrieval_metrics import make_known_item_queries, chunk_overlap
+
+def check_sharding(args) -> bool:
+    """Shard the saved index's dataset into local worker processes and compare with the single index"""
+    config = replace(Config.from_env(), SHARD_COUNT=0)
+    indexer = ComplaintIndexer(config)
+    indexer.load_or_build()
+    single = ComplaintRetriever(indexer.model, indexer.index, indexer.metadatas,
+                                sparse_index=indexer.sparse_index,
+                                hybrid_candidates=config.HYBRID_CANDIDATES, rrf_k=config.RRF_K)
+    
+    shard_config = replace(config, VECTOR_STORE_PATH=config.VECTOR_STORE_PATH + "_check",
+                           SHARD_COUNT=args.shards, SHARD_BY=args.shard_by, INDEX_AUTO_REBUILD=True)
+    ComplaintIndexer(shard_config, model=indexer.model).load_or_build()
+    
+    # Unfiltered only: without a market column in the data, markets are simulated independently per build
+    queries = make_known_item_queries(indexer.metadatas, args.queries)
+    overlap, same_scores, single_ms, sharded_ms = 0.0, 0, 0.0, 0.0
+    with ShardedComplaintRetriever(indexer.model, shard_config) as sharded:
+        for query in queries:
+            vector = single.embed_query(query["question"])
+            start = time.perf_counter()
+            expected = single.retrieve_chunks(query["question"], args.k, query_vector=vector)
+            single_ms += (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            merged = sharded.retrieve_chunks(query["question"], args.k, query_vector=vector)
+            sharded_ms += (time.perf_counter() - start) * 1000
+            overlap += chunk_overlap(expected, merged)
+            # Compared by score as well: chunks tied on distance may come back in either order
+            same_scores += np.allclose([c['score'] for c in expected], [c['score'] for c in merged], atol=1e-5)
+    
+    num_queries = max(1, len(queries))
+    overlap /= num_queries
+    # Exact dense search per shard merges into exactly the single-index top-k;
+    # approximate indexes and per-shard BM25 statistics only come close
+    exact = config.INDEX_TYPE == "flat" and config.RETRIEVAL_MODE.lower() != "hybrid"
+    passed = same_scores == len(queries) if exact else overlap >= args.min_overlap
+    print(f"overlap@{args.k}={overlap:.4f}, identical scores {same_scores}/{len(queries)} "
+          f"({'must all match' if exact else f'overlap required {args.min_overlap}'}) single {single_ms / num_queries:.2f}ms/query, "
+          f"{args.shards} shards {sharded_ms / num_queries:.2f}ms/query {'PASS' if passed else 'FAIL'}")
+    return passed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Top-k agreement of sharded scatter-gather retrieval with a single index")
+    parser.add_argument("--shards", type=int, default=4, help="Shards (one worker process each)")
+    parser.add_argument("--shard-by", default="complaint_id", choices=["complaint_id", "market"])
+    parser.add_argument("--queries", type=int, default=100, help="Known-item queries sampled from the index")
+    parser.add_argument("--k", type=int, default=5, help="Chunks retrieved per question")
+    parser.add_argument("--min-overlap", type=float, default=0.9,
+                        help="Required overlap for approximate or hybrid search (flat dense search must match exactly)")
+    sys.exit(0 if check_sharding(parser.parse_args()) else 1)
@@ -1,7 +1,7 @@
 import os
+import asyncio
 import pandas as pd
 from src.config import Config
-from src.preprocessing import load_complaints, preprocess_dataset
 from src.indexer import ComplaintIndexer
 from src.retriever import ComplaintRetriever
 from src.generator import BusinessAnswerGenerator
@@ -12,18 +12,14 @@ def run_evaluation():
     
     # 1. Setup
     config = Config.from_env()
-    df = load_complaints(config.DATA_PATH)
-    df_processed = preprocess_dataset(df)
     
+    # Reuses the saved index unless its manifest shows the data or settings changed
     indexer = ComplaintIndexer(config)
-    if not os.path.exists(config.VECTOR_STORE_PATH + ".index"):
-        print("Building index for evaluation...")
-        indexer.build_index(df_processed)
-    else:
-        print("Loading existing index...")
-        indexer.load()
+    indexer.load_or_build()
         
-    retriever = ComplaintRetriever(indexer.model, indexer.index, indexer.metadatas)
+    retriever = ComplaintRetriever(indexer.model, indexer.index, indexer.metadatas,
+                                   sparse_index=indexer.sparse_index,
+                                   hybrid_candidates=config.HYBRID_CANDIDATES, rrf_k=config.RRF_K)
     generator = BusinessAnswerGenerator(config)
     pipeline = RAGPipeline(retriever, generator, config)
     
@@ -38,11 +34,12 @@ def run_evaluation():
     
     results = []
     
-    for q in test_questions:
+    # All questions are retrieved in one batch and generated concurrently
+    answers = asyncio.run(pipeline.arun_many(test_questions, k=3))
+    
+    for q, (answer, chunks) in zip(test_questions, answers):
         print(f"\nEvaluating Question: {q}")
         try:
-            answer, chunks = pipeline.run(q, k=3)
-            
             # Extract a snippet of sources
             source_snippets = [c['text'][:100] + "..." for c in chunks[:2]]
             
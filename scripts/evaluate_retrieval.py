@@ -0,0 +1,100 @@
+import os
+import sys
+import json
+import time
+import argparse
+from dataclasses import replace
+
+import faiss
+import numpy as np
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import Config
+from src.indexer import ComplaintIndexer
+from src.retriever import ComplaintRetriever
+from src.vector_index import INDEX_TYPES, INDEX_STORAGE, create_index, train_index, configure_search
+from src.retrieval_metrics import load_labelled_queries, make_known_item_queries, evaluate_retriever
+
+def index_vectors(indexer) -> np.ndarray:
+    """Vectors of the saved index: read back from a flat index, otherwise re-embedded from the chunk texts"""
+    if isinstance(indexer.index, faiss.IndexFlat):
+        return indexer.index.reconstruct_n(0, indexer.index.ntotal)
+    print(f"Saved index is {type(indexer.index).__name__}; re-embedding chunk texts for the exact baseline")
+    return indexer._embed_texts([item['text_chunk'] for item in indexer.metadatas])
+
+def run_evaluation(args):
+    print("--- CrediTrust AI: Retrieval Quality Evaluation ---")
+    config = Config.from_env()
+    indexer = ComplaintIndexer(config)
+    indexer.load()
+    
+    if args.labels:
+        queries = load_labelled_queries(args.labels)
+    else:
+        print(f"No labelled set given; using {args.known_items} known-item queries sampled from the index")
+        queries = make_known_item_queries(indexer.metadatas, args.known_items)
+    
+    # Exact IndexFlatL2 ground truth over the same vectors
+    vectors = np.ascontiguousarray(index_vectors(indexer), dtype='float32')
+    exact_index = faiss.IndexFlatL2(vectors.shape[1])
+    exact_index.add(vectors)
+    exact = ComplaintRetriever(indexer.model, exact_index, indexer.metadatas)
+    
+    results = []
+    # Every index mode is rebuilt from the same vectors; ivf_pq codes are already compressed
+    candidates = [("saved", indexer.index, None)] + [
+        (t if storage == "float32" else f"{t} {storage}", None, replace(config, INDEX_TYPE=t, INDEX_STORAGE=storage))
+        for t in args.index_types for storage in args.storage if t != "ivf_pq" or storage == "float32"
+    ]
+    if indexer.sparse_index is not None:
+        candidates.append(("saved + bm25", indexer.index, None))
+    for name, index, run_config in candidates:
+        if index is None:
+            start = time.perf_counter()
+            index = create_index(vectors.shape[1], run_config, len(vectors))
+            train_index(index, vectors, run_config)
+            index.add(vectors)
+            configure_search(index, run_config)
+            print(f"Built {name} index in {time.perf_counter() - start:.1f}s")
+        
+        sparse_index = indexer.sparse_index if name == "saved + bm25" else None
+        retriever = ComplaintRetriever(indexer.model, index, indexer.metadatas, sparse_index=sparse_index,
+                                       hybrid_candidates=config.HYBRID_CANDIDATES, rrf_k=config.RRF_K)
+        metrics = evaluate_retriever(retriever, queries, args.k, exact_retriever=exact)
+        
+        results.append({
+            "Index": name.replace("saved", f"saved ({config.INDEX_TYPE}, {config.INDEX_STORAGE})"),
+            **{metric: round(value, 4) for metric, value in metrics.items()},
+            "MB": round(faiss.serialize_index(index).nbytes / 1e6, 1),
+        })
+    
+    eval_df = pd.DataFrame(results)
+    markdown_table = eval_df.to_markdown(index=False)
+    print("\n--- RETRIEVAL EVALUATION ---")
+    print(f"{len(queries)} queries, k={args.k}")
+    print(markdown_table)
+    
+    os.makedirs("reports", exist_ok=True)
+    with open("reports/retrieval_evaluation.md", "w") as f:
+        f.write("# Retrieval Quality Evaluation\n\n")
+        f.write(f"{len(queries)} labelled queries, k={args.k}. "
+                f"overlap vs exact = share of the exact IndexFlatL2 top-k returned by each index.\n\n")
+        f.write(markdown_table)
+    with open("reports/retrieval_evaluation.json", "w") as f:
+        json.dump({"queries": len(queries), "k": args.k, "results": results}, f, indent=2)
+    print("\nSaved reports/retrieval_evaluation.md and reports/retrieval_evaluation.json")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall@k / MRR / nDCG of the retriever and of each index mode")
+    parser.add_argument("--labels", help="JSON or JSONL file of {question, filters, relevant_complaint_ids}")
+    parser.add_argument("--known-items", type=int, default=200,
+                        help="Known-item queries to sample when no labelled set is given")
+    parser.add_argument("--k", type=int, default=5, help="Chunks retrieved per question")
+    parser.add_argument("--index-types", nargs="*", default=list(INDEX_TYPES), choices=INDEX_TYPES,
+                        help="Index modes to rebuild from the same vectors and compare")
+    parser.add_argument("--storage", nargs="*", default=list(INDEX_STORAGE), choices=INDEX_STORAGE,
+                        help="Vector storage modes to rebuild each index mode with (memory vs recall)")
+    run_evaluation(parser.parse_args())
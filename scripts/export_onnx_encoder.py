@@ -0,0 +1,19 @@
+import os
+import sys
+import argparse
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import Config
+from src.onnx_encoder import export_onnx_encoder
+
+if __name__ == "__main__":
+    config = Config.from_env()
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (fp32 + int8) for EMBEDDING_BACKEND=onnx")
+    parser.add_argument("--model", default=config.EMBEDDING_MODEL_NAME, help="SentenceTransformer model name")
+    parser.add_argument("--output-dir", default=config.ONNX_MODEL_DIR, help="Where to write the export")
+    parser.add_argument("--no-quantize", action="store_true", help="Skip the int8 copy")
+    args = parser.parse_args()
+    export_onnx_encoder(args.model, args.output_dir, quantize=not args.no_quantize)
+    print(f"Exported {args.model} to {args.output_dir}")
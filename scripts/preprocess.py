@@ -0,0 +1,27 @@
+import os
+import sys
+import argparse
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import Config
+from src.preprocessing import preprocess_file
+
+def run_preprocessing():
+    config = Config.from_env()
+    parser = argparse.ArgumentParser(description="Clean a raw CFPB export in parallel and write Parquet")
+    parser.add_argument("--input", type=str, default=config.DATA_PATH, help="Raw complaints CSV")
+    parser.add_argument("--output", type=str, help="Parquet output (default: input path with .parquet)")
+    parser.add_argument("--workers", type=int, default=config.PREPROCESS_WORKERS, help="Worker processes (0 = all cores)")
+    parser.add_argument("--chunk-rows", type=int, default=config.PREPROCESS_CHUNK_ROWS, help="Rows per worker batch")
+    args = parser.parse_args()
+    
+    output = args.output or os.path.splitext(args.input)[0] + ".parquet"
+    print("--- CrediTrust AI: Parallel Preprocessing ---")
+    rows = preprocess_file(args.input, output, chunk_rows=args.chunk_rows, workers=args.workers or None)
+    print(f"Wrote {rows:,} cleaned complaints to {output}")
+    print(f"Set DATA_PATH={output} to index from the preprocessed file.")
+
+if __name__ == "__main__":
+    run_preprocessing()
@@ -0,0 +1,38 @@
+import os
+import sys
+import asyncio
+import argparse
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.config import Config
+from src.retrieval_service import RetrievalServer, open_retriever
+from src.utils.timing import PhaseTimer
+
+def serve(args):
+    """Load the model and index once and serve retrieval to every app and CLI process"""
+    config = Config.from_env()
+    startup = PhaseTimer()
+    # Never a client of itself, even when RETRIEVAL_SERVICE_URL is set in the environment
+    retriever = open_retriever(config, timer=startup, use_service=False)
+    print(f"Startup: {startup.report()}")
+    
+    server = RetrievalServer(retriever, args.host, args.port, args.max_batch_size, args.max_wait_ms)
+    print(f"Serving retrieval on http://{args.host}:{args.port} - point clients at it with "
+          f"RETRIEVAL_SERVICE_URL=http://{args.host}:{args.port}")
+    asyncio.run(server.serve_forever())
+
+if __name__ == "__main__":
+    config = Config.from_env()
+    parser = argparse.ArgumentParser(description="Shared retrieval server with micro-batched embedding and search")
+    parser.add_argument("--host", default=config.RETRIEVAL_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=config.RETRIEVAL_SERVICE_PORT)
+    parser.add_argument("--max-batch-size", type=int, default=config.RETRIEVAL_BATCH_MAX_SIZE,
+                        help="Requests coalesced into one encode/search call")
+    parser.add_argument("--max-wait-ms", type=float, default=config.RETRIEVAL_BATCH_MAX_WAIT_MS,
+                        help="How long a batch waits for more requests after its first one")
+    try:
+        serve(parser.parse_args())
+    except KeyboardInterrupt:
+        print("\nRetrieval server stopped")
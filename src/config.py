@@ -8,6 +8,11 @@ class Config:
     CHUNK_SIZE: int = 350
     CHUNK_OVERLAP: int = 60
     EMBEDDING_MODEL_NAME: str = "sentence-transformers/all-MiniLM-L6-v2"
+    # Encoder backend: "torch" (SentenceTransformer) or "onnx" (int8 ONNX Runtime export, no torch)
+    EMBEDDING_BACKEND: str = "torch"
+    ONNX_MODEL_DIR: str = "vector_store/onnx_encoder"
+    ONNX_QUANTIZED: bool = True
+    ONNX_THREADS: int = 0
     LLM_MODEL_NAME: str = "models/gemini-3-flash-preview"
     VECTOR_STORE_PATH: str = "vector_store/credtrust_bi_index"
     DATA_PATH: str = "./data/filtered_complaints.csv"
@@ -17,6 +22,82 @@ class Config:
     TEMPERATURE: float = 0.1
     TOP_K_RETRIEVAL: int = 5
     
+    # Vector index settings: INDEX_TYPE is one of flat, ivf_flat, ivf_pq, hnsw
+    INDEX_TYPE: str = "flat"
+    IVF_NLIST: int = 1024
+    IVF_NPROBE: int = 16
+    PQ_M: int = 48
+    PQ_NBITS: int = 8
+    HNSW_M: int = 32
+    HNSW_EF_CONSTRUCTION: int = 200
+    HNSW_EF_SEARCH: int = 64
+    INDEX_TRAIN_SAMPLE: int = 100000
+    # Vector storage for flat/ivf_flat/hnsw: float32, fp16 (half the RAM) or sq8 (a quarter, trained)
+    INDEX_STORAGE: str = "float32"
+    # Rebuild automatically when the saved index was built with other model/chunk/index settings
+    INDEX_AUTO_REBUILD: bool = False
+    
+    # Streaming index build: complaints per chunking batch, chunks per encode call
+    BUILD_BATCH_ROWS: int = 2000
+    EMBED_BATCH_SIZE: int = 64
+    
+    # Near-duplicate chunks (MinHash-LSH estimated Jaccard >= DEDUP_THRESHOLD) of the same product,
+    # market and date are embedded and indexed once; the kept chunk records how many it stands for.
+    # Incremental updates cluster their chunks against the indexed ones the same way, and removing a kept
+    # chunk indexes one of its near-duplicates in its place
+    DEDUP_ENABLED: bool = False
+    DEDUP_THRESHOLD: float = 0.9
+    DEDUP_NUM_PERM: int = 64
+    
+    # Persistent embedding cache keyed by model + chunk text hash ("" disables it)
+    EMBEDDING_CACHE_PATH: str = "vector_store/embedding_cache"
+    EMBEDDING_CACHE_MAX_MB: int = 2048
+    EMBEDDING_CACHE_DTYPE: str = "float16"
+    
+    # Parallel preprocessing of large CSV exports (0 workers = all cores)
+    PREPROCESS_CHUNK_ROWS: int = 50000
+    PREPROCESS_WORKERS: int = 0
+    
+    # RAGPipeline result cache: exact + semantic (cosine) reuse of answers (size 0 disables)
+    QUERY_CACHE_SIZE: int = 256
+    QUERY_CACHE_TTL_SECONDS: int = 3600
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    
+    # RAGPipeline.arun_many: generator calls in flight at once
+    ASYNC_MAX_CONCURRENCY: int = 8
+    
+    # Retrieval mode: "dense" (FAISS only) or "hybrid" (FAISS + BM25 fused by reciprocal rank)
+    RETRIEVAL_MODE: str = "dense"
+    BM25_K1: float = 1.2
+    BM25_B: float = 0.75
+    BM25_MAX_POSTINGS: int = 4096
+    HYBRID_CANDIDATES: int = 50
+    RRF_K: int = 60
+    
+    # Optional cross-encoder rerank: over-fetch candidates, score within a per-query latency budget
+    RERANK_ENABLED: bool = False
+    RERANK_MODEL_NAME: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_CANDIDATES: int = 20
+    RERANK_BATCH_SIZE: int = 16
+    RERANK_LATENCY_BUDGET_MS: float = 150.0
+    
+    # Sharded retrieval: SHARD_COUNT > 1 splits the index by SHARD_BY ("complaint_id" hash or "market"),
+    # each shard searched in its own worker process
+    SHARD_COUNT: int = 0
+    SHARD_BY: str = "complaint_id"
+    
+    # Shared retrieval server (scripts/serve_retrieval.py); set RETRIEVAL_SERVICE_URL to use it from app/CLI
+    RETRIEVAL_SERVICE_URL: str = ""
+    RETRIEVAL_SERVICE_HOST: str = "127.0.0.1"
+    RETRIEVAL_SERVICE_PORT: int = 8765
+    RETRIEVAL_BATCH_MAX_SIZE: int = 64
+    RETRIEVAL_BATCH_MAX_WAIT_MS: float = 5.0
+    
+    # Prometheus /metrics endpoint of the app / CLI process (0 disables it; the retrieval server always has one)
+    METRICS_PORT: int = 0
+    # Interface it listens on; set "0.0.0.0" to let scrapers on other hosts reach it
+    METRICS_HOST: str = "127.0.0.1"
+    
     # CrediTrust products and markets - using default_factory for mutable defaults
     PRODUCTS: List[str] = field(default_factory=lambda: ["Credit Cards", "Personal Loans", "Buy Now, Pay Later (BNPL)", "Savings Accounts", "Money Transfers"])
     MARKETS: List[str] = field(default_factory=lambda: ["Kenya", "Uganda", "Tanzania", "Rwanda"])
@@ -27,10 +108,59 @@ class Config:
             CHUNK_SIZE=int(os.getenv('CHUNK_SIZE', 350)),
             CHUNK_OVERLAP=int(os.getenv('CHUNK_OVERLAP', 60)),
             EMBEDDING_MODEL_NAME=os.getenv('EMBEDDING_MODEL', "sentence-transformers/all-MiniLM-L6-v2"),
+            EMBEDDING_BACKEND=os.getenv('EMBEDDING_BACKEND', "torch"),
+            ONNX_MODEL_DIR=os.getenv('ONNX_MODEL_DIR', "vector_store/onnx_encoder"),
+            ONNX_QUANTIZED=os.getenv('ONNX_QUANTIZED', "true").lower() in ("1", "true", "yes"),
+            ONNX_THREADS=int(os.getenv('ONNX_THREADS', 0)),
             LLM_MODEL_NAME=os.getenv('LLM_MODEL', "models/gemini-3-flash-preview"),
             VECTOR_STORE_PATH=os.getenv('VECTOR_STORE_PATH', "vector_store/credtrust_bi_index"),
             DATA_PATH=os.getenv('DATA_PATH', "./data/filtered_complaints.csv"),
             MAX_GENERATION_LENGTH=int(os.getenv('MAX_GENERATION_LENGTH', 1000)),
             TEMPERATURE=float(os.getenv('TEMPERATURE', 0.1)),
-            TOP_K_RETRIEVAL=int(os.getenv('TOP_K_RETRIEVAL', 5))
+            TOP_K_RETRIEVAL=int(os.getenv('TOP_K_RETRIEVAL', 5)),
+            INDEX_TYPE=os.getenv('INDEX_TYPE', "flat"),
+            IVF_NLIST=int(os.getenv('IVF_NLIST', 1024)),
+            IVF_NPROBE=int(os.getenv('IVF_NPROBE', 16)),
+            PQ_M=int(os.getenv('PQ_M', 48)),
+            PQ_NBITS=int(os.getenv('PQ_NBITS', 8)),
+            HNSW_M=int(os.getenv('HNSW_M', 32)),
+            HNSW_EF_CONSTRUCTION=int(os.getenv('HNSW_EF_CONSTRUCTION', 200)),
+            HNSW_EF_SEARCH=int(os.getenv('HNSW_EF_SEARCH', 64)),
+            INDEX_TRAIN_SAMPLE=int(os.getenv('INDEX_TRAIN_SAMPLE', 100000)),
+            INDEX_STORAGE=os.getenv('INDEX_STORAGE', "float32"),
+            INDEX_AUTO_REBUILD=os.getenv('INDEX_AUTO_REBUILD', "false").lower() in ("1", "true", "yes"),
+            BUILD_BATCH_ROWS=int(os.getenv('BUILD_BATCH_ROWS', 2000)),
+            EMBED_BATCH_SIZE=int(os.getenv('EMBED_BATCH_SIZE', 64)),
+            DEDUP_ENABLED=os.getenv('DEDUP_ENABLED', "false").lower() in ("1", "true", "yes"),
+            DEDUP_THRESHOLD=float(os.getenv('DEDUP_THRESHOLD', 0.9)),
+            DEDUP_NUM_PERM=int(os.getenv('DEDUP_NUM_PERM', 64)),
+            EMBEDDING_CACHE_PATH=os.getenv('EMBEDDING_CACHE_PATH', "vector_store/embedding_cache"),
+            EMBEDDING_CACHE_MAX_MB=int(os.getenv('EMBEDDING_CACHE_MAX_MB', 2048)),
+            EMBEDDING_CACHE_DTYPE=os.getenv('EMBEDDING_CACHE_DTYPE', "float16"),
+            PREPROCESS_CHUNK_ROWS=int(os.getenv('PREPROCESS_CHUNK_ROWS', 50000)),
+            PREPROCESS_WORKERS=int(os.getenv('PREPROCESS_WORKERS', 0)),
+            QUERY_CACHE_SIZE=int(os.getenv('QUERY_CACHE_SIZE', 256)),
+            QUERY_CACHE_TTL_SECONDS=int(os.getenv('QUERY_CACHE_TTL_SECONDS', 3600)),
+            SEMANTIC_CACHE_THRESHOLD=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.95)),
+            ASYNC_MAX_CONCURRENCY=int(os.getenv('ASYNC_MAX_CONCURRENCY', 8)),
+            RETRIEVAL_MODE=os.getenv('RETRIEVAL_MODE', "dense"),
+            BM25_K1=float(os.getenv('BM25_K1', 1.2)),
+            BM25_B=float(os.getenv('BM25_B', 0.75)),
+            BM25_MAX_POSTINGS=int(os.getenv('BM25_MAX_POSTINGS', 4096)),
+            HYBRID_CANDIDATES=int(os.getenv('HYBRID_CANDIDATES', 50)),
+            RRF_K=int(os.getenv('RRF_K', 60)),
+            RERANK_ENABLED=os.getenv('RERANK_ENABLED', "false").lower() in ("1", "true", "yes"),
+            RERANK_MODEL_NAME=os.getenv('RERANK_MODEL', "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+            RERANK_CANDIDATES=int(os.getenv('RERANK_CANDIDATES', 20)),
+            RERANK_BATCH_SIZE=int(os.getenv('RERANK_BATCH_SIZE', 16)),
+            RERANK_LATENCY_BUDGET_MS=float(os.getenv('RERANK_LATENCY_BUDGET_MS', 150.0)),
+            SHARD_COUNT=int(os.getenv('SHARD_COUNT', 0)),
+            SHARD_BY=os.getenv('SHARD_BY', "complaint_id"),
+            RETRIEVAL_SERVICE_URL=os.getenv('RETRIEVAL_SERVICE_URL', ""),
+            RETRIEVAL_SERVICE_HOST=os.getenv('RETRIEVAL_SERVICE_HOST', "127.0.0.1"),
+            RETRIEVAL_SERVICE_PORT=int(os.getenv('RETRIEVAL_SERVICE_PORT', 8765)),
+            RETRIEVAL_BATCH_MAX_SIZE=int(os.getenv('RETRIEVAL_BATCH_MAX_SIZE', 64)),
+            RETRIEVAL_BATCH_MAX_WAIT_MS=float(os.getenv('RETRIEVAL_BATCH_MAX_WAIT_MS', 5.0)),
+            METRICS_PORT=int(os.getenv('METRICS_PORT', 0)),
+            METRICS_HOST=os.getenv('METRICS_HOST', "127.0.0.1")
         )
\ No newline at end of file
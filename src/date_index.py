@@ -0,0 +1,140 @@
+import os
+import re
+from datetime import date, timedelta
+import numpy as np
+from typing import Any, Dict, Optional, Tuple
+
+from src.sharding import read_layout
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Filter keys taking an inclusive ISO date (YYYY-MM-DD) bound instead of a value to match
+DATE_FILTERS = ("date_from", "date_to")
+EPOCH = date(1970, 1, 1)
+# Epoch day of rows without a readable date; never stored in the index
+MISSING = np.iinfo(np.int64).min
+
+
+def date_index_path(config) -> str:
+    return config.VECTOR_STORE_PATH + "_dates.npz"
+
+
+def latest_indexed_date(config) -> Optional[date]:
+    """Most recent complaint date in the index saved at VECTOR_STORE_PATH (over all shards), if known"""
+    layout = read_layout(config) if config.SHARD_COUNT > 1 else None
+    if layout is not None:
+        latest = [parse_date(shard["dates"][1]) for shard in layout["shards"] if shard.get("dates")]
+        return max(latest) if latest else None
+    date_index = DateIndex.load(date_index_path(config))
+    return date_index.latest if date_index is not None else None
+
+
+def parse_date(value: Any) -> Optional[date]:
+    """Date of an ISO (2023-05-14...) or US (05/14/2023) date string, None otherwise"""
+    if isinstance(value, date):
+        return value
+    text = str(value).strip() if value is not None else ""
+    try:
+        iso = re.match(r'^(\d{4})-(\d{2})-(\d{2})', text)
+        if iso:
+            return date(int(iso.group(1)), int(iso.group(2)), int(iso.group(3)))
+        us = re.match(r'^(\d{1,2})/(\d{1,2})/(\d{4})', text)
+        if us:
+            return date(int(us.group(3)), int(us.group(1)), int(us.group(2)))
+    except ValueError:
+        # Well-formed but impossible, e.g. 2023-02-30
+        pass
+    return None
+
+
+def epoch_day(value: Any) -> Optional[int]:
+    """Days since 1970-01-01 of a date or date string"""
+    parsed = parse_date(value)
+    return None if parsed is None else (parsed - EPOCH).days
+
+
+def date_bounds(filters: Optional[Dict[str, Any]]) -> Tuple[Optional[int], Optional[int]]:
+    """Epoch-day (date_from, date_to) of a filter dict; raises ValueError on an unreadable date"""
+    bounds = []
+    for key in DATE_FILTERS:
+        value = (filters or {}).get(key)
+        day = None if value in (None, "") else epoch_day(value)
+        if value not in (None, "") and day is None:
+            raise ValueError(f"Unrecognized {key} '{value}', expected YYYY-MM-DD")
+        bounds.append(day)
+    return bounds[0], bounds[1]
+
+
+class DateIndex:
+    """Complaint dates as int32 epoch days, sorted, with the row id of each.
+    
+    A date range is two binary searches into `days`; the matching rows are
+    the contiguous slice of `rows` between them. Rows without a readable
+    date are left out, so any date filter excludes them.
+    """
+    
+    def __init__(self, days: np.ndarray, rows: np.ndarray, num_rows: int):
+        self.days = np.asarray(days, dtype=np.int32)
+        self.rows = np.asarray(rows, dtype=np.int32)
+        self.num_rows = int(num_rows)
+    
+    @classmethod
+    def from_metadata(cls, metadata) -> Optional["DateIndex"]:
+        """Index the 'date' field of a MetadataStore or list of dicts; None if there is none"""
+        if hasattr(metadata, 'categorical'):
+            column = metadata.categorical('date')
+            if column is None:
+                return None
+            codes, categories = column
+            # Each distinct date string is parsed once
+            category_days = np.array([_or_missing(epoch_day(value)) for value in categories], dtype=np.int64)
+            row_days = category_days[np.asarray(codes)]
+        else:
+            if not any('date' in item for item in metadata):
+                return None
+            row_days = np.array([_or_missing(epoch_day(item.get('date'))) for item in metadata], dtype=np.int64)
+        
+        dated = np.flatnonzero(row_days != MISSING)
+        order = dated[np.argsort(row_days[dated], kind="stable")]
+        return cls(row_days[order], order, len(row_days))
+    
+    def __len__(self) -> int:
+        return self.num_rows
+    
+    @property
+    def earliest(self) -> Optional[date]:
+        return EPOCH + timedelta(days=int(self.days[0])) if len(self.days) else None
+    
+    @property
+    def latest(self) -> Optional[date]:
+        return EPOCH + timedelta(days=int(self.days[-1])) if len(self.days) else None
+    
+    def range_rows(self, day_from: Optional[int], day_to: Optional[int]) -> np.ndarray:
+        """Row ids dated within [day_from, day_to] (either bound may be open), in date order"""
+        start = 0 if day_from is None else np.searchsorted(self.days, day_from, side="left")
+        end = len(self.days) if day_to is None else np.searchsorted(self.days, day_to, side="right")
+        return self.rows[start:max(start, end)]
+    
+    def mask(self, day_from: Optional[int], day_to: Optional[int]) -> np.ndarray:
+        """Boolean row mask of range_rows"""
+        mask = np.zeros(self.num_rows, dtype=bool)
+        mask[self.range_rows(day_from, day_to)] = True
+        return mask
+    
+    def save(self, path: str):
+        """Write the index aside, then swap it into place"""
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, days=self.days, rows=self.rows, num_rows=np.int64(self.num_rows))
+        os.replace(path + ".tmp", path)
+    
+    @classmethod
+    def load(cls, path: str) -> Optional["DateIndex"]:
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data["days"], data["rows"], int(data["num_rows"]))
+
+
+def _or_missing(day: Optional[int]) -> int:
+    return MISSING if day is None else day
@@ -0,0 +1,93 @@
+import re
+import zlib
+import numpy as np
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Universal hashing modulo a Mersenne prime; signatures keep the low 32 bits
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """(bands, rows per band) splitting the signature so the LSH S-curve turns at about `threshold`.
+    
+    Pairs with Jaccard similarity s share at least one band with probability
+    1 - (1 - s^rows)^bands; the curve is steepest near (1 / bands)^(1 / rows).
+    """
+    splits = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    return min(splits, key=lambda split: abs((1.0 / split[0]) ** (1.0 / split[1]) - threshold))
+
+
+class NearDuplicateIndex:
+    """Streaming MinHash-LSH clustering of near-duplicate texts.
+    
+    Each text is reduced to a MinHash signature over its word 3-gram
+    shingles. `add` looks the signature up in the LSH band buckets; a
+    candidate whose signature agrees on at least `threshold` of the
+    positions (the estimated Jaccard similarity) makes the text a duplicate
+    of that cluster, otherwise the text becomes a new cluster representative.
+    Only representatives are stored, so memory grows with distinct texts.
+    
+    Texts only cluster with texts added under the same `segment`; the
+    indexer passes (product, market, date) so a duplicate always matches the
+    same filters as the representative it is counted on.
+    """
+    
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, shingle_size: int = 3, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        # Kept below 2**32 so a * hash + b stays within uint64
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.bands, self.rows = lsh_bands(num_perm, threshold)
+        self._buckets: List[Dict[Tuple[Hashable, bytes], List[int]]] = [{} for _ in range(self.bands)]
+        self._signatures: List[np.ndarray] = []
+        self.duplicates = 0
+    
+    def __len__(self) -> int:
+        """Clusters (distinct texts) seen so far"""
+        return len(self._signatures)
+    
+    def signature(self, text: str) -> np.ndarray:
+        words = re.findall(r'\w+', text.lower())
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64)
+        permuted = ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME) & _MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+    
+    def add(self, text: str, segment: Hashable = None) -> Optional[int]:
+        """Cluster of the text's nearest earlier representative in `segment`, or None when it starts a new cluster.
+        
+        Clusters are numbered 0, 1, 2, ... in the order their representative was added.
+        """
+        signature = self.signature(text)
+        keys = [(segment, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+        
+        best, best_similarity = None, self.threshold
+        for band, key in enumerate(keys):
+            for cluster in self._buckets[band].get(key, ()):
+                similarity = float(np.mean(self._signatures[cluster] == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = cluster, similarity
+        if best is not None:
+            self.duplicates += 1
+            return best
+        
+        cluster = len(self._signatures)
+        self._signatures.append(signature)
+        for band, key in enumerate(keys):
+            self._buckets[band].setdefault(key, []).append(cluster)
+        return None
+    
+    @property
+    def duplicate_rate(self) -> float:
+        """Share of the texts added so far that were near-duplicates"""
+        total = len(self) + self.duplicates
+        return self.duplicates / total if total else 0.0
@@ -0,0 +1,40 @@
+import os
+import json
+from typing import Optional
+
+from src.onnx_encoder import INFO_FILE, OnnxSentenceEncoder, export_onnx_encoder
+from src.utils.exceptions import IndexingError
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+EMBEDDING_BACKENDS = ("torch", "onnx")
+
+
+def embedding_model_id(config) -> str:
+    """Identifies the vectors a backend produces, e.g. for keying the embedding cache"""
+    if config.EMBEDDING_BACKEND.lower() == "onnx":
+        return f"{config.EMBEDDING_MODEL_NAME}#onnx-{'int8' if config.ONNX_QUANTIZED else 'fp32'}"
+    return config.EMBEDDING_MODEL_NAME
+
+
+def load_embedding_model(config, device: Optional[str] = None):
+    """Embedding model for the configured EMBEDDING_BACKEND ("torch" or "onnx")"""
+    backend = config.EMBEDDING_BACKEND.lower()
+    if backend not in EMBEDDING_BACKENDS:
+        raise IndexingError(f"Unknown EMBEDDING_BACKEND '{config.EMBEDDING_BACKEND}', expected one of {EMBEDDING_BACKENDS}")
+    
+    if backend == "onnx":
+        info_path = os.path.join(config.ONNX_MODEL_DIR, INFO_FILE)
+        exported_name = None
+        if os.path.exists(info_path):
+            with open(info_path) as f:
+                exported_name = json.load(f)["model_name"]
+        if exported_name != config.EMBEDDING_MODEL_NAME:
+            # One-off export; later starts only need onnxruntime
+            logger.info(f"No ONNX export of {config.EMBEDDING_MODEL_NAME} in {config.ONNX_MODEL_DIR}")
+            export_onnx_encoder(config.EMBEDDING_MODEL_NAME, config.ONNX_MODEL_DIR)
+        return OnnxSentenceEncoder(config.ONNX_MODEL_DIR, config.ONNX_QUANTIZED, config.ONNX_THREADS)
+    
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(config.EMBEDDING_MODEL_NAME, device=device)
@@ -0,0 +1,187 @@
+import os
+import json
+import hashlib
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+from src.embedding_backend import embedding_model_id
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Fraction of the cache freed at once when it is full, to amortize eviction
+EVICTION_FRACTION = 0.1
+INITIAL_CAPACITY = 4096
+
+
+def text_key(text: str) -> bytes:
+    """Content hash identifying a chunk independent of where it came from"""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """Disk-backed embedding cache keyed by (model name, chunk text hash).
+    
+    Vectors live in a memory-mapped float16/float32 matrix; a slot table maps
+    text hashes to rows and tracks last use, so the least recently used rows
+    are evicted once the cache reaches `max_bytes`.
+    """
+    
+    def __init__(self, path: str, model_name: str, dim: int,
+                 dtype: str = "float16", max_bytes: int = 2 * 1024 ** 3):
+        # One sub-directory per model, so switching models never mixes vectors
+        model_slug = hashlib.blake2b(model_name.encode("utf-8"), digest_size=6).hexdigest()
+        self.path = os.path.join(path, model_slug)
+        self.model_name = model_name
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.max_entries = max(1, max_bytes // (dim * self.dtype.itemsize))
+        self.hits = 0
+        self.misses = 0
+        
+        self._slots: Dict[bytes, int] = {}
+        self._free: List[int] = []
+        self._clock = 0
+        self._size = 0
+        self._keys = np.zeros((0, 2), dtype=np.uint64)
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._vectors = None
+        self._load()
+    
+    def get_many(self, keys: List[bytes], dtype: str = 'float32') -> Tuple[np.ndarray, List[int]]:
+        """Return (vectors, positions of keys not in the cache); missing rows are zero"""
+        vectors = np.zeros((len(keys), self.dim), dtype=dtype)
+        missing = []
+        self._clock += 1
+        for pos, key in enumerate(keys):
+            slot = self._slots.get(key)
+            if slot is None:
+                missing.append(pos)
+            else:
+                vectors[pos] = self._vectors[slot]
+                self._last_used[slot] = self._clock
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        return vectors, missing
+    
+    def put_many(self, keys: List[bytes], vectors: np.ndarray):
+        """Insert vectors, evicting least recently used entries when full"""
+        self._clock += 1
+        for key, vector in zip(keys, vectors):
+            if key in self._slots:
+                continue
+            slot = self._allocate()
+            self._slots[key] = slot
+            self._keys[slot] = np.frombuffer(key, dtype=np.uint64)
+            self._vectors[slot] = vector
+            self._last_used[slot] = self._clock
+    
+    def flush(self):
+        """Persist the slot table; vectors are already written through the memory map.
+        
+        Vectors are flushed before the keys that point at them, and each
+        file is written aside and renamed, so a crash never leaves a saved
+        key pointing at a vector written for another key.
+        """
+        if self._vectors is None:
+            return
+        self._vectors.flush()
+        np.save(os.path.join(self.path, "keys.tmp.npy"), self._keys[:self._size])
+        np.save(os.path.join(self.path, "last_used.tmp.npy"), self._last_used[:self._size])
+        os.replace(os.path.join(self.path, "keys.tmp.npy"), os.path.join(self.path, "keys.npy"))
+        os.replace(os.path.join(self.path, "last_used.tmp.npy"), os.path.join(self.path, "last_used.npy"))
+        with open(os.path.join(self.path, "info.tmp.json"), "w") as f:
+            json.dump({"model_name": self.model_name, "dim": self.dim, "dtype": self.dtype.name,
+                       "capacity": len(self._keys), "size": self._size}, f)
+        os.replace(os.path.join(self.path, "info.tmp.json"), os.path.join(self.path, "info.json"))
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def _load(self):
+        os.makedirs(self.path, exist_ok=True)
+        info_path = os.path.join(self.path, "info.json")
+        if not os.path.exists(info_path):
+            self._resize(min(INITIAL_CAPACITY, self.max_entries))
+            return
+        
+        with open(info_path) as f:
+            info = json.load(f)
+        if info["dim"] != self.dim or info["dtype"] != self.dtype.name:
+            logger.warning(f"Embedding cache at {self.path} has an incompatible layout, starting empty")
+            self._resize(min(INITIAL_CAPACITY, self.max_entries), reset=True)
+            return
+        
+        keys = np.load(os.path.join(self.path, "keys.npy"))
+        last_used = np.load(os.path.join(self.path, "last_used.npy"))
+        # The three files are replaced one by one; only rows all of them cover are trusted
+        self._size = min(info["size"], len(keys), len(last_used))
+        self._resize(max(info["capacity"], self._size))
+        self._keys[:self._size] = keys[:self._size]
+        self._last_used[:self._size] = last_used[:self._size]
+        self._clock = int(last_used.max()) if len(last_used) else 0
+        
+        for slot in range(self._size):
+            key = self._keys[slot].tobytes()
+            if self._keys[slot].any():
+                self._slots[key] = slot
+            else:
+                self._free.append(slot)
+        logger.info(f"Loaded embedding cache with {len(self._slots)} vectors from {self.path}")
+    
+    def _allocate(self) -> int:
+        if self._free:
+            return self._free.pop()
+        if self._size == len(self._keys):
+            if self._size < self.max_entries:
+                self._resize(min(self.max_entries, max(INITIAL_CAPACITY, self._size * 2)))
+            else:
+                self._evict()
+                return self._free.pop()
+        self._size += 1
+        return self._size - 1
+    
+    def _evict(self):
+        """Free the least recently used EVICTION_FRACTION of the slots"""
+        count = max(1, int(self._size * EVICTION_FRACTION))
+        victims = np.argpartition(self._last_used[:self._size], count - 1)[:count]
+        for slot in victims:
+            self._slots.pop(self._keys[slot].tobytes(), None)
+            self._keys[slot] = 0
+            self._free.append(int(slot))
+        # Persist the evictions before any freed slot is overwritten, so the saved
+        # table never maps an evicted key to the vector of the key reusing its slot
+        self.flush()
+        logger.info(f"Evicted {count} entries from embedding cache")
+    
+    def _resize(self, capacity: int, reset: bool = False):
+        """Grow the backing file and slot table to `capacity` rows"""
+        vectors_path = os.path.join(self.path, "vectors.bin")
+        if reset and os.path.exists(vectors_path):
+            os.remove(vectors_path)
+        
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        with open(vectors_path, "ab") as f:
+            f.truncate(max(capacity * self.dim * self.dtype.itemsize, os.path.getsize(vectors_path)))
+        self._vectors = np.memmap(vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        
+        keys = np.zeros((capacity, 2), dtype=np.uint64)
+        last_used = np.zeros(capacity, dtype=np.int64)
+        keys[:len(self._keys)] = self._keys[:capacity]
+        last_used[:len(self._last_used)] = self._last_used[:capacity]
+        self._keys, self._last_used = keys, last_used
+
+
+def open_embedding_cache(config, dim: int) -> Optional[EmbeddingCache]:
+    """Embedding cache configured by Config, or None when disabled"""
+    if not config.EMBEDDING_CACHE_PATH:
+        return None
+    return EmbeddingCache(
+        config.EMBEDDING_CACHE_PATH,
+        embedding_model_id(config),
+        dim,
+        dtype=config.EMBEDDING_CACHE_DTYPE,
+        max_bytes=config.EMBEDDING_CACHE_MAX_MB * 1024 ** 2
+    )
@@ -1,40 +1,102 @@
-from google import genai
-from typing import List, Dict
+from typing import List, Dict, Generator, Iterator, Optional
 import os
 import re
+import time
+from dataclasses import dataclass
 from datetime import datetime
 
 from src.utils.exceptions import GenerationError
 from src.utils.logger import setup_logger
+from src.utils.metrics import REGISTRY, ERRORS
 
 logger = setup_logger(__name__)
 
+PROMPT_CHARS = REGISTRY.histogram(
+    "creditrust_prompt_chars", "Size of the prompt sent to the LLM in characters",
+    buckets=(500, 1000, 2000, 3000, 4000, 6000, 8000, 12000, 16000, 32000)
+)
+LLM_SECONDS = REGISTRY.histogram(
+    "creditrust_llm_request_seconds", "Gemini request latency, to the full answer", ["mode"]
+)
+LLM_FIRST_TOKEN_SECONDS = REGISTRY.histogram(
+    "creditrust_llm_first_token_seconds", "Gemini latency to the first streamed piece"
+)
+
+@dataclass
+class StreamResult:
+    """Outcome of one generate_answer_stream call, returned when its stream ends"""
+    text: str = ""
+    time_to_first_token: Optional[float] = None
+    total_time: Optional[float] = None
+    # False when generation failed after text was emitted, i.e. the text is truncated
+    complete: bool = False
+
+
 class BusinessAnswerGenerator:
     def __init__(self, config):
         self.config = config
         self.model_name = config.LLM_MODEL_NAME
-        try:
-            # Configure Gemini via the new Client
-            api_key = os.getenv("GOOGLE_API_KEY")
-            if not api_key:
-                logger.warning("GOOGLE_API_KEY not found in environment. Please ensure it is set.")
-            
-            self.client = genai.Client(api_key=api_key)
-            logger.info(f"Initialized Gemini generator with model: {self.model_name}")
-            
-        except Exception as e:
-            raise GenerationError(f"Failed to initialize Gemini generator: {str(e)}")
+        self.api_key = os.getenv("GOOGLE_API_KEY")
+        if not self.api_key:
+            logger.warning("GOOGLE_API_KEY not found in environment. Please ensure it is set.")
+        # The google-genai SDK is slow to import, so the client is created on the first request
+        self._client = None
+        logger.info(f"Initialized Gemini generator with model: {self.model_name}")
     
-    def build_prompt(self, context_chunks: List[Dict], question: str) -> str:
-        """Build a professional, business-focused prompt for Gemini analysis"""
-        context_str = "\n\n".join([
-            f"SOURCE COMPLAINT {i+1}\n"
-            f"Product: {chunk['metadata'].get('product', 'N/A')}\n"
-            f"Region: {chunk['metadata'].get('market', 'N/A')}\n"
-            f"Date: {chunk['metadata'].get('date', 'N/A')}\n"
-            f"Narrative: {chunk['text']}"
-            for i, chunk in enumerate(context_chunks)
-        ])
+    @property
+    def client(self):
+        """Gemini client, created on first use"""
+        if self._client is None:
+            try:
+                # Configure Gemini via the new Client
+                from google import genai
+                self._client = genai.Client(api_key=self.api_key)
+            except Exception as e:
+                raise GenerationError(f"Failed to initialize Gemini generator: {str(e)}")
+        return self._client
+    
+    def build_prompt(self, context_chunks: List[Dict], question: str, aggregates: str = "") -> str:
+        """Build a professional, business-focused prompt for Gemini analysis.
+        
+        `aggregates` holds exact complaint counts for prevalence questions;
+        the excerpts then illustrate them rather than stand in for them.
+        Chunks tagged with a comparison `segment` are grouped under it.
+        """
+        segments = list(dict.fromkeys(chunk['segment'] for chunk in context_chunks if chunk.get('segment')))
+        if segments:
+            order = {segment: i for i, segment in enumerate(segments)}
+            context_chunks = sorted(context_chunks, key=lambda chunk: order.get(chunk.get('segment'), len(order)))
+        
+        parts, current_segment = [], None
+        for i, chunk in enumerate(context_chunks):
+            if segments and chunk.get('segment') != current_segment:
+                current_segment = chunk.get('segment')
+                parts.append(f"#### SEGMENT: {current_segment}")
+            # Near-duplicates indexed once under this excerpt (DEDUP_ENABLED builds)
+            duplicates = int(chunk['metadata'].get('duplicates') or 0)
+            parts.append(
+                f"SOURCE COMPLAINT {i+1}\n"
+                f"Product: {chunk['metadata'].get('product', 'N/A')}\n"
+                f"Region: {chunk['metadata'].get('market', 'N/A')}\n"
+                f"Date: {chunk['metadata'].get('date', 'N/A')}\n"
+                + (f"Near-identical complaints: {duplicates} more\n" if duplicates else "")
+                + f"Narrative: {chunk['text']}"
+            )
+        context_str = "\n\n".join(parts)
+        volume_section = (
+            f"\n### COMPLAINT VOLUME (exact counts over all indexed complaints)\n{aggregates}\n"
+            "Use these counts to rank and size issues; the excerpts below are examples, not a sample to count.\n"
+            if aggregates else ""
+        )
+        comparison_instruction = (
+            f"6. **Compare Segments**: The question compares {', '.join(segments)}. Contrast them issue by issue, "
+            "citing each segment's own excerpts; do not attribute one segment's complaints to another.\n"
+            if len(segments) > 1 else ""
+        )
+        comparison_output = (
+            "- **Segment Comparison**: Side-by-side differences and similarities between the segments.\n"
+            if len(segments) > 1 else ""
+        )
         
         prompt = f"""You are a Senior Financial Analyst at CrediTrust Financial, specializing in customer experience and operational risk for the East African market.
 
@@ -42,7 +104,7 @@ Your objective is to provide a synthesis of the following customer complaint exc
 
 ### BUSINESS QUESTION
 {question}
-
+{volume_section}
 ### SOURCE DATA EXCERPTS
 {context_str}
 
@@ -52,15 +114,16 @@ Your objective is to provide a synthesis of the following customer complaint exc
 3. **East African Context**: Where applicable, note regional patterns (Kenya, Uganda, Tanzania, Rwanda).
 4. **Actionable Insights**: Provide specific, data-backed recommendations for product or support teams.
 5. **Groundedness**: Only use information present in the provided excerpts. If the answer is not in the context, state it clearly.
-
+{comparison_instruction}
 ### OUTPUT STRUCTURE
 - **Executive Summary**: A concise (3-4 sentence) high-level overview.
 - **Critical Issues Identified**: A prioritized list of recurring pain points.
 - **Regional Considerations**: Market-specific patterns if observed.
-- **Operational Recommendations**: Strategic next steps for the business.
+{comparison_output}- **Operational Recommendations**: Strategic next steps for the business.
 
 Your analysis:"""
         
+        PROMPT_CHARS.observe(len(prompt))
         return prompt
     
     def generate_answer(self, prompt: str) -> str:
@@ -69,10 +132,11 @@ Your analysis:"""
             logger.info("Sending prompt to Gemini...")
             
             # Using the new google-genai SDK method
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt
-            )
+            with LLM_SECONDS.time(mode="sync"):
+                response = self.client.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt
+                )
             
             if not response.text:
                 raise GenerationError("Gemini returned an empty response")
@@ -86,10 +150,94 @@ Your analysis:"""
             return analysis
             
         except Exception as e:
+            ERRORS.inc(component="generator")
             error_msg = f"Failed to generate analysis via Gemini: {str(e)}"
             logger.error(error_msg)
             return "TECHNICAL ERROR: I encountered an issue connecting to the analysis engine. Please verify your API configuration and try again."
     
+    async def agenerate_answer(self, prompt: str) -> str:
+        """Async generate_answer, so several prompts can be in flight at once"""
+        try:
+            with LLM_SECONDS.time(mode="async"):
+                response = await self.client.aio.models.generate_content(
+                    model=self.model_name,
+                    contents=prompt
+                )
+            
+            if not response.text:
+                raise GenerationError("Gemini returned an empty response")
+            
+            return self._sanitize_business_output(response.text.strip())
+        
+        except Exception as e:
+            ERRORS.inc(component="generator")
+            logger.error(f"Failed to generate analysis via Gemini: {str(e)}")
+            return "TECHNICAL ERROR: I encountered an issue connecting to the analysis engine. Please verify your API configuration and try again."
+    
+    def generate_answer_stream(self, prompt: str) -> Generator[str, None, StreamResult]:
+        """Stream the analysis from Gemini as sanitized text pieces.
+        
+        The generator returns this call's StreamResult (`result = yield from
+        ...`). An error after text was emitted ends the stream early without
+        an error message and with result.complete False, so callers know the
+        answer is truncated.
+        """
+        start = time.perf_counter()
+        result = StreamResult()
+        pieces = []
+        emitted = False
+        try:
+            logger.info("Streaming prompt to Gemini...")
+            response = self.client.models.generate_content_stream(
+                model=self.model_name,
+                contents=prompt
+            )
+            for piece in self._sanitize_stream(chunk.text for chunk in response if chunk.text):
+                if not emitted:
+                    result.time_to_first_token = time.perf_counter() - start
+                    LLM_FIRST_TOKEN_SECONDS.observe(result.time_to_first_token)
+                    emitted = True
+                pieces.append(piece)
+                yield piece
+            
+            if not emitted:
+                raise GenerationError("Gemini returned an empty response")
+            result.complete = True
+            logger.info("Business analysis streamed successfully via Gemini")
+        
+        except Exception as e:
+            ERRORS.inc(component="generator")
+            logger.error(f"Failed to stream analysis via Gemini: {str(e)}")
+            if not emitted:
+                error = "TECHNICAL ERROR: I encountered an issue connecting to the analysis engine. Please verify your API configuration and try again."
+                pieces.append(error)
+                yield error
+        finally:
+            result.total_time = time.perf_counter() - start
+            LLM_SECONDS.observe(result.total_time, mode="stream")
+        result.text = "".join(pieces)
+        return result
+    
+    def _sanitize_stream(self, pieces: Iterator[str]) -> Iterator[str]:
+        """Incremental _sanitize_business_output: same filtering, with the
+        leading/trailing whitespace strip applied across piece boundaries"""
+        started = False
+        pending_whitespace = ""
+        for piece in pieces:
+            piece = re.sub(r'[^\x00-\x7F]+', '', piece).replace('•', '-')
+            if not started:
+                piece = piece.lstrip()
+                if not piece:
+                    continue
+                started = True
+            # Hold back trailing whitespace until we know more text follows
+            body = piece.rstrip()
+            if body:
+                yield pending_whitespace + body
+                pending_whitespace = piece[len(body):]
+            else:
+                pending_whitespace += piece
+    
     def _sanitize_business_output(self, analysis: str) -> str:
         """Ensure the output is professional and emoji-free"""
         # Remove common emojis if they slipped through
@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.embedding_backend import embedding_model_id
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MANIFEST_VERSION = 1
+
+# Index status returned by check_manifest
+INDEX_MISSING = "missing"
+INDEX_CURRENT = "current"
+INDEX_DATA_CHANGED = "data_changed"
+INDEX_INCOMPATIBLE = "incompatible"
+
+
+def manifest_path(config) -> str:
+    return config.VECTOR_STORE_PATH + "_manifest.json"
+
+
+def build_settings(config) -> Dict[str, Any]:
+    """Settings that change the stored vectors or chunks; any difference means a full re-embed"""
+    return {
+        "embedding_model": embedding_model_id(config),
+        "chunk_size": config.CHUNK_SIZE,
+        "chunk_overlap": config.CHUNK_OVERLAP,
+        "index_type": config.INDEX_TYPE,
+        "index_storage": config.INDEX_STORAGE,
+        # "/segment": clusters never span product, market or date (earlier dedup builds did);
+        # "+cluster": near-duplicates keep their text and cluster id, so one can replace a removed kept chunk
+        "dedup": f"minhash{config.DEDUP_NUM_PERM}@{config.DEDUP_THRESHOLD:g}/segment+cluster" if config.DEDUP_ENABLED else "off",
+    }
+
+
+# Settings added after manifests were introduced, with the value older indexes were built with
+LEGACY_SETTINGS = {"index_storage": "float32", "dedup": "off"}
+
+
+def file_fingerprint(path: str, previous: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Size, mtime and SHA-256 of a data file.
+    
+    The file is only read when its size or mtime differ from `previous`, so
+    checking an unchanged dataset costs one stat() call.
+    """
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    fingerprint = {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+        fingerprint["sha256"] = previous["sha256"]
+        return fingerprint
+    
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+def new_manifest(config, data: Optional[Dict[str, Any]], rows: int, chunks: int,
+                 build_seconds: float, duplicate_chunks: int = 0) -> Dict[str, Any]:
+    return {
+        "version": MANIFEST_VERSION,
+        **build_settings(config),
+        "data": data,
+        "rows": rows,
+        "chunks": chunks,
+        "duplicate_chunks": duplicate_chunks,
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "build_seconds": round(build_seconds, 2),
+    }
+
+
+def read_manifest(config) -> Optional[Dict[str, Any]]:
+    path = manifest_path(config)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_manifest(config, manifest: Dict[str, Any]):
+    """Write the manifest aside, then swap it into place"""
+    path = manifest_path(config)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def check_manifest(config, manifest: Optional[Dict[str, Any]]) -> Tuple[str, List[str], Optional[Dict[str, Any]]]:
+    """Compare a saved index's manifest with the current settings and data file.
+    
+    Returns the status - INDEX_CURRENT, INDEX_DATA_CHANGED (an incremental
+    update suffices) or INDEX_INCOMPATIBLE (vectors or chunks differ, or
+    DATA_PATH names another dataset; only a full rebuild fixes it) - with
+    human-readable reasons and the current data file fingerprint.
+    """
+    if manifest is None:
+        # Saved before manifests existed: trust it rather than re-embed everything
+        return INDEX_CURRENT, ["index has no manifest; assuming it matches the current settings"], None
+    
+    reasons = [
+        f"{name}: index built with {manifest.get(name, LEGACY_SETTINGS.get(name))!r}, configured {value!r}"
+        for name, value in build_settings(config).items()
+        if manifest.get(name, LEGACY_SETTINGS.get(name)) != value
+    ]
+    if reasons:
+        return INDEX_INCOMPATIBLE, reasons, None
+    
+    saved_data = manifest.get("data")
+    if saved_data is None:
+        return INDEX_CURRENT, ["index was built without a data file fingerprint"], None
+    if os.path.abspath(config.DATA_PATH) != saved_data["path"]:
+        return INDEX_INCOMPATIBLE, [f"data path: index built from {saved_data['path']!r}, "
+                                    f"configured {os.path.abspath(config.DATA_PATH)!r}"], None
+    data = file_fingerprint(config.DATA_PATH, saved_data)
+    if data is None:
+        return INDEX_CURRENT, [f"data file {config.DATA_PATH} not found; using the saved index"], None
+    if data["sha256"] != saved_data["sha256"]:
+        return INDEX_DATA_CHANGED, [f"data file {config.DATA_PATH} changed since the index was built"], data
+    return INDEX_CURRENT, [], data
@@ -1,102 +1,501 @@
 import os
+import glob
+import time
 import pickle
-import pandas as pd
-from typing import Dict, List, Any
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
+import shutil
+import hashlib
+from typing import TYPE_CHECKING, Dict, List, Any, Iterator, Optional, Tuple
 import faiss
 import numpy as np
 
+from src.metadata_store import MetadataStore, MetadataStoreBuilder
+from src.embedding_backend import load_embedding_model
+from src.embedding_cache import EmbeddingCache, open_embedding_cache, text_key
+from src.index_manifest import (INDEX_MISSING, INDEX_DATA_CHANGED, INDEX_INCOMPATIBLE, check_manifest,
+                                file_fingerprint, new_manifest, read_manifest, write_manifest)
+from src.sparse_index import BM25Index, BM25Builder
+from src.themes import ThemeMatcher, ThemeCube, theme_cube_path
+from src.date_index import DateIndex, date_index_path
+from src.dedup import NearDuplicateIndex
+from src.sharding import assign_shards, read_layout, shard_config, with_markets, write_layout
+from src.vector_index import create_index, train_index, configure_search, buffer_dtype
 from src.utils.exceptions import IndexingError
 from src.utils.logger import setup_logger
+from src.utils.timing import PhaseTimer
+
+if TYPE_CHECKING:
+    # Type hints only: loading a saved index needs neither pandas nor torch
+    import pandas as pd
+    from sentence_transformers import SentenceTransformer
 
 logger = setup_logger(__name__)
 
-from src.preprocessing import map_product_to_group
 import random
 
 class ComplaintIndexer:
-    def __init__(self, config):
+    def __init__(self, config, model: Optional["SentenceTransformer"] = None):
         self.config = config
-        self.model = SentenceTransformer(config.EMBEDDING_MODEL_NAME)
-        self.splitter = RecursiveCharacterTextSplitter(
-            chunk_size=config.CHUNK_SIZE,
-            chunk_overlap=config.CHUNK_OVERLAP
-        )
+        # An already loaded (or benchmark stand-in) embedding model can be passed in
+        self._model = model
+        self._splitter = None
+        self._theme_matcher = None
         self.index = None
         self.metadatas = []
+        self.build_stats = {}
+        self._pending_embeddings = []
+        self._expected_chunks = 0
+        self.embedding_cache = None
+        # BM25 keyword index over the same rows, kept when RETRIEVAL_MODE is hybrid
+        self.sparse_index = None
+        # What the saved index was built from (settings, data file fingerprint, sizes)
+        self.manifest = None
+        self.data_fingerprint = None
+        # Exact complaint counts by product x market x month x theme
+        self.theme_cube = None
+        # Complaint dates as sorted epoch days, for date range filters
+        self.date_index = None
+        # Metadata and text (no vectors) of near-duplicate chunks left out of the index, so counts still
+        # include them and one can take the place of its kept chunk when that is removed
+        self.duplicates = None
+    
+    @property
+    def model(self):
+        """Embedding model, loaded on first use"""
+        if self._model is None:
+            self._model = load_embedding_model(self.config)
+        return self._model
+    
+    @property
+    def splitter(self):
+        """Text splitter, created on first use"""
+        if self._splitter is None:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+            self._splitter = RecursiveCharacterTextSplitter(
+                chunk_size=self.config.CHUNK_SIZE,
+                chunk_overlap=self.config.CHUNK_OVERLAP
+            )
+        return self._splitter
     
-    def build_index(self, df: pd.DataFrame, text_col: str = "cleaned_narrative"):
-        """Build FAISS index from dataframe"""
+    @property
+    def theme_matcher(self) -> ThemeMatcher:
+        """Theme keyword automaton, built on first use"""
+        if self._theme_matcher is None:
+            self._theme_matcher = ThemeMatcher()
+        return self._theme_matcher
+    
+    def build_index(self, df: "pd.DataFrame", text_col: str = "cleaned_narrative"):
+        """Build FAISS index from dataframe, streaming row batches through chunking and embedding"""
         try:
-            texts, metadatas = [], []
-            markets = ["Kenya", "Uganda", "Tanzania", "Rwanda"]
+            start_time = time.perf_counter()
+            self.index = None
+            self._pending_embeddings = []
+            self._expected_chunks = 0
+            builder = MetadataStoreBuilder()
+            sparse_builder = self._new_sparse_builder() if self._hybrid_enabled() else None
+            batch_rows = self.config.BUILD_BATCH_ROWS
+            num_chunks = 0
+            
+            # Near-duplicates are dropped before embedding, so they cost neither encode time nor index space
+            dedup = self._new_dedup()
+            duplicate_counts: List[int] = []
+            cluster_ids: List[int] = []
+            duplicates_builder = MetadataStoreBuilder()
             
-            for i, row in df.iterrows():
-                # Get the narrative text (use cleaned version if available)
-                narrative = row.get(text_col, row.get('Consumer complaint narrative', ''))
-                if not narrative or not isinstance(narrative, str):
+            for batch_start in range(0, len(df), batch_rows):
+                batch = df.iloc[batch_start:batch_start + batch_rows]
+                texts, records = self._chunk_batch(batch, text_col)
+                if dedup is not None:
+                    texts, records = self._drop_duplicates(dedup, texts, records, duplicate_counts,
+                                                           cluster_ids, duplicates_builder)
+                if not texts:
                     continue
-                    
-                chunks = self.splitter.split_text(narrative)
                 
-                # Determine product group and simulated market
-                orig_product = row.get('Product', 'Unknown')
-                product_group = map_product_to_group(orig_product)
+                # Rough corpus size estimate, used to size IVF indexes before training
+                rows_seen = batch_start + len(batch)
+                self._expected_chunks = int((num_chunks + len(texts)) * len(df) / rows_seen)
                 
-                # Use existing market column if it exists, otherwise simulate East African context
-                market = row.get('market', random.choice(markets))
+                embeddings = self._embed_texts(texts)
+                self._add_embeddings(embeddings)
+                builder.add_many(records)
+                if sparse_builder is not None:
+                    sparse_builder.add_many(texts)
+                num_chunks += len(texts)
                 
-                for chunk in chunks:
-                    texts.append(chunk)
-                    metadatas.append({
-                        "complaint_id": row.get('Complaint ID', row.get('complaint_id', f'CT_{i}')),
-                        "product": product_group,
-                        "original_product": orig_product,
-                        "market": market,
-                        "date": row.get('Date received', row.get('date', 'Unknown')),
-                        "severity": row.get('severity', 'Medium'),
-                        "channel": row.get('Submitted via', row.get('channel', 'In-app')),
-                        "text_chunk": chunk,
-                    })
-            logger.info(f"Generated {len(texts)} chunks from {len(df)} complaints")
-            
-            # Create embeddings
-            logger.info("Generating embeddings...")
-            embeddings = self.model.encode(texts, show_progress_bar=True)
-            
-            # Create FAISS index
-            self._create_index(embeddings, metadatas)
-            logger.info("Index built successfully")
+                elapsed = time.perf_counter() - start_time
+                logger.info(f"Indexed {rows_seen}/{len(df)} complaints, {num_chunks} chunks "
+                            f"({num_chunks / elapsed:.1f} chunks/sec)")
+            
+            if num_chunks == 0:
+                raise IndexingError("No complaint narratives to index")
+            
+            # Flush anything still buffered for index training
+            self._add_embeddings(None, flush=True)
+            self._flush_embedding_cache()
+            self.metadatas = builder.build()
+            self.duplicates = None
+            if dedup is not None:
+                self.metadatas.with_column("duplicates", duplicate_counts)
+                self.duplicates = duplicates_builder.build()
+            self.sparse_index = sparse_builder.build() if sparse_builder is not None else None
+            self.theme_cube = ThemeCube.from_store(self._counted_store())
+            self.date_index = DateIndex.from_metadata(self.metadatas)
+            
+            elapsed = time.perf_counter() - start_time
+            self.build_stats = {
+                "complaints": len(df),
+                "chunks": num_chunks,
+                "seconds": elapsed,
+                "chunks_per_sec": num_chunks / elapsed if elapsed > 0 else 0.0,
+                "cache_hits": self.embedding_cache.hits if self.embedding_cache else 0,
+                "cache_misses": self.embedding_cache.misses if self.embedding_cache else num_chunks,
+                "duplicate_chunks": dedup.duplicates if dedup is not None else 0,
+                "duplicate_rate": dedup.duplicate_rate if dedup is not None else 0.0,
+            }
+            logger.info(f"Generated {num_chunks} chunks from {len(df)} complaints")
+            if dedup is not None:
+                logger.info(f"Near-duplicate chunks: {dedup.duplicates} of {num_chunks + dedup.duplicates} "
+                            f"({dedup.duplicate_rate:.1%}) left out of the index and counted on their representative")
+            logger.info(f"Index built successfully in {elapsed:.1f}s ({self.build_stats['chunks_per_sec']:.1f} chunks/sec)")
             
         except Exception as e:
             raise IndexingError(f"Failed to build index: {str(e)}")
     
-    def _create_index(self, embeddings: np.ndarray, metadatas: List[Dict]):
-        """Create and populate FAISS index"""
-        embedding_dim = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(embedding_dim)
-        self.index.add(embeddings.astype('float32'))
-        self.metadatas = metadatas
+    @staticmethod
+    def _drop_duplicates(dedup: NearDuplicateIndex, texts: List[str], records: List[Dict],
+                         duplicate_counts: List[int], cluster_ids: List[int],
+                         duplicates_builder: MetadataStoreBuilder, cluster_offset: int = 0) -> Tuple[List[str], List[Dict]]:
+        """Keep the chunks that start a near-duplicate cluster; count the others on their cluster's kept chunk.
+        
+        Chunks only cluster within the same product, market and date (see
+        _dedup_segment), so product, market and date filters match a
+        near-duplicate exactly when they match the chunk it is counted on.
+        `duplicate_counts` and `cluster_ids` hold one entry per cluster, in
+        cluster order; new clusters are appended to them. A cluster's id is
+        the index row of the chunk that started it (`cluster_offset` plus the
+        cluster number for clusters started here), and the near-duplicates
+        keep it in their "cluster" column; kept chunks that started their
+        cluster store -1 there (see _cluster_ids).
+        """
+        kept_texts, kept_records = [], []
+        for text, record in zip(texts, records):
+            cluster = dedup.add(text, _dedup_segment(record))
+            if cluster is None:
+                cluster_ids.append(cluster_offset + len(cluster_ids))
+                kept_texts.append(text)
+                kept_records.append({**record, "cluster": -1})
+                duplicate_counts.append(0)
+            else:
+                duplicate_counts[cluster] += 1
+                duplicates_builder.add({**record, "cluster": cluster_ids[cluster]})
+        return kept_texts, kept_records
+    
+    def _chunk_batch(self, batch: "pd.DataFrame", text_col: str) -> Tuple[List[str], List[Dict]]:
+        """Split a batch of complaints into chunks and their metadata records"""
+        # Imported here: src.preprocessing pulls in pandas, which loading an index does not need
+        from src.preprocessing import map_product_to_group
+        narratives = self._column(batch, [text_col, 'Consumer complaint narrative'], '')
+        orig_products = self._column(batch, ['Product'], 'Unknown')
+        
+        # Map each distinct product once instead of per row
+        product_groups = {p: map_product_to_group(str(p)) for p in set(orig_products)}
+        
+        # Use existing market column if it exists, otherwise simulate East African context
+        if 'market' in batch.columns:
+            markets = batch['market'].tolist()
+        else:
+            markets = random.choices(self.config.MARKETS, k=len(batch))
+        
+        complaint_ids = self._column(batch, ['Complaint ID', 'complaint_id'], None)
+        complaint_ids = [cid if cid is not None else f'CT_{i}' for cid, i in zip(complaint_ids, batch.index)]
+        dates = self._column(batch, ['Date received', 'date'], 'Unknown')
+        severities = self._column(batch, ['severity'], 'Medium')
+        channels = self._column(batch, ['Submitted via', 'channel'], 'In-app')
+        
+        texts, records = [], []
+        for row in range(len(batch)):
+            narrative = narratives[row]
+            if not narrative or not isinstance(narrative, str):
+                continue
+            
+            narrative_hash = _narrative_hash(narrative)
+            for chunk in self.splitter.split_text(narrative):
+                texts.append(chunk)
+                records.append({
+                    "complaint_id": complaint_ids[row],
+                    "product": product_groups[orig_products[row]],
+                    "original_product": orig_products[row],
+                    "market": markets[row],
+                    "date": dates[row],
+                    "severity": severities[row],
+                    "channel": channels[row],
+                    "narrative_hash": narrative_hash,
+                    # Theme bitmask; dictionary-encoded, so one small code per chunk
+                    "themes": self.theme_matcher.match(chunk),
+                    "text_chunk": chunk,
+                })
+        return texts, records
+    
+    @staticmethod
+    def _column(batch: "pd.DataFrame", names: List[str], default: Any) -> List[Any]:
+        """First of the candidate columns present in the batch, as a list"""
+        for name in names:
+            if name in batch.columns:
+                column = batch[name].astype(object)
+                return column.where(column.notna(), default).tolist()
+        return [default] * len(batch)
+    
+    def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embed texts, reusing cached vectors and encoding the rest in length-sorted batches"""
+        batch_size = self.config.EMBED_BATCH_SIZE
+        dim = self.model.get_sentence_embedding_dimension()
+        cache = self._get_embedding_cache(dim)
+        
+        if cache is None:
+            keys = None
+            embeddings = np.empty((len(texts), dim), dtype=buffer_dtype(self.config))
+            missing = list(range(len(texts)))
+        else:
+            keys = [text_key(t) for t in texts]
+            embeddings, missing = cache.get_many(keys, dtype=buffer_dtype(self.config))
+        
+        # Similar lengths per batch keep padding to a minimum
+        order = np.array(sorted(missing, key=lambda i: len(texts[i])), dtype=np.int64)
+        for start in range(0, len(order), batch_size):
+            batch_ids = order[start:start + batch_size]
+            embeddings[batch_ids] = self.model.encode(
+                [texts[i] for i in batch_ids], batch_size=batch_size, show_progress_bar=False
+            )
+        
+        if cache is not None and missing:
+            cache.put_many([keys[i] for i in missing], embeddings[missing])
+        return embeddings
+    
+    def _get_embedding_cache(self, dim: int) -> Optional[EmbeddingCache]:
+        """Open the persistent embedding cache on first use"""
+        if self.embedding_cache is None and self.config.EMBEDDING_CACHE_PATH:
+            self.embedding_cache = open_embedding_cache(self.config, dim)
+        return self.embedding_cache
+    
+    def _flush_embedding_cache(self):
+        if self.embedding_cache is not None:
+            self.embedding_cache.flush()
+            logger.info(f"Embedding cache: {self.embedding_cache.hits} hits, "
+                        f"{self.embedding_cache.misses} misses, {len(self.embedding_cache)} vectors stored")
+    
+    def _add_embeddings(self, embeddings: Optional[np.ndarray], flush: bool = False):
+        """Append embeddings to the index, buffering a training sample first if the index needs one"""
+        if embeddings is not None:
+            self._pending_embeddings.append(np.ascontiguousarray(embeddings, dtype=buffer_dtype(self.config)))
+        if not self._pending_embeddings:
+            return
+        
+        if self.index is None:
+            dim = self._pending_embeddings[0].shape[1]
+            # IVF training only ever sees up to INDEX_TRAIN_SAMPLE vectors
+            num_training = min(max(self._expected_chunks, 1), self.config.INDEX_TRAIN_SAMPLE)
+            self.index = create_index(dim, self.config, num_training)
+        
+        if not self.index.is_trained:
+            buffered = sum(len(e) for e in self._pending_embeddings)
+            if buffered < self.config.INDEX_TRAIN_SAMPLE and not flush:
+                return
+            train_index(self.index, np.concatenate(self._pending_embeddings), self.config)
+        
+        for pending in self._pending_embeddings:
+            self.index.add(np.ascontiguousarray(pending, dtype='float32'))
+        self._pending_embeddings = []
     
     def save(self):
         """Save index and metadata to disk"""
         try:
             os.makedirs(os.path.dirname(self.config.VECTOR_STORE_PATH), exist_ok=True)
             
-            # Save FAISS index
-            faiss.write_index(self.index, self.config.VECTOR_STORE_PATH + ".index")
+            # Save FAISS index (written aside, then swapped in)
+            faiss.write_index(self.index, self.config.VECTOR_STORE_PATH + ".index.tmp")
+            os.replace(self.config.VECTOR_STORE_PATH + ".index.tmp", self.config.VECTOR_STORE_PATH + ".index")
+            
+            # Save metadata as a columnar store
+            self._as_store().save(self.config.VECTOR_STORE_PATH + "_meta")
+            
+            # BM25 postings sit next to the .index file; drop stale ones from an earlier hybrid build
+            if self.sparse_index is not None:
+                self.sparse_index.save(self.config.VECTOR_STORE_PATH + "_bm25")
+            elif os.path.isdir(self.config.VECTOR_STORE_PATH + "_bm25"):
+                shutil.rmtree(self.config.VECTOR_STORE_PATH + "_bm25")
+            
+            if self.theme_cube is not None:
+                self.theme_cube.save(theme_cube_path(self.config))
+            if self.date_index is not None:
+                self.date_index.save(date_index_path(self.config))
+            if self.duplicates is not None:
+                self.duplicates.save(self.config.VECTOR_STORE_PATH + "_dups")
+            elif os.path.isdir(self.config.VECTOR_STORE_PATH + "_dups"):
+                shutil.rmtree(self.config.VECTOR_STORE_PATH + "_dups")
+            
+            # A full save already contains every incremental delta
+            for delta_dir in self._delta_dirs():
+                shutil.rmtree(delta_dir)
             
-            # Save metadata
-            with open(self.config.VECTOR_STORE_PATH + "_meta.pkl", "wb") as f:
-                pickle.dump(self.metadatas, f)
+            # Written last: a manifest only ever describes a complete index
+            self.manifest = new_manifest(self.config, self.data_fingerprint,
+                                         self.build_stats.get("complaints", 0), self.live_chunks(),
+                                         self.build_stats.get("seconds", 0.0),
+                                         self.build_stats.get("duplicate_chunks", 0))
+            write_manifest(self.config, self.manifest)
             
             logger.info(f"Saved index to {self.config.VECTOR_STORE_PATH}.index")
-            logger.info(f"Saved metadata to {self.config.VECTOR_STORE_PATH}_meta.pkl")
+            logger.info(f"Saved metadata to {self.config.VECTOR_STORE_PATH}_meta/")
             
         except Exception as e:
             raise IndexingError(f"Failed to save index: {str(e)}")
     
+    def load_or_build(self, rebuild: bool = False, timer: Optional[PhaseTimer] = None) -> str:
+        """Load the saved index, updating or rebuilding it only when its manifest shows a change.
+        
+        A changed data file is applied as an incremental update: complaints
+        no longer in it are removed, new and edited ones embedded. A change of
+        DATA_PATH, embedding model, chunking or index type needs a full re-embed, which
+        only happens with `rebuild` or INDEX_AUTO_REBUILD; otherwise this
+        raises. Returns the index status that was found.
+        """
+        timer = timer or PhaseTimer()
+        if self.config.SHARD_COUNT > 1:
+            return self._load_or_build_shards(rebuild, timer)
+        if rebuild or not self.index_exists(self.config):
+            status, reasons, data = INDEX_MISSING, ["rebuild requested" if rebuild else "no saved index"], None
+        else:
+            status, reasons, data = check_manifest(self.config, read_manifest(self.config))
+        for reason in reasons:
+            logger.info(f"Index check: {reason}")
+        
+        if status == INDEX_INCOMPATIBLE and not self.config.INDEX_AUTO_REBUILD:
+            raise IndexingError(f"Saved index does not match the current settings ({'; '.join(reasons)}). "
+                                f"Rebuild it with --rebuild-index or INDEX_AUTO_REBUILD=true "
+                                f"(re-embeds the whole dataset), or restore the previous settings")
+        
+        if status in (INDEX_MISSING, INDEX_INCOMPATIBLE):
+            with timer.phase("dataset"):
+                # Fingerprint before reading, so a file changed mid-build is caught next start
+                self.data_fingerprint = file_fingerprint(self.config.DATA_PATH)
+                df = self._load_dataset()
+            with timer.phase("index build"):
+                logger.info("Building new business intelligence index...")
+                self.build_index(df)
+                self.save()
+            return status
+        
+        with timer.phase("index load"):
+            logger.info("Loading existing business index...")
+            self.load()
+        
+        if status == INDEX_DATA_CHANGED:
+            with timer.phase("dataset"):
+                df = self._load_dataset()
+            with timer.phase("index update"):
+                self._remove_missing_complaints(df)
+                self.add_complaints(df)
+            self._update_manifest(data, rows=len(df))
+        elif data is not None and data != self.data_fingerprint:
+            # Same content with a new mtime: record it so the next start skips hashing the file
+            self._update_manifest(data)
+        return status
+    
+    def build_shards(self, df: "pd.DataFrame", text_col: str = "cleaned_narrative") -> List[Dict[str, Any]]:
+        """Partition complaints over SHARD_COUNT shards and build and save a complete index per shard"""
+        try:
+            start_time = time.perf_counter()
+            if self.config.SHARD_BY == "market":
+                df = with_markets(df, self.config.MARKETS)
+            assignment = assign_shards(df, self.config.SHARD_COUNT, self.config.SHARD_BY, self.config.MARKETS)
+            
+            shards, cubes = [], []
+            for shard in range(self.config.SHARD_COUNT):
+                part = df[assignment == shard]
+                if not len(part):
+                    logger.warning(f"Shard {shard} has no complaints; skipping it")
+                    continue
+                # Shards share the embedding model and the embedding cache
+                shard_indexer = ComplaintIndexer(shard_config(self.config, shard), model=self.model)
+                shard_indexer.build_index(part, text_col)
+                shard_indexer.save()
+                markets = sorted({str(m).lower() for m in part['market']}) if 'market' in part.columns else []
+                date_index = shard_indexer.date_index
+                dates = ([date_index.earliest.isoformat(), date_index.latest.isoformat()]
+                         if date_index is not None and date_index.latest is not None else None)
+                shards.append({"shard": shard, "complaints": len(part), "chunks": shard_indexer.index.ntotal,
+                               "duplicate_chunks": shard_indexer.build_stats.get("duplicate_chunks", 0),
+                               "markets": markets, "dates": dates})
+                cubes.append(shard_indexer.theme_cube)
+                logger.info(f"Shard {shard}: {len(part)} complaints, {shard_indexer.index.ntotal} chunks")
+            if not shards:
+                raise IndexingError("No complaint narratives to index")
+            self._remove_stale_shards({shard["shard"] for shard in shards})
+            # Complaints never span shards, so the shard cubes add up to the whole dataset's
+            self.theme_cube = ThemeCube.merge(cubes)
+            self.theme_cube.save(theme_cube_path(self.config))
+            
+            elapsed = time.perf_counter() - start_time
+            self.build_stats = {"complaints": len(df), "chunks": sum(s["chunks"] for s in shards),
+                                "duplicate_chunks": sum(s["duplicate_chunks"] for s in shards),
+                                "shards": len(shards), "seconds": elapsed}
+            write_layout(self.config, shards, new_manifest(self.config, self.data_fingerprint, len(df),
+                                                           self.build_stats["chunks"], elapsed,
+                                                           self.build_stats["duplicate_chunks"]))
+            return shards
+        
+        except Exception as e:
+            raise IndexingError(f"Failed to build shards: {str(e)}")
+    
+    def _load_or_build_shards(self, rebuild: bool, timer: PhaseTimer) -> str:
+        """load_or_build for a sharded index; shards are opened by the retriever's worker processes"""
+        layout = None if rebuild else read_layout(self.config)
+        if layout is None:
+            status, reasons, data = INDEX_MISSING, ["rebuild requested" if rebuild else "no saved shards"], None
+        else:
+            status, reasons, data = check_manifest(self.config, layout)
+            if (layout["num_shards"], layout["shard_by"]) != (self.config.SHARD_COUNT, self.config.SHARD_BY):
+                status = INDEX_INCOMPATIBLE
+                reasons.append(f"shards: built as {layout['num_shards']} by {layout['shard_by']}, "
+                               f"configured {self.config.SHARD_COUNT} by {self.config.SHARD_BY}")
+        for reason in reasons:
+            logger.info(f"Index check: {reason}")
+        
+        if status == INDEX_INCOMPATIBLE and not self.config.INDEX_AUTO_REBUILD:
+            raise IndexingError(f"Saved shards do not match the current settings ({'; '.join(reasons)}). "
+                                f"Rebuild them with --rebuild-index or INDEX_AUTO_REBUILD=true "
+                                f"(re-embeds the whole dataset), or restore the previous settings")
+        if status == INDEX_DATA_CHANGED:
+            # Complaints can move between shards, so shards are rebuilt; the embedding cache
+            # still limits embedding to new and changed chunks
+            logger.info("Data file changed; rebuilding shards")
+        elif status not in (INDEX_MISSING, INDEX_INCOMPATIBLE):
+            return status
+        
+        with timer.phase("dataset"):
+            self.data_fingerprint = file_fingerprint(self.config.DATA_PATH)
+            df = self._load_dataset()
+        with timer.phase("index build"):
+            self.build_shards(df)
+        return status
+    
+    def _remove_stale_shards(self, keep: set):
+        """Delete files of shards left over from an earlier build with more shards"""
+        prefix = self.config.VECTOR_STORE_PATH + "_shard_"
+        for path in glob.glob(prefix + "[0-9][0-9][0-9]*"):
+            shard = int(path[len(prefix):len(prefix) + 3])
+            if shard in keep:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+    
+    @staticmethod
+    def index_exists(config) -> bool:
+        """Whether a saved index and its metadata are on disk, so startup can skip the dataset"""
+        path = config.VECTOR_STORE_PATH
+        return os.path.exists(path + ".index") and (os.path.isdir(path + "_meta") or os.path.exists(path + "_meta.pkl"))
+    
     def load(self):
         """Load index and metadata from disk"""
         try:
@@ -104,11 +503,464 @@ class ComplaintIndexer:
                 raise IndexingError("Index file not found")
             
             self.index = faiss.read_index(self.config.VECTOR_STORE_PATH + ".index")
+            configure_search(self.index, self.config)
             
-            with open(self.config.VECTOR_STORE_PATH + "_meta.pkl", "rb") as f:
-                self.metadatas = pickle.load(f)
+            if os.path.isdir(self.config.VECTOR_STORE_PATH + "_meta"):
+                self.metadatas = MetadataStore.load(self.config.VECTOR_STORE_PATH + "_meta")
+            else:
+                # Legacy list-of-dicts metadata written by older builds
+                with open(self.config.VECTOR_STORE_PATH + "_meta.pkl", "rb") as f:
+                    self.metadatas = pickle.load(f)
+            
+            self.manifest = read_manifest(self.config)
+            self.data_fingerprint = self.manifest.get("data") if self.manifest else None
+            
+            self.duplicates = None
+            if os.path.isdir(self.config.VECTOR_STORE_PATH + "_dups"):
+                self.duplicates = MetadataStore.load(self.config.VECTOR_STORE_PATH + "_dups")
+            
+            self.sparse_index = None
+            if self._hybrid_enabled() and os.path.isdir(self.config.VECTOR_STORE_PATH + "_bm25"):
+                self.sparse_index = BM25Index.load(self.config.VECTOR_STORE_PATH + "_bm25",
+                                                   self.config.BM25_MAX_POSTINGS)
+            
+            # Replay incremental updates written since the last full save
+            delta_dirs = self._delta_dirs()
+            for delta_dir in delta_dirs:
+                duplicate_tombstones = os.path.join(delta_dir, "duplicate_tombstones.npy")
+                duplicate_store = os.path.join(delta_dir, "duplicates_meta")
+                duplicate_increments = os.path.join(delta_dir, "duplicate_increments.npy")
+                self._apply_delta(
+                    np.load(os.path.join(delta_dir, "vectors.npy")),
+                    MetadataStore.load(os.path.join(delta_dir, "meta")),
+                    np.load(os.path.join(delta_dir, "tombstones.npy")),
+                    np.load(duplicate_tombstones) if os.path.exists(duplicate_tombstones) else None,
+                    MetadataStore.load(duplicate_store) if os.path.isdir(duplicate_store) else None,
+                    np.load(duplicate_increments) if os.path.exists(duplicate_increments) else None
+                )
+            if delta_dirs:
+                logger.info(f"Applied {len(delta_dirs)} incremental index deltas")
+            
+            # The saved cube predates any delta; recount from the metadata then
+            self.theme_cube = None if delta_dirs else ThemeCube.load(theme_cube_path(self.config))
+            if self.theme_cube is None and isinstance(self.metadatas, MetadataStore):
+                self.theme_cube = ThemeCube.from_store(self._counted_store())
+            if self.theme_cube is None:
+                logger.info("Index has no theme tags; rebuild it for exact theme counts")
+            
+            # Likewise the date index, which also predates indexes saved without one
+            self.date_index = None if delta_dirs else DateIndex.load(date_index_path(self.config))
+            if self.date_index is None or len(self.date_index) != len(self.metadatas):
+                self.date_index = DateIndex.from_metadata(self.metadatas)
+            
+            # Hybrid mode on an index saved without (or with stale) BM25 postings
+            if self._hybrid_enabled() and (self.sparse_index is None or len(self.sparse_index) != self.index.ntotal):
+                logger.info("Building BM25 index from stored chunk text...")
+                sparse_builder = self._new_sparse_builder()
+                sparse_builder.add_many(self._chunk_texts(self.metadatas))
+                self.sparse_index = sparse_builder.build()
             
             logger.info("Index loaded successfully")
             
         except Exception as e:
-            raise IndexingError(f"Failed to load index: {str(e)}")
\ No newline at end of file
+            raise IndexingError(f"Failed to load index: {str(e)}")
+    
+    def add_complaints(self, df: "pd.DataFrame", text_col: str = "cleaned_narrative") -> Dict[str, int]:
+        """Embed only new or changed complaints and persist them as an index delta"""
+        try:
+            if self.index is None:
+                raise IndexingError("Load or build an index before adding complaints")
+            
+            stored_hashes = self._stored_narrative_hashes()
+            narratives = self._column(df, [text_col, 'Consumer complaint narrative'], '')
+            complaint_ids = self._column(df, ['Complaint ID', 'complaint_id'], None)
+            
+            rows, changed_ids = [], []
+            stats = {"new": 0, "changed": 0, "unchanged": 0, "skipped": 0}
+            for pos, (complaint_id, narrative) in enumerate(zip(complaint_ids, narratives)):
+                if complaint_id is None or not narrative or not isinstance(narrative, str):
+                    stats["skipped"] += 1
+                    continue
+                key = str(complaint_id)
+                if key not in stored_hashes:
+                    stats["new"] += 1
+                    rows.append(pos)
+                elif stored_hashes[key] is not None and stored_hashes[key] != _narrative_hash(narrative):
+                    stats["changed"] += 1
+                    rows.append(pos)
+                    changed_ids.append(complaint_id)
+                else:
+                    stats["unchanged"] += 1
+            
+            # Chunks of changed complaints are superseded by the re-embedded version, written as a delta of its own
+            # first; if the update stops in between, the next one sees those complaints as new and re-adds them
+            stats["chunks_removed"] = self.remove_complaints(changed_ids) if changed_ids else 0
+            embeddings, delta_store, duplicate_store, duplicate_increments = self._embed_rows(df.iloc[rows], text_col)
+            stats["chunks_added"] = len(delta_store)
+            if duplicate_store is not None:
+                stats["duplicate_chunks"] = len(duplicate_store)
+            
+            if rows:
+                self._write_delta(embeddings, delta_store, np.zeros(0, dtype=np.int64), None,
+                                  duplicate_store, duplicate_increments)
+            logger.info(f"Incremental update: {stats}")
+            return stats
+        
+        except Exception as e:
+            raise IndexingError(f"Failed to add complaints: {str(e)}")
+    
+    def remove_complaints(self, complaint_ids: List[Any]) -> int:
+        """Tombstone every chunk of the given complaints and persist the delta.
+        
+        A removed chunk that stood for near-duplicates of other complaints
+        is replaced by one of them (see _promote_duplicates), which is
+        embedded and indexed in the same delta.
+        """
+        try:
+            tombstones = self._live_rows_for(complaint_ids)
+            duplicate_tombstones = self._live_duplicate_rows_for(complaint_ids)
+            if len(tombstones) or len(duplicate_tombstones):
+                records, promoted, increments = self._promote_duplicates(tombstones, duplicate_tombstones)
+                embeddings = np.zeros((0, self.index.d), dtype=buffer_dtype(self.config))
+                if records:
+                    embeddings = self._embed_texts([record["text_chunk"] for record in records])
+                    self._flush_embedding_cache()
+                    logger.info(f"Promoted {len(records)} near-duplicate chunks in place of removed ones")
+                self._write_delta(embeddings, MetadataStore.from_records(records), tombstones,
+                                  np.union1d(duplicate_tombstones, promoted), duplicate_increments=increments)
+            logger.info(f"Removed {len(tombstones)} chunks for {len(complaint_ids)} complaints")
+            return len(tombstones)
+        
+        except Exception as e:
+            raise IndexingError(f"Failed to remove complaints: {str(e)}")
+    
+    def _promote_duplicates(self, tombstones: np.ndarray, duplicate_tombstones: np.ndarray
+                            ) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray]:
+        """Pick a surviving near-duplicate to take the place of each kept chunk in `tombstones`.
+        
+        Returns the records (text included) to index for the promoted
+        near-duplicates, their rows in the near-duplicates store, and
+        (row, count) pairs for kept chunks that stay but lose near-duplicates
+        in `duplicate_tombstones`.
+        """
+        none = [], np.zeros(0, dtype=np.int64), np.zeros((0, 2), dtype=np.int64)
+        store = self._as_store()
+        clusters = _cluster_ids(store)
+        if clusters is None or self.duplicates is None or not len(self.duplicates):
+            return none
+        duplicate_clusters = _cluster_ids(self.duplicates)
+        surviving = self.duplicates.live_mask()
+        surviving = np.ones(len(self.duplicates), dtype=bool) if surviving is None else surviving
+        surviving[np.asarray(duplicate_tombstones, dtype=np.int64)] = False
+        
+        removed = set(clusters[tombstones].tolist())
+        records, promoted = [], []
+        for cluster in sorted(removed):
+            rows = np.flatnonzero(surviving & (duplicate_clusters == cluster))
+            if len(rows):
+                # The promoted chunk keeps the cluster id, so the others stay counted on it
+                record = self.duplicates.row(int(rows[0]))
+                record["cluster"] = cluster
+                record["duplicates"] = len(rows) - 1
+                records.append(record)
+                promoted.append(int(rows[0]))
+        
+        live = store.live_mask()
+        live = np.ones(len(store), dtype=bool) if live is None else live
+        live[tombstones] = False
+        increments = []
+        lost_clusters, lost = np.unique(duplicate_clusters[np.asarray(duplicate_tombstones, dtype=np.int64)],
+                                        return_counts=True)
+        for cluster, count in zip(lost_clusters.tolist(), lost.tolist()):
+            rows = np.flatnonzero(live & (clusters == cluster)) if cluster not in removed else []
+            if len(rows):
+                increments.append((int(rows[0]), -count))
+        return records, np.array(promoted, dtype=np.int64), np.array(increments, dtype=np.int64).reshape(-1, 2)
+    
+    def ingest(self, csv_path: str) -> Dict[str, int]:
+        """Index the new or changed complaints of a CSV drop and record the update in the manifest.
+        
+        Ingesting DATA_PATH itself updates the index the way load_or_build
+        does (complaints no longer in it are removed too) and records its
+        fingerprint, so the next start finds the index current. Complaints
+        ingested from another file stay until DATA_PATH next changes.
+        """
+        from src.preprocessing import load_complaints, preprocess_dataset
+        if os.path.abspath(csv_path) != os.path.abspath(self.config.DATA_PATH):
+            df = preprocess_dataset(load_complaints(csv_path))
+            stats = self.add_complaints(df)
+            self._update_manifest(self.data_fingerprint)
+            return stats
+        
+        # Fingerprint before reading, so a file changed mid-update is caught next start
+        data = file_fingerprint(csv_path, self.data_fingerprint)
+        df = preprocess_dataset(load_complaints(csv_path))
+        self._remove_missing_complaints(df)
+        stats = self.add_complaints(df)
+        self._update_manifest(data, rows=len(df))
+        return stats
+    
+    def remove_and_record(self, complaint_ids: List[Any]) -> int:
+        """remove_complaints, then record the new chunk counts in the manifest"""
+        removed = self.remove_complaints(complaint_ids)
+        self._update_manifest(self.data_fingerprint)
+        return removed
+    
+    def _remove_missing_complaints(self, df: "pd.DataFrame") -> int:
+        """Remove stored complaints whose id no longer appears in `df`, so an update never keeps stale ones"""
+        if not any(column in df.columns for column in ('Complaint ID', 'complaint_id')):
+            logger.warning("Data file has no complaint IDs; stored complaints cannot be matched and are kept")
+            return 0
+        current = {str(cid) for cid in self._column(df, ['Complaint ID', 'complaint_id'], None) if cid is not None}
+        missing = [cid for cid in self._stored_narrative_hashes() if cid not in current]
+        if not missing:
+            return 0
+        logger.info(f"{len(missing)} stored complaints are no longer in the data file; removing them")
+        self.remove_complaints(missing)
+        return len(missing)
+    
+    def _load_dataset(self) -> "pd.DataFrame":
+        from src.preprocessing import load_complaints, preprocess_dataset
+        logger.info("Loading and preprocessing CrediTrust complaint data...")
+        return preprocess_dataset(load_complaints(self.config.DATA_PATH))
+    
+    def _update_manifest(self, data: Dict[str, Any], rows: Optional[int] = None):
+        """Record the data file an incremental update brought the index in line with, and the new chunk counts"""
+        self.data_fingerprint = data
+        if self.manifest is None:
+            return
+        self.manifest["data"] = data
+        if rows is not None:
+            self.manifest["rows"] = rows
+        self.manifest["chunks"] = self.live_chunks()
+        if self.duplicates is not None:
+            self.manifest["duplicate_chunks"] = len(self.duplicates) - len(self.duplicates.deleted)
+        self.manifest["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+        write_manifest(self.config, self.manifest)
+    
+    def live_chunks(self) -> int:
+        """Indexed chunks not tombstoned by an incremental update"""
+        store = self._as_store()
+        return len(store) - len(store.deleted)
+    
+    def _as_store(self) -> MetadataStore:
+        """Metadata as a MetadataStore, converting legacy list-of-dicts metadata"""
+        if not isinstance(self.metadatas, MetadataStore):
+            self.metadatas = MetadataStore.from_records(self.metadatas)
+        return self.metadatas
+    
+    def _counted_store(self) -> MetadataStore:
+        """Indexed rows followed by the near-duplicates left out of the index, for complaint counts"""
+        store = self._as_store()
+        if self.duplicates is None or not len(self.duplicates):
+            return store
+        return store.append(self.duplicates)
+    
+    def _stored_narrative_hashes(self) -> Dict[str, Optional[str]]:
+        """complaint_id -> narrative hash for every live complaint in the index, near-duplicates included"""
+        hashes = self._narrative_hashes(self.duplicates) if self.duplicates is not None else {}
+        hashes.update(self._narrative_hashes(self._as_store()))
+        return hashes
+    
+    @staticmethod
+    def _narrative_hashes(store: MetadataStore) -> Dict[str, Optional[str]]:
+        id_column = store.categorical('complaint_id')
+        if id_column is None:
+            return {}
+        id_codes, id_values = id_column
+        live = store.live_mask()
+        if live is not None:
+            id_codes = id_codes[live]
+        
+        hash_column = store.categorical('narrative_hash')
+        if hash_column is None:
+            # Built before hashes were recorded: ids are known, changes are not detectable
+            logger.warning("Index has no narrative hashes; only new complaint IDs will be added")
+            return {str(id_values[code]): None for code in np.unique(id_codes)}
+        
+        hash_codes, hash_values = hash_column
+        if live is not None:
+            hash_codes = hash_codes[live]
+        pairs = np.unique(id_codes.astype(np.int64) * len(hash_values) + hash_codes)
+        return {str(id_values[pair // len(hash_values)]): hash_values[pair % len(hash_values)] for pair in pairs}
+    
+    def _live_duplicate_rows_for(self, complaint_ids: List[Any]) -> np.ndarray:
+        """Rows of the near-duplicates store belonging to the given complaints"""
+        if self.duplicates is None:
+            return np.zeros(0, dtype=np.int64)
+        return self._live_rows_for(complaint_ids, self.duplicates)
+    
+    def _live_rows_for(self, complaint_ids: List[Any], store: Optional[MetadataStore] = None) -> np.ndarray:
+        """Index ids of all live chunks belonging to the given complaints (rows of `store` when given)"""
+        store = store if store is not None else self._as_store()
+        id_column = store.categorical('complaint_id')
+        if id_column is None or not complaint_ids:
+            return np.zeros(0, dtype=np.int64)
+        id_codes, id_values = id_column
+        wanted = {str(cid) for cid in complaint_ids}
+        codes = [code for code, value in enumerate(id_values) if str(value) in wanted]
+        mask = np.isin(id_codes, codes)
+        live = store.live_mask()
+        if live is not None:
+            mask &= live
+        return np.flatnonzero(mask).astype(np.int64)
+    
+    def _embed_rows(self, df: "pd.DataFrame", text_col: str
+                    ) -> Tuple[np.ndarray, MetadataStore, Optional[MetadataStore], Optional[np.ndarray]]:
+        """Chunk and embed a (small) set of complaints without touching the index.
+        
+        With DEDUP_ENABLED the new chunks are clustered like a full build
+        would: against the live indexed chunks and each other. Returns the vectors and metadata of the chunks to index,
+        the metadata of the near-duplicates left out, and (row, count) pairs
+        to add to the "duplicates" count of already indexed chunks.
+        """
+        builder = MetadataStoreBuilder()
+        embeddings = [np.zeros((0, self.index.d), dtype=buffer_dtype(self.config))]
+        dedup, cluster_rows, cluster_ids = self._update_dedup() if len(df) else (None, [], [])
+        duplicate_counts = [0] * len(cluster_rows)
+        # Clusters started by this update begin at the next index row
+        cluster_offset = len(self._as_store()) - len(cluster_rows)
+        duplicates_builder = MetadataStoreBuilder()
+        for batch_start in range(0, len(df), self.config.BUILD_BATCH_ROWS):
+            texts, records = self._chunk_batch(df.iloc[batch_start:batch_start + self.config.BUILD_BATCH_ROWS], text_col)
+            if dedup is not None:
+                texts, records = self._drop_duplicates(dedup, texts, records, duplicate_counts, cluster_ids,
+                                                       duplicates_builder, cluster_offset)
+            if texts:
+                embeddings.append(self._embed_texts(texts))
+                builder.add_many(records)
+        self._flush_embedding_cache()
+        delta_store = builder.build()
+        if dedup is None:
+            return np.concatenate(embeddings), delta_store, None, None
+        
+        delta_store.with_column("duplicates", duplicate_counts[len(cluster_rows):])
+        increments = np.array([(row, count) for row, count in zip(cluster_rows, duplicate_counts) if count],
+                              dtype=np.int64).reshape(-1, 2)
+        return np.concatenate(embeddings), delta_store, duplicates_builder.build(), increments
+    
+    def _new_dedup(self) -> Optional[NearDuplicateIndex]:
+        if not self.config.DEDUP_ENABLED:
+            return None
+        return NearDuplicateIndex(self.config.DEDUP_THRESHOLD, self.config.DEDUP_NUM_PERM)
+    
+    def _update_dedup(self) -> Tuple[Optional[NearDuplicateIndex], List[int], List[int]]:
+        """Near-duplicate index seeded with the live indexed chunks, with the index row and id of each of its clusters.
+        
+        Rebuilt per update from the stored chunk text: MinHashing is cheap
+        next to embedding, and nothing extra has to be persisted.
+        """
+        dedup = self._new_dedup()
+        store = self._as_store()
+        clusters = _cluster_ids(store)
+        if dedup is None or store.categorical("duplicates") is None or clusters is None:
+            return None, [], []
+        live = store.live_mask()
+        live = np.ones(len(store), dtype=bool) if live is None else live
+        cluster_rows = []
+        for row in np.flatnonzero(live):
+            record = store.row(int(row))
+            if dedup.add(record["text_chunk"], _dedup_segment(record)) is None:
+                cluster_rows.append(int(row))
+        dedup.duplicates = 0
+        return dedup, cluster_rows, clusters[cluster_rows].tolist()
+    
+    def _delta_dirs(self) -> List[str]:
+        """Committed delta directories, oldest first"""
+        return sorted(glob.glob(self.config.VECTOR_STORE_PATH + "_delta_[0-9]*[0-9]"))
+    
+    def _write_delta(self, embeddings: np.ndarray, delta_store: MetadataStore, tombstones: np.ndarray,
+                     duplicate_tombstones: Optional[np.ndarray] = None,
+                     duplicate_store: Optional[MetadataStore] = None,
+                     duplicate_increments: Optional[np.ndarray] = None):
+        """Persist one update as a new delta directory, then apply it in memory"""
+        existing = self._delta_dirs()
+        seq = int(existing[-1].rsplit("_", 1)[-1]) + 1 if existing else 1
+        delta_dir = f"{self.config.VECTOR_STORE_PATH}_delta_{seq:06d}"
+        
+        # Written under a temporary name; the rename makes the delta visible atomically
+        tmp_dir = delta_dir + ".tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        vectors = np.ascontiguousarray(embeddings, dtype=buffer_dtype(self.config))
+        np.save(os.path.join(tmp_dir, "vectors.npy"), vectors)
+        np.save(os.path.join(tmp_dir, "tombstones.npy"), np.asarray(tombstones, dtype=np.int64))
+        if duplicate_tombstones is not None and len(duplicate_tombstones):
+            np.save(os.path.join(tmp_dir, "duplicate_tombstones.npy"), np.asarray(duplicate_tombstones, dtype=np.int64))
+        if duplicate_store is not None and len(duplicate_store):
+            duplicate_store.save(os.path.join(tmp_dir, "duplicates_meta"))
+        if duplicate_increments is not None and len(duplicate_increments):
+            np.save(os.path.join(tmp_dir, "duplicate_increments.npy"), duplicate_increments)
+        delta_store.save(os.path.join(tmp_dir, "meta"))
+        os.replace(tmp_dir, delta_dir)
+        
+        self._apply_delta(embeddings, delta_store, tombstones, duplicate_tombstones,
+                          duplicate_store, duplicate_increments)
+        self.theme_cube = ThemeCube.from_store(self._counted_store())
+        if self.theme_cube is not None:
+            self.theme_cube.save(theme_cube_path(self.config))
+        self.date_index = DateIndex.from_metadata(self.metadatas)
+        if self.date_index is not None:
+            self.date_index.save(date_index_path(self.config))
+        logger.info(f"Wrote index delta {delta_dir} (+{len(delta_store)} / -{len(tombstones)} chunks)")
+    
+    def _apply_delta(self, embeddings: np.ndarray, delta_store: MetadataStore, tombstones: np.ndarray,
+                     duplicate_tombstones: Optional[np.ndarray] = None,
+                     duplicate_store: Optional[MetadataStore] = None,
+                     duplicate_increments: Optional[np.ndarray] = None):
+        """Add delta vectors to the index and merge its metadata rows"""
+        if len(embeddings):
+            self.index.add(np.ascontiguousarray(embeddings, dtype='float32'))
+        if self.sparse_index is not None and len(delta_store):
+            # Deleted rows keep their postings; the live mask hides them at search time
+            self.sparse_index.add_texts(self._chunk_texts(delta_store))
+        self.metadatas = self._as_store().with_deleted(tombstones).append(delta_store)
+        if duplicate_tombstones is not None and self.duplicates is not None:
+            self.duplicates.with_deleted(duplicate_tombstones)
+        if duplicate_store is not None and len(duplicate_store):
+            self.duplicates = duplicate_store if self.duplicates is None else self.duplicates.append(duplicate_store)
+        if duplicate_increments is not None and len(duplicate_increments):
+            codes, categories = self.metadatas.categorical("duplicates")
+            counts = np.array([count or 0 for count in categories], dtype=np.int64)[codes]
+            np.add.at(counts, duplicate_increments[:, 0], duplicate_increments[:, 1])
+            self.metadatas.with_column("duplicates", counts)
+    
+    def _hybrid_enabled(self) -> bool:
+        return self.config.RETRIEVAL_MODE.lower() == "hybrid"
+    
+    def _new_sparse_builder(self) -> BM25Builder:
+        return BM25Builder(k1=self.config.BM25_K1, b=self.config.BM25_B, max_postings=self.config.BM25_MAX_POSTINGS)
+    
+    @staticmethod
+    def _chunk_texts(metadata) -> Iterator[str]:
+        """Chunk texts of every row, without materializing whole rows from a MetadataStore"""
+        if hasattr(metadata, 'text'):
+            return (metadata.text(i) for i in range(len(metadata)))
+        return (item['text_chunk'] for item in metadata)
+
+
+def _dedup_segment(record: Dict[str, Any]) -> Tuple[Any, Any, Any]:
+    """Chunks only count as near-duplicates of each other within one (product, market, date)"""
+    return record.get("product"), record.get("market"), record.get("date")
+
+
+def _cluster_ids(store: MetadataStore) -> Optional[np.ndarray]:
+    """Near-duplicate cluster id of every row: its "cluster" value, or its own row where that is -1.
+    
+    None for stores written without the column (DEDUP_ENABLED off).
+    """
+    column = store.categorical("cluster")
+    if column is None:
+        return None
+    codes, values = column
+    lookup = np.array([-1 if value is None else value for value in values], dtype=np.int64)
+    clusters = lookup[codes]
+    started = np.flatnonzero(clusters < 0)
+    clusters[started] = started
+    return clusters
+
+
+def _narrative_hash(narrative: str) -> str:
+    """Stable content hash used to detect changed complaint narratives"""
+    return hashlib.blake2b(narrative.encode("utf-8"), digest_size=8).hexdigest()
\ No newline at end of file
@@ -0,0 +1,321 @@
+import os
+import json
+import shutil
+from array import array
+from bisect import bisect_right
+import numpy as np
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+from src.utils.exceptions import IndexingError
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+TEXT_COLUMN = "text_chunk"
+SCHEMA_FILE = "schema.json"
+DELETED_FILE = "deleted.npy"
+
+# Bookkeeping columns that are not returned to callers as chunk metadata
+INTERNAL_COLUMNS = ("narrative_hash",)
+
+
+def _to_json_value(value: Any) -> Any:
+    """Convert numpy scalars / NaN to plain JSON-friendly Python values"""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _codes_dtype(num_categories: int):
+    """Smallest unsigned dtype able to hold the category codes"""
+    if num_categories <= np.iinfo(np.uint8).max:
+        return np.uint8
+    if num_categories <= np.iinfo(np.uint16).max:
+        return np.uint16
+    return np.uint32
+
+
+class MetadataStore:
+    """Columnar chunk metadata store.
+    
+    Scalar fields are dictionary-encoded (small integer codes + one list of
+    distinct values per column) and chunk text is kept as a utf-8 blob with
+    an offsets array. On disk every array is a separate file that is
+    memory-mapped on load, so only the rows actually read are paged in.
+    
+    Rows removed by incremental updates are not rewritten; their ids are
+    kept in `deleted` and excluded from search through `live_mask()`.
+    """
+    
+    def __init__(self, categorical: Dict[str, Tuple[np.ndarray, List[Any]]],
+                 text_offsets: np.ndarray, text_blob: np.ndarray,
+                 column_order: Optional[List[str]] = None,
+                 deleted: Optional[np.ndarray] = None):
+        self._categorical = categorical
+        # Text lives in one or more (first row, offsets, blob) segments; appended
+        # stores keep their own memory-mapped blob until the next full save
+        self._text_segments = [(0, text_offsets, text_blob)]
+        self._segment_starts = [0]
+        self.column_order = column_order or list(categorical) + [TEXT_COLUMN]
+        self.deleted = np.zeros(0, dtype=np.int64) if deleted is None else np.asarray(deleted, dtype=np.int64)
+        self._num_rows = len(text_offsets) - 1
+    
+    @classmethod
+    def from_records(cls, records: Iterable[Dict[str, Any]]) -> "MetadataStore":
+        """Encode a list of metadata dicts into columns"""
+        builder = MetadataStoreBuilder()
+        builder.add_many(records)
+        return builder.build()
+    
+    def __len__(self) -> int:
+        return self._num_rows
+    
+    def __getitem__(self, idx: int) -> Dict[str, Any]:
+        return self.row(idx)
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for idx in range(len(self)):
+            yield self.row(idx)
+    
+    def text(self, idx: int) -> str:
+        """Decode the chunk text of a single row"""
+        first_row, offsets, blob = self._text_segments[bisect_right(self._segment_starts, idx) - 1]
+        local = idx - first_row
+        start, end = offsets[local], offsets[local + 1]
+        return bytes(blob[start:end]).decode("utf-8")
+    
+    def row(self, idx: int, include_text: bool = True) -> Dict[str, Any]:
+        """Materialize a single row as a metadata dict"""
+        if idx < 0 or idx >= len(self):
+            raise IndexError(f"Row {idx} out of range for {len(self)} rows")
+        result = {}
+        for name in self.column_order:
+            if name == TEXT_COLUMN:
+                if include_text:
+                    result[name] = self.text(idx)
+            else:
+                codes, categories = self._categorical[name]
+                result[name] = categories[codes[idx]]
+        return result
+    
+    @property
+    def columns(self) -> List[str]:
+        return list(self.column_order)
+    
+    def categorical(self, name: str) -> Optional[Tuple[np.ndarray, List[Any]]]:
+        """Return (codes, categories) for a dictionary-encoded column"""
+        return self._categorical.get(name)
+    
+    def live_mask(self) -> Optional[np.ndarray]:
+        """Boolean mask of rows not deleted; None when nothing was deleted"""
+        if len(self.deleted) == 0:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        mask[self.deleted] = False
+        return mask
+    
+    def value_counts(self, name: str) -> Dict[Any, int]:
+        """Count live rows per distinct value straight from the codes"""
+        column = self._categorical.get(name)
+        if column is None:
+            raise KeyError(f"Unknown metadata column: {name}")
+        codes, categories = column
+        live = self.live_mask()
+        if live is not None:
+            codes = codes[live]
+        counts = np.bincount(codes, minlength=len(categories))
+        return {categories[i]: int(c) for i, c in enumerate(counts) if c}
+    
+    def append(self, other: "MetadataStore") -> "MetadataStore":
+        """Return a store with `other`'s rows after ours.
+        
+        Only the code arrays are re-encoded into shared dictionaries; the
+        text of both stores stays where it is (memory-mapped or in RAM).
+        """
+        n = len(self)
+        column_order = list(self.column_order)
+        for name in other.column_order:
+            if name not in column_order:
+                column_order.append(name)
+        
+        categorical = {}
+        for name in column_order:
+            if name == TEXT_COLUMN:
+                continue
+            codes_a, categories = self._column_or_null(name)
+            codes_b, categories_b = other._column_or_null(name)
+            categories = list(categories)
+            lookup = {value: i for i, value in enumerate(categories)}
+            remap = np.empty(len(categories_b), dtype=np.int64)
+            for i, value in enumerate(categories_b):
+                if value not in lookup:
+                    lookup[value] = len(categories)
+                    categories.append(value)
+                remap[i] = lookup[value]
+            codes = np.concatenate([np.asarray(codes_a, dtype=np.int64), remap[np.asarray(codes_b, dtype=np.int64)]])
+            categorical[name] = (codes.astype(_codes_dtype(len(categories))), categories)
+        
+        merged = MetadataStore(categorical, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.uint8),
+                               column_order, np.concatenate([self.deleted, other.deleted + n]))
+        merged._text_segments = list(self._text_segments) + [
+            (first_row + n, offsets, blob) for first_row, offsets, blob in other._text_segments
+        ]
+        merged._segment_starts = [segment[0] for segment in merged._text_segments]
+        merged._num_rows = n + len(other)
+        return merged
+    
+    def with_column(self, name: str, values: Iterable[Any]) -> "MetadataStore":
+        """Add (or replace) a column from one value per row (in place) and return the store"""
+        values = np.asarray(list(values))
+        if len(values) != len(self):
+            raise IndexingError(f"Column {name} has {len(values)} values for {len(self)} rows")
+        categories, codes = np.unique(values, return_inverse=True)
+        self._categorical[name] = (codes.astype(_codes_dtype(len(categories))),
+                                   [_to_json_value(value) for value in categories])
+        if name not in self.column_order:
+            # Text stays the last column
+            position = self.column_order.index(TEXT_COLUMN) if TEXT_COLUMN in self.column_order else len(self.column_order)
+            self.column_order.insert(position, name)
+        return self
+    
+    def with_deleted(self, ids: Iterable[int]) -> "MetadataStore":
+        """Mark additional rows as deleted (in place) and return the store"""
+        self.deleted = np.union1d(self.deleted, np.asarray(list(ids), dtype=np.int64))
+        return self
+    
+    def _column_or_null(self, name: str) -> Tuple[np.ndarray, List[Any]]:
+        if name in self._categorical:
+            return self._categorical[name]
+        return np.zeros(len(self), dtype=np.uint8), [None]
+    
+    def save(self, path: str):
+        """Write the store to a directory, replacing any previous version"""
+        tmp_path = path + ".tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        
+        schema = {"num_rows": len(self), "column_order": self.column_order, "categorical": {}}
+        for name, (codes, categories) in self._categorical.items():
+            np.save(os.path.join(tmp_path, f"{name}.codes.npy"), np.asarray(codes))
+            schema["categorical"][name] = categories
+        
+        # Text segments are streamed into a single blob with rebased offsets
+        offsets = [np.zeros(1, dtype=np.int64)]
+        written = 0
+        with open(os.path.join(tmp_path, f"{TEXT_COLUMN}.bin"), "wb") as f:
+            for _, segment_offsets, blob in self._text_segments:
+                segment_offsets = np.asarray(segment_offsets, dtype=np.int64)
+                f.write(memoryview(np.ascontiguousarray(blob[:segment_offsets[-1]])))
+                offsets.append(segment_offsets[1:] + written)
+                written += int(segment_offsets[-1])
+        np.save(os.path.join(tmp_path, f"{TEXT_COLUMN}.offsets.npy"), np.concatenate(offsets))
+        
+        if len(self.deleted):
+            np.save(os.path.join(tmp_path, DELETED_FILE), self.deleted)
+        
+        with open(os.path.join(tmp_path, SCHEMA_FILE), "w") as f:
+            json.dump(schema, f)
+        
+        # Swap the finished directory into place
+        old_path = path + ".old"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+    
+    @classmethod
+    def load(cls, path: str) -> "MetadataStore":
+        """Open a store directory with all arrays memory-mapped"""
+        schema_path = os.path.join(path, SCHEMA_FILE)
+        if not os.path.exists(schema_path):
+            raise IndexingError(f"Metadata store not found: {path}")
+        
+        with open(schema_path) as f:
+            schema = json.load(f)
+        
+        categorical = {}
+        for name, categories in schema["categorical"].items():
+            codes = np.load(os.path.join(path, f"{name}.codes.npy"), mmap_mode="r")
+            categorical[name] = (codes, categories)
+        
+        text_offsets = np.load(os.path.join(path, f"{TEXT_COLUMN}.offsets.npy"), mmap_mode="r")
+        blob_path = os.path.join(path, f"{TEXT_COLUMN}.bin")
+        if os.path.getsize(blob_path) > 0:
+            text_blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            text_blob = np.zeros(0, dtype=np.uint8)
+        
+        deleted_path = os.path.join(path, DELETED_FILE)
+        deleted = np.load(deleted_path) if os.path.exists(deleted_path) else None
+        
+        return cls(categorical, text_offsets, text_blob, schema["column_order"], deleted)
+
+
+class MetadataStoreBuilder:
+    """Incrementally encodes metadata records into compact column buffers.
+    
+    Codes are kept in typed arrays and text in a single bytearray, so a
+    streaming index build never holds a Python dict per chunk.
+    """
+    
+    def __init__(self):
+        self.column_order: List[str] = []
+        self._lookups: Dict[str, Dict[Any, int]] = {}
+        self._codes: Dict[str, array] = {}
+        self._offsets = array("q", [0])
+        self._blob = bytearray()
+    
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+    
+    def add(self, record: Dict[str, Any]):
+        """Append one metadata record"""
+        num_rows = len(self)
+        for name, value in record.items():
+            if name == TEXT_COLUMN:
+                continue
+            if name not in self._lookups:
+                self.column_order.append(name)
+                self._lookups[name] = {}
+                # Rows seen before this column appeared get a null value
+                self._codes[name] = array("I", [self._encode(name, None)]) * num_rows
+            self._codes[name].append(self._encode(name, _to_json_value(value)))
+        for name, codes in self._codes.items():
+            if len(codes) == num_rows:
+                codes.append(self._encode(name, None))
+        
+        self._blob.extend(str(record.get(TEXT_COLUMN, "")).encode("utf-8"))
+        self._offsets.append(len(self._blob))
+    
+    def add_many(self, records: Iterable[Dict[str, Any]]):
+        for record in records:
+            self.add(record)
+    
+    def build(self) -> MetadataStore:
+        """Freeze the buffers into a MetadataStore"""
+        column_order = list(self.column_order)
+        if TEXT_COLUMN not in column_order:
+            column_order.append(TEXT_COLUMN)
+        
+        categorical = {}
+        for name, lookup in self._lookups.items():
+            categories = list(lookup)
+            codes = np.frombuffer(self._codes[name], dtype=np.uint32).astype(_codes_dtype(len(categories)))
+            categorical[name] = (codes, categories)
+        
+        return MetadataStore(
+            categorical,
+            np.frombuffer(self._offsets, dtype=np.int64).copy(),
+            np.frombuffer(bytes(self._blob), dtype=np.uint8),
+            column_order
+        )
+    
+    def _encode(self, name: str, value: Any) -> int:
+        lookup = self._lookups[name]
+        if value not in lookup:
+            lookup[value] = len(lookup)
+        return lookup[value]
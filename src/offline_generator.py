@@ -0,0 +1,58 @@
+import time
+import asyncio
+import hashlib
+from typing import Generator
+
+from src.generator import BusinessAnswerGenerator, StreamResult
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+class OfflineAnswerGenerator(BusinessAnswerGenerator):
+    """Drop-in stand-in for the Gemini generator that never leaves the machine.
+    
+    Builds the same prompts, then waits `latency_seconds` (simulating the LLM
+    round trip) and returns a deterministic answer derived from the prompt, so
+    pipeline throughput can be benchmarked without an API key or network.
+    """
+    
+    def __init__(self, config, latency_seconds: float = 0.5, first_token_seconds: float = 0.1):
+        self.config = config
+        self.model_name = "offline"
+        self.latency_seconds = latency_seconds
+        self.first_token_seconds = min(first_token_seconds, latency_seconds)
+        self.calls = 0
+        logger.info(f"Initialized offline generator with {latency_seconds}s simulated latency")
+    
+    def generate_answer(self, prompt: str) -> str:
+        """Deterministic answer after a blocking simulated delay"""
+        time.sleep(self.latency_seconds)
+        return self._answer_for(prompt)
+    
+    async def agenerate_answer(self, prompt: str) -> str:
+        """Deterministic answer after a non-blocking simulated delay"""
+        await asyncio.sleep(self.latency_seconds)
+        return self._answer_for(prompt)
+    
+    def generate_answer_stream(self, prompt: str) -> Generator[str, None, StreamResult]:
+        """Deterministic answer streamed word by word over the simulated latency"""
+        start = time.perf_counter()
+        answer = self._answer_for(prompt)
+        words = answer.split(" ")
+        time.sleep(self.first_token_seconds)
+        result = StreamResult(time_to_first_token=time.perf_counter() - start)
+        
+        delay = (self.latency_seconds - self.first_token_seconds) / max(1, len(words) - 1)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(delay)
+            yield word if i == len(words) - 1 else word + " "
+        result.text, result.total_time, result.complete = answer, time.perf_counter() - start, True
+        return result
+    
+    def _answer_for(self, prompt: str) -> str:
+        self.calls += 1
+        digest = hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).hexdigest()
+        sources = prompt.count("SOURCE COMPLAINT ")
+        return (f"**Executive Summary**: Offline analysis {digest} of {sources} source excerpts.\n\n"
+                f"**Critical Issues Identified**: Not evaluated (offline generator).")
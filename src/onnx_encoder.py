@@ -0,0 +1,129 @@
+import os
+import json
+import numpy as np
+from typing import List
+
+from src.utils.exceptions import IndexingError
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+INFO_FILE = "encoder.json"
+
+
+class OnnxSentenceEncoder:
+    """SentenceTransformer-compatible encoder running an exported transformer on ONNX Runtime.
+    
+    Only onnxruntime and the `tokenizers` library are imported, not torch,
+    so loading takes a fraction of the time and memory. Mean pooling and L2
+    normalization match the all-MiniLM-L6-v2 SentenceTransformer pipeline.
+    """
+    
+    def __init__(self, model_dir: str, quantized: bool = True, num_threads: int = 0):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise IndexingError(f"EMBEDDING_BACKEND=onnx requires onnxruntime and tokenizers: {str(e)}")
+        
+        with open(os.path.join(model_dir, INFO_FILE)) as f:
+            self.info = json.load(f)
+        model_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise IndexingError(f"ONNX encoder not found: {model_path}")
+        
+        options = ort.SessionOptions()
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=self.info["max_seq_length"])
+        self.tokenizer.enable_padding(pad_id=self.info.get("pad_token_id", 0))
+        logger.info(f"Loaded ONNX encoder {model_path} ({'int8' if quantized else 'fp32'})")
+    
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.info["dim"]
+    
+    def encode(self, texts, batch_size: int = 32, show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        """Normalized sentence embeddings, shape (len(texts), dim)"""
+        if isinstance(texts, str):
+            return self.encode([texts], batch_size)[0]
+        embeddings = np.empty((len(texts), self.info["dim"]), dtype='float32')
+        for start in range(0, len(texts), batch_size):
+            embeddings[start:start + batch_size] = self._encode_batch(list(texts[start:start + batch_size]))
+        return embeddings
+    
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        feeds = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+        
+        # Mean pooling over real tokens, then L2 normalization
+        mask = feeds["attention_mask"][:, :, None].astype('float32')
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+
+def export_onnx_encoder(model_name: str, output_dir: str, quantize: bool = True) -> str:
+    """Export a SentenceTransformer's transformer to ONNX (plus an int8 dynamic-quantized copy).
+    
+    Needs torch and sentence-transformers; the exported encoder does not.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    logger.info(f"Exporting {model_name} to ONNX in {output_dir}...")
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    
+    class LastHiddenState(torch.nn.Module):
+        def __init__(self, wrapped):
+            super().__init__()
+            self.wrapped = wrapped
+        
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.wrapped(input_ids=input_ids, attention_mask=attention_mask,
+                                token_type_ids=token_type_ids).last_hidden_state
+    
+    sample = tokenizer(["customer was charged a hidden fee"], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            LastHiddenState(transformer),
+            tuple(sample[name] for name in input_names),
+            os.path.join(output_dir, MODEL_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantize_dynamic(os.path.join(output_dir, MODEL_FILE), os.path.join(output_dir, QUANTIZED_MODEL_FILE),
+                         weight_type=QuantType.QInt8)
+    
+    tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, INFO_FILE), "w") as f:
+        json.dump({
+            "model_name": model_name,
+            "dim": model.get_sentence_embedding_dimension(),
+            "max_seq_length": model.max_seq_length,
+            "pad_token_id": tokenizer.pad_token_id or 0,
+            "quantized": quantize,
+        }, f)
+    logger.info(f"Exported ONNX encoder to {output_dir}")
+    return output_dir
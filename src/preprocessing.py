@@ -1,19 +1,30 @@
 import re
+import time
 import pandas as pd
 import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Optional
 from src.utils.exceptions import DataLoadingError
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
 
+# Cleaning patterns are compiled once and shared by the scalar and vectorized paths
+BOILERPLATE_PATTERN = re.compile(r"i am writing to file a complaint regarding|i am writing to complain about")
+SPECIAL_CHARS_PATTERN = re.compile(r'[^\w\s.,!?;:\-()]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
 def load_complaints(path: str) -> pd.DataFrame:
-    """Load complaints dataset from CSV with error handling"""
+    """Load complaints dataset from CSV (or preprocessed Parquet) with error handling"""
     try:
         if not os.path.exists(path):
             raise DataLoadingError(f"Data file not found: {path}")
         
-        df = pd.read_csv(path)
+        if path.endswith(".parquet"):
+            df = pd.read_parquet(path)
+        else:
+            df = pd.read_csv(path)
         logger.info(f"Loaded dataset with {len(df)} rows from {path}")
         return df
     except Exception as e:
@@ -28,17 +39,27 @@ def clean_text(text: str) -> str:
     text = text.lower()
     
     # Remove boilerplate often found in CFPB data
-    text = re.sub(r"i am writing to file a complaint regarding", "", text)
-    text = re.sub(r"i am writing to complain about", "", text)
+    text = BOILERPLATE_PATTERN.sub("", text)
     
     # Remove special characters but keep punctuation
-    text = re.sub(r'[^\w\s.,!?;:\-()]', '', text)
+    text = SPECIAL_CHARS_PATTERN.sub('', text)
     
     # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = WHITESPACE_PATTERN.sub(' ', text).strip()
     
     return text
 
+def clean_text_series(texts: pd.Series) -> pd.Series:
+    """Vectorized clean_text over a whole column"""
+    texts = texts.where(texts.map(lambda t: isinstance(t, str)), "")
+    return (
+        texts.str.lower()
+        .str.replace(BOILERPLATE_PATTERN, "", regex=True)
+        .str.replace(SPECIAL_CHARS_PATTERN, "", regex=True)
+        .str.replace(WHITESPACE_PATTERN, " ", regex=True)
+        .str.strip()
+    )
+
 def map_product_to_group(product_name: str) -> str:
     """Map raw CFPB products to CrediTrust standard categories"""
     pn = product_name.lower()
@@ -49,28 +70,110 @@ def map_product_to_group(product_name: str) -> str:
     if "money transfer" in pn or "money service" in pn: return "Money Transfers"
     return "Other"
 
+def map_product_series(products: pd.Series) -> pd.Series:
+    """Map a product column by evaluating each distinct product only once"""
+    groups = {p: map_product_to_group(p) for p in products.dropna().unique()}
+    return products.map(groups).fillna("Other")
+
 def preprocess_dataset(df: pd.DataFrame, text_col: str = "Consumer complaint narrative") -> pd.DataFrame:
-    """Enhanced preprocessing for RAG pipeline"""
-    if text_col not in df.columns:
-        # Check if it was already cleaned and renamed
-        if "cleaned_narrative" in df.columns:
-            return df
+    """Enhanced preprocessing for RAG pipeline.
+    
+    A frame that already has cleaned_narrative (e.g. Parquet output of
+    preprocess_file) skips the text cleaning but still goes through the
+    row filters.
+    """
+    already_cleaned = "cleaned_narrative" in df.columns
+    if not already_cleaned and text_col not in df.columns:
         raise ValueError(f"Text column '{text_col}' not found in dataframe")
     
     original_size = len(df)
     
     # 1. Filter empty narratives
-    df = df.dropna(subset=[text_col])
+    df = df.dropna(subset=["cleaned_narrative" if already_cleaned else text_col])
     
     # 2. Add product grouping if not present
-    if 'product_group' not in df.columns:
-        df['product_group'] = df['Product'].apply(map_product_to_group)
+    if 'product_group' not in df.columns and 'Product' in df.columns:
+        df['product_group'] = map_product_series(df['Product'])
     
     # 3. Clean narratives
-    df['cleaned_narrative'] = df[text_col].apply(clean_text)
+    if not already_cleaned:
+        df['cleaned_narrative'] = clean_text_series(df[text_col])
     
     # 4. Remove very short texts
     df = df[df['cleaned_narrative'].str.len() > 10]
     
     logger.info(f"Preprocessing: {original_size} -> {len(df)} rows after cleaning")
-    return df
\ No newline at end of file
+    return df
+
+def _preprocess_chunk(df: pd.DataFrame, text_col: str) -> pd.DataFrame:
+    """Worker entry point: clean one CSV chunk in a child process"""
+    if 'Complaint ID' in df.columns:
+        df['Complaint ID'] = pd.to_numeric(df['Complaint ID'], errors='coerce').astype('Int64')
+    return preprocess_dataset(df, text_col)
+
+def preprocess_file(input_path: str, output_path: str,
+                    text_col: str = "Consumer complaint narrative",
+                    chunk_rows: int = 50000, workers: Optional[int] = None) -> int:
+    """Stream a large CSV through a process pool and write the cleaned rows to Parquet.
+    
+    Chunks are read lazily and at most two per worker are in flight, so memory
+    stays bounded by the chunk size rather than the file size.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise DataLoadingError("pyarrow is required to write preprocessed Parquet output")
+    
+    if not os.path.exists(input_path):
+        raise DataLoadingError(f"Data file not found: {input_path}")
+    
+    workers = workers or os.cpu_count() or 1
+    start_time = time.perf_counter()
+    rows_in, rows_out = 0, 0
+    writer, schema = None, None
+    tmp_path = output_path + ".tmp"
+    
+    def write(df: pd.DataFrame):
+        nonlocal writer, schema, rows_out
+        if writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            schema = table.schema
+            writer = pq.ParquetWriter(tmp_path, schema)
+        else:
+            table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        writer.write_table(table)
+        rows_out += len(df)
+    
+    try:
+        # Read everything as text so every chunk yields the same Parquet schema
+        reader = pd.read_csv(input_path, chunksize=chunk_rows, dtype=str)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            in_flight = deque()
+            for chunk in reader:
+                rows_in += len(chunk)
+                in_flight.append(pool.submit(_preprocess_chunk, chunk, text_col))
+                if len(in_flight) >= workers * 2:
+                    write(in_flight.popleft().result())
+            while in_flight:
+                write(in_flight.popleft().result())
+        
+        if writer is None:
+            raise DataLoadingError(f"No rows found in {input_path}")
+        writer.close()
+        os.replace(tmp_path, output_path)
+    
+    except DataLoadingError:
+        raise
+    except Exception as e:
+        raise DataLoadingError(f"Failed to preprocess {input_path}: {str(e)}")
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Preprocessed {rows_in} -> {rows_out} rows with {workers} workers in {elapsed:.1f}s "
+                f"({rows_in / elapsed:.0f} rows/sec), written to {output_path}")
+    return rows_out
@@ -0,0 +1,124 @@
+import re
+import time
+import json
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Case, whitespace and trailing punctuation do not change the answer"""
+    question = re.sub(r'\s+', ' ', question.strip().lower())
+    return question.rstrip('?.! ')
+
+
+def filters_key(filters: Optional[Dict[str, Any]]) -> str:
+    """Order-independent, case-insensitive representation of retrieval filters"""
+    normalized = {k: v.lower() if isinstance(v, str) else v for k, v in (filters or {}).items()}
+    return json.dumps(normalized, sort_keys=True, default=str)
+
+
+class QueryResultCache:
+    """Two-level cache of (answer, chunks) results for RAGPipeline.
+    
+    Level 1 is an exact match on (normalized question, filters, k). Level 2
+    is semantic: a new question whose embedding has cosine similarity of at
+    least `similarity_threshold` with a cached question under the same
+    filters and k reuses that answer. Entries expire after `ttl_seconds` and
+    the least recently used entry is dropped once `max_entries` is reached.
+    """
+    
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 3600,
+                 similarity_threshold: float = 0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+    
+    def get_exact(self, question: str, filters: Optional[Dict], k: int) -> Optional[Tuple[str, List[Dict]]]:
+        """Look up an identical (normalized) question"""
+        key = (normalize_question(question), filters_key(filters), k)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._expired(entry):
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry["answer"], list(entry["chunks"])
+    
+    def get_semantic(self, query_vector: np.ndarray, filters: Optional[Dict],
+                     k: int) -> Optional[Tuple[str, List[Dict]]]:
+        """Look up the most similar cached question under the same filters; counts a miss otherwise"""
+        fkey = filters_key(filters)
+        query = self._unit(query_vector)
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for key, entry in self._entries.items():
+                if key[1] != fkey or key[2] != k or self._expired(entry):
+                    continue
+                score = float(np.dot(entry["vector"], query))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.semantic_hits += 1
+            entry = self._entries[best_key]
+            logger.info(f"Semantic cache hit (cosine {best_score:.3f}) on '{best_key[0]}'")
+            return entry["answer"], list(entry["chunks"])
+    
+    def put(self, question: str, filters: Optional[Dict], k: int,
+            query_vector: np.ndarray, answer: str, chunks: List[Dict]):
+        key = (normalize_question(question), filters_key(filters), k)
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "chunks": list(chunks),
+                "vector": self._unit(query_vector),
+                "created": time.monotonic(),
+            }
+            self._entries.move_to_end(key)
+            self._evict()
+    
+    def invalidate(self):
+        """Drop every entry, e.g. after the index was rebuilt or updated"""
+        with self._lock:
+            self._entries.clear()
+        logger.info("Query result cache invalidated")
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+    
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl_seconds > 0 and time.monotonic() - entry["created"] > self.ttl_seconds
+    
+    def _evict(self):
+        expired = [key for key, entry in self._entries.items() if self._expired(entry)]
+        for key in expired:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype='float32')
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -1,5 +1,8 @@
 import re
-from typing import Tuple, Dict
+import itertools
+from datetime import date, timedelta
+from typing import Tuple, Dict, List, Optional
+from src.date_index import parse_date
 from src.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -27,6 +30,32 @@ class QueryValidator:
             r'^(regulatory|compliance|cbk|central bank)',
         ]
         
+        # Questions about prevalence or trends, answered with exact complaint counts
+        self.aggregate_question_pattern = (
+            r'\b(top|most|common|frequent|biggest|main|emerging|trends?|patterns?|how many|volume|rank)\b'
+        )
+        
+        # Named periods: ISO or US dates, months (2023-05, May 2023) and years.
+        # Month names must be whole words ("market 2024" is not March), and a bare
+        # year only counts after a date connective ("since 2022") or in
+        # year_context_pattern ("in 2024"), so "top 2000 complaints" has no period.
+        self.month_names = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+        self.date_pattern = (
+            r'\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{4}|\b\d{4}-\d{2}\b|'
+            r'\b(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?|'
+            r'sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b\.?,?\s+\d{4}\b'
+        )
+        self.year_pattern = r'\b(?:19|20)\d{2}\b'
+        self.period_pattern = rf'({self.date_pattern}|{self.year_pattern})'
+        self.year_context_pattern = (
+            rf'\b(?:in|during|throughout|year)\s+({self.year_pattern}(?:\s*(?:,|and|or|&)\s*{self.year_pattern})*)'
+        )
+        self.relative_period_pattern = r'\b(?:last|past|previous)\s+(\d+\s+)?(day|week|month|quarter|year)s?\b'
+        # Periods compared with each other ("2019 vs 2020", "May 2023 compared to June 2023")
+        self.period_comparison_pattern = (
+            rf'{self.period_pattern}(?:\s+(?:vs\.?|versus|compared\s+(?:to|with))\s+{self.period_pattern})+'
+        )
+        
         # Define entity mappings for extraction
         self.market_map = {
             "kenya": "Kenya",
@@ -64,28 +93,152 @@ class QueryValidator:
         
         return True, "Valid business query"
     
-    def extract_filters(self, query: str) -> Dict[str, str]:
-        """Extract market and product filters from the query string"""
+    def is_aggregate_question(self, query: str) -> bool:
+        """Whether the question asks how often issues occur rather than about individual complaints"""
+        return re.search(self.aggregate_question_pattern, query, re.IGNORECASE) is not None
+    
+    def extract_filters(self, query: str, today: Optional[date] = None) -> Dict[str, str]:
+        """Extract market, product and date range filters from the query string.
+        
+        A market or product named more than once ("Kenya and Tanzania") is a
+        comparison across segments (see extract_segments), not a filter.
+        """
         query_lower = query.lower()
         filters = {}
         
-        # Extract market
-        for key, value in self.market_map.items():
-            if key in query_lower:
-                filters["market"] = value
-                break
-        
-        # Extract product
-        for key, value in self.product_map.items():
-            if key in query_lower:
-                filters["product"] = value
-                break
+        for field, mapping in (("market", self.market_map), ("product", self.product_map)):
+            values = self._mentions(query_lower, mapping)
+            if len(values) == 1:
+                filters[field] = values[0]
+        
+        filters.update(self.extract_date_range(query, today))
                 
         if filters:
             logger.info(f"Extracted automatic filters from query: {filters}")
             
         return filters
     
+    def extract_segments(self, query: str) -> List[Dict[str, str]]:
+        """One filter dict per segment of a comparison, e.g. [{"market": "Kenya"}, {"market": "Tanzania"}].
+        
+        Markets and products named more than once, and periods compared with
+        "vs" or "compared to" (each a date_from / date_to range), are compared
+        in every combination; a question naming at most one of each has no
+        segments.
+        """
+        query_lower = query.lower()
+        dimensions = [[{field: value} for value in values] for field, values in (
+            ("market", self._mentions(query_lower, self.market_map)),
+            ("product", self._mentions(query_lower, self.product_map)),
+        ) if len(values) > 1]
+        periods = self._compared_periods(query_lower)
+        if periods:
+            dimensions.append([{"date_from": start.isoformat(), "date_to": end.isoformat()} for start, end in periods])
+        if not dimensions:
+            return []
+        
+        segments = [{field: value for part in combination for field, value in part.items()}
+                    for combination in itertools.product(*dimensions)]
+        logger.info(f"Comparison across {len(segments)} segments: {segments}")
+        return segments
+    
+    @staticmethod
+    def _mentions(query_lower: str, mapping: Dict[str, str]) -> List[str]:
+        """Distinct mapped values named in the query, in order of first mention"""
+        positions: Dict[str, int] = {}
+        for key, value in mapping.items():
+            position = query_lower.find(key)
+            if position >= 0 and position < positions.get(value, len(query_lower)):
+                positions[value] = position
+        return sorted(positions, key=positions.get)
+    
+    def extract_date_range(self, query: str, today: Optional[date] = None) -> Dict[str, str]:
+        """date_from / date_to (inclusive ISO dates) of the period a question asks about.
+        
+        Relative periods ("last 90 days") count back from `today`, which the
+        pipeline sets to the most recent indexed complaint date. Periods
+        compared with each other are segments (see extract_segments), not a
+        filter, so they give no range here.
+        """
+        query_lower = query.lower()
+        today = today or date.today()
+        if self._compared_periods(query_lower):
+            return {}
+        
+        relative = re.search(self.relative_period_pattern, query_lower)
+        if relative:
+            count = int(relative.group(1) or 1)
+            unit = relative.group(2)
+            if unit in ("day", "week"):
+                start = today - timedelta(days=count * (7 if unit == "week" else 1))
+            else:
+                start = self._add_months(today, -count * {"month": 1, "quarter": 3, "year": 12}[unit])
+            return {"date_from": (start + timedelta(days=1)).isoformat(), "date_to": today.isoformat()}
+        
+        period = self.period_pattern
+        between = re.search(rf'\b(?:between|from)\s+{period}\s+(?:and|to|until|through)\s+{period}', query_lower)
+        if between:
+            start, end = self._period(between.group(1)), self._period(between.group(2))
+            if start and end:
+                return {"date_from": start[0].isoformat(), "date_to": end[1].isoformat()}
+        
+        date_range = {}
+        since = re.search(rf'\b(since|after|from)\s+{period}', query_lower)
+        if since and self._period(since.group(2)):
+            start, end = self._period(since.group(2))
+            date_range["date_from"] = (end + timedelta(days=1) if since.group(1) == "after" else start).isoformat()
+        until = re.search(rf'\b(before|until|till|through)\s+{period}', query_lower)
+        if until and self._period(until.group(2)):
+            start, end = self._period(until.group(2))
+            date_range["date_to"] = (start - timedelta(days=1) if until.group(1) == "before" else end).isoformat()
+        if date_range:
+            return date_range
+        
+        # Periods named without a connective ("in March 2023", "in 2022 and 2023"): their overall span
+        matches = re.findall(self.date_pattern, query_lower)
+        for years in re.findall(self.year_context_pattern, query_lower):
+            matches.extend(re.findall(self.year_pattern, years))
+        periods = [p for p in (self._period(match) for match in matches) if p]
+        if periods:
+            return {"date_from": min(p[0] for p in periods).isoformat(),
+                    "date_to": max(p[1] for p in periods).isoformat()}
+        return {}
+    
+    def _compared_periods(self, query_lower: str) -> List[Tuple[date, date]]:
+        """Distinct periods on either side of "vs" / "compared to", in order; empty when none are compared"""
+        comparison = re.search(self.period_comparison_pattern, query_lower)
+        if not comparison:
+            return []
+        periods = [p for p in (self._period(match) for match in re.findall(self.period_pattern, comparison.group(0))) if p]
+        periods = list(dict.fromkeys(periods))
+        return periods if len(periods) > 1 else []
+    
+    def _period(self, text: str) -> Optional[Tuple[date, date]]:
+        """First and last day of a period matched by period_pattern; None for an impossible date"""
+        text = text.strip()
+        day = parse_date(text)
+        if day is not None:
+            return day, day
+        month = re.match(r'^(\d{4})-(\d{2})$', text)
+        named = re.match(r'^([a-z]{3})[a-z]*\.?,?\s+(\d{4})$', text)
+        if month and 1 <= int(month.group(2)) <= 12:
+            start = date(int(month.group(1)), int(month.group(2)), 1)
+        elif named:
+            start = date(int(named.group(2)), self.month_names.index(named.group(1)) + 1, 1)
+        elif re.match(r'^\d{4}$', text):
+            return date(int(text), 1, 1), date(int(text), 12, 31)
+        else:
+            return None
+        return start, self._add_months(start, 1) - timedelta(days=1)
+    
+    @staticmethod
+    def _add_months(day: date, months: int) -> date:
+        """Same day `months` later (or earlier), clamped to the end of shorter months"""
+        month_index = day.year * 12 + day.month - 1 + months
+        year, month = divmod(month_index, 12)
+        next_month = date(year + (month + 1) // 12, (month + 1) % 12 + 1, 1)
+        return date(year, month + 1, min(day.day, (next_month - timedelta(days=1)).day))
+    
     def suggest_questions(self) -> str:
         """Provide business-relevant question examples"""
         return """
@@ -1,100 +1,441 @@
-from typing import Tuple, List, Dict
+import time
+import asyncio
+import numpy as np
+from typing import Tuple, List, Dict, Iterator, Optional
 from src.utils.logger import setup_logger
+from src.utils.metrics import REGISTRY, STAGE_SECONDS, ERRORS
 from src.query_validator import QueryValidator
+from src.query_cache import QueryResultCache
+from src.reranker import ComplaintReranker
+from src.themes import ThemeCube, theme_cube_path
+from src.date_index import DATE_FILTERS, latest_indexed_date
 
 logger = setup_logger(__name__)
 
+REQUEST_SECONDS = REGISTRY.histogram(
+    "creditrust_request_seconds", "End-to-end latency of a question, to the full answer", ["mode"]
+)
+QUERIES = REGISTRY.counter(
+    "creditrust_queries", "Questions by outcome", ["outcome"]
+)
+IN_FLIGHT = REGISTRY.gauge(
+    "creditrust_requests_in_flight", "Questions being answered right now"
+)
+
+def segment_label(segment: Dict) -> str:
+    """Display name of a comparison segment, e.g. 'Kenya', 'Kenya / Credit Cards' or '2019-01-01 to 2019-12-31'"""
+    parts = [str(value) for field, value in segment.items() if field not in DATE_FILTERS]
+    if any(field in segment for field in DATE_FILTERS):
+        parts.append(f"{segment.get('date_from', '...')} to {segment.get('date_to', '...')}")
+    return " / ".join(parts)
+
+
 class RAGPipeline:
     def __init__(self, retriever, generator, config):
         self.retriever = retriever
         self.generator = generator
         self.validator = QueryValidator(config)  # ← Pass config to validator
         self.config = config
+        self.cache = None
+        if getattr(config, 'QUERY_CACHE_SIZE', 0) > 0:
+            self.cache = QueryResultCache(
+                max_entries=config.QUERY_CACHE_SIZE,
+                ttl_seconds=config.QUERY_CACHE_TTL_SECONDS,
+                similarity_threshold=config.SEMANTIC_CACHE_THRESHOLD
+            )
+        self.reranker = ComplaintReranker(config) if getattr(config, 'RERANK_ENABLED', False) else None
+        self._index_version = self._current_index_version()
+        # Exact counts for "top issues" questions; None when no index is saved on this machine
+        self.theme_cube = ThemeCube.load(theme_cube_path(config))
+        # "Last 90 days" counts back from the newest indexed complaint (today when unknown)
+        self.reference_date = latest_indexed_date(config)
     
-    def run(self, question: str, k: int = 5, filters: Dict = None) -> Tuple[str, List[Dict]]:
-        """Run the complete RAG pipeline with query validation"""
+    def run(self, question: str, k: int = 5, filters: Dict = None,
+            metrics: Optional[Dict] = None) -> Tuple[str, List[Dict]]:
+        """Run the complete RAG pipeline with query validation.
+        
+        Stage timings of this call are written into `metrics` when given; the
+        pipeline is shared between sessions, so nothing is kept on it.
+        """
+        metrics = {} if metrics is None else metrics
+        start = time.perf_counter()
+        IN_FLIGHT.inc()
         try:
-            logger.info(f"Processing question: {question}")
-            
-            # 1. Validate query first
-            is_valid, validation_message = self.validator.validate_query(question)
-            if not is_valid:
-                return validation_message + self.validator.suggest_questions(), []
-            
-            # 2. Extract automatic filters from the question
-            extracted_filters = self.validator.extract_filters(question)
-            
-            # 3. Merge filters: Manual filters (from UI) override automatic extraction
-            active_filters = (filters or {}).copy()
-            for key, value in extracted_filters.items():
-                if key not in active_filters:
-                    active_filters[key] = value
-            
-            if active_filters:
-                logger.info(f"Applying filters for retrieval: {active_filters}")
-            
-            # 4. Retrieve relevant chunks
-            chunks = self.retriever.retrieve_chunks(question, k, active_filters)
-            
-            if not chunks:
-                return "I couldn't find any relevant information to answer your question. Please try rephrasing or ask about a different topic related to financial complaints.", []
+            early_answer, chunks, context = self._prepare(question, k, filters, metrics)
+            if early_answer is not None:
+                return early_answer, chunks
             
             # Build prompt and generate answer
-            prompt = self.generator.build_prompt(chunks, question)
+            prompt = self._build_prompt(chunks, question, context["filters"], context["segments"])
+            generation_start = time.perf_counter()
             answer = self.generator.generate_answer(prompt)
+            metrics["generation_time"] = time.perf_counter() - generation_start
+            STAGE_SECONDS.observe(metrics["generation_time"], stage="generation")
+            self._cache_answer(context, answer, chunks)
+            self._record_answer(answer)
             
             logger.info("RAG pipeline completed successfully")
             return answer, chunks
             
         except Exception as e:
+            self._record_failure()
             error_msg = f"RAG pipeline failed: {str(e)}"
             logger.error(error_msg)
             return "I'm sorry, I encountered an error processing your request. Please try again.", []
+        finally:
+            IN_FLIGHT.dec()
+            REQUEST_SECONDS.observe(time.perf_counter() - start, mode="run")
+    
+    def run_stream(self, question: str, k: int = 5, filters: Dict = None,
+                   metrics: Optional[Dict] = None) -> Tuple[Iterator[str], List[Dict]]:
+        """Like run, but the answer is returned as an iterator of text pieces.
+        
+        Retrieval happens before this returns, so the chunks can be shown
+        while the answer is still being generated. Generation timings land in
+        `metrics` once the stream is exhausted.
+        """
+        metrics = {} if metrics is None else metrics
+        start = time.perf_counter()
+        try:
+            early_answer, chunks, context = self._prepare(question, k, filters, metrics)
+            if early_answer is not None:
+                metrics.update({"time_to_first_token": 0.0, "generation_time": 0.0})
+                REQUEST_SECONDS.observe(time.perf_counter() - start, mode="stream")
+                return iter([early_answer]), chunks
+            
+            prompt = self._build_prompt(chunks, question, context["filters"], context["segments"])
+            return self._stream_answer(prompt, context, chunks, start, metrics), chunks
+        
+        except Exception as e:
+            self._record_failure()
+            logger.error(f"RAG pipeline failed: {str(e)}")
+            return iter(["I'm sorry, I encountered an error processing your request. Please try again."]), []
+    
+    def _stream_answer(self, prompt: str, context: Dict, chunks: List[Dict], start: float,
+                       metrics: Dict) -> Iterator[str]:
+        """Relay generator pieces, then cache the assembled answer and record timings"""
+        IN_FLIGHT.inc()
+        try:
+            # The generator returns this call's own StreamResult, never shared with other sessions
+            result = yield from self.generator.generate_answer_stream(prompt)
+        finally:
+            # Also reached when the consumer stops reading early
+            IN_FLIGHT.dec()
+            REQUEST_SECONDS.observe(time.perf_counter() - start, mode="stream")
+        
+        metrics.update({"time_to_first_token": result.time_to_first_token, "generation_time": result.total_time})
+        if result.total_time is not None:
+            STAGE_SECONDS.observe(result.total_time, stage="generation")
+        if not result.complete:
+            # Generation failed (the generator counted the error): a truncated answer is not cached
+            QUERIES.inc(outcome="generation_error")
+            logger.warning(f"RAG pipeline stream ended early after {len(result.text)} characters: {metrics}")
+            return
+        self._cache_answer(context, result.text, chunks)
+        self._record_answer(result.text)
+        logger.info(f"RAG pipeline streamed successfully: {metrics}")
+    
+    def _prepare(self, question: str, k: int, filters: Dict, metrics: Dict):
+        """Validation, filter extraction, cache lookup and retrieval shared by run and run_stream.
+        
+        Returns (early_answer, chunks, context); early_answer is set when no
+        generation is needed (invalid query, cache hit, nothing retrieved).
+        """
+        early_answer, active_filters, segments = self._resolve_filters(question, filters)
+        if early_answer is not None:
+            return early_answer, [], None
+        
+        # Serve repeated or near-identical questions from the result cache
+        query_vector = None
+        if self.cache is not None:
+            cached = self._cached_exact(question, self._cache_filters(active_filters, segments), k)
+            if cached is None:
+                query_vector = self.retriever.embed_query(question)
+                cached = self._cached_semantic(query_vector, self._cache_filters(active_filters, segments), k)
+            if cached is not None:
+                return cached[0], cached[1], None
+        
+        if segments:
+            chunks = self._retrieve_segments(question, k, active_filters, segments, metrics, query_vector)
+        else:
+            # Retrieve relevant chunks (over-fetched when a reranker picks the final k)
+            chunks = self.retriever.retrieve_chunks(question, self._fetch_k(k), active_filters, query_vector=query_vector)
+            chunks = self._rerank(question, chunks, k, metrics)
+        return self._retrieved(question, active_filters, k, query_vector, chunks, segments)
+    
+    def _retrieve_segments(self, question: str, k: int, active_filters: Dict, segments: List[Dict],
+                           metrics: Dict, query_vector=None) -> List[Dict]:
+        """Comparison retrieval: one embedding and one batched search over every segment.
+        
+        The segments split k between them (see _segment_ks), so a segment
+        with many close matches cannot crowd the others out of the prompt.
+        Chunks come back grouped by segment and tagged with its label.
+        """
+        segment_ks = self._segment_ks(k, len(segments))
+        if query_vector is None:
+            query_vector = self.retriever.embed_query(question)
+        found = self.retriever.retrieve_many(
+            [question] * len(segments), self._fetch_k(max(segment_ks)),
+            [{**active_filters, **segment} for segment in segments],
+            np.repeat(np.asarray(query_vector, dtype='float32')[None, :], len(segments), axis=0)
+        )
+        return self._label_segments(segments, [
+            self._rerank(question, self._segment_candidates(chunks, segment_k), segment_k, metrics)
+            for chunks, segment_k in zip(found, segment_ks)
+        ])
+    
+    @staticmethod
+    def _segment_ks(k: int, num_segments: int) -> List[int]:
+        """Each segment's share of k, earlier segments taking the remainder; they add up to k"""
+        return [k // num_segments + (1 if i < k % num_segments else 0) for i in range(num_segments)]
+    
+    def _segment_candidates(self, chunks: List[Dict], segment_k: int) -> List[Dict]:
+        """A segment's share of a search run at the deepest segment's k"""
+        return chunks[:self._fetch_k(segment_k)] if segment_k else []
+    
+    @staticmethod
+    def _label_segments(segments: List[Dict], found: List[List[Dict]]) -> List[Dict]:
+        return [{**chunk, 'segment': segment_label(segment)} for segment, chunks in zip(segments, found) for chunk in chunks]
+    
+    def _fetch_k(self, k: int) -> int:
+        return self.reranker.candidate_count(k) if self.reranker is not None else k
+    
+    def _rerank(self, question: str, chunks: List[Dict], k: int, metrics: Dict) -> List[Dict]:
+        """Cross-encoder rerank of the candidates down to k, timed into metrics"""
+        if self.reranker is None or not chunks:
+            return chunks
+        with STAGE_SECONDS.time(stage="rerank"):
+            return self.reranker.rerank(question, chunks, k, metrics)
     
-    def _analyze_complaint_patterns(self, chunks: List[Dict], question: str) -> List[Dict]:
-        """Analyze complaint patterns for 'top' questions"""
-        # Simple frequency analysis
-        complaint_themes = {}
+    def _resolve_filters(self, question: str, filters: Dict):
+        """Validate the question and merge UI filters with the ones extracted from it.
         
-        for chunk in chunks:
-            text = chunk['text'].lower()
+        Returns (early_answer, active_filters, segments); early_answer is set
+        for invalid questions, segments for comparisons across markets or
+        products (a filter set in the UI overrides a comparison on that field).
+        """
+        logger.info(f"Processing question: {question}")
+        
+        with STAGE_SECONDS.time(stage="validation"):
+            # 1. Validate query first
+            is_valid, validation_message = self.validator.validate_query(question)
+            if not is_valid:
+                QUERIES.inc(outcome="invalid")
+                return validation_message + self.validator.suggest_questions(), None, []
+            
+            # 2. Extract automatic filters and comparison segments from the question
+            extracted_filters = self.validator.extract_filters(question, today=self.reference_date)
+            segments = self.validator.extract_segments(question)
+        
+        # 3. Merge filters: Manual filters (from UI) override automatic extraction
+        active_filters = (filters or {}).copy()
+        for key, value in extracted_filters.items():
+            if key not in active_filters:
+                active_filters[key] = value
+        
+        segments = [segment for segment in segments if not any(field in active_filters for field in segment)]
+        
+        if active_filters:
+            logger.info(f"Applying filters for retrieval: {active_filters}")
+        return None, active_filters, segments
+    
+    @staticmethod
+    def _cache_filters(active_filters: Dict, segments: List[Dict]) -> Dict:
+        """Cache key filters: comparisons of different segments must not share answers"""
+        if not segments:
+            return active_filters
+        return {**active_filters, "segments": [segment_label(segment) for segment in segments]}
+    
+    def _cached_exact(self, question: str, active_filters: Dict, k: int):
+        self._check_index_version()
+        with STAGE_SECONDS.time(stage="cache_lookup"):
+            cached = self.cache.get_exact(question, active_filters, k)
+        if cached is not None:
+            QUERIES.inc(outcome="cache_hit")
+            logger.info(f"Served from query cache: {self.cache.stats()}")
+        return cached
+    
+    def _cached_semantic(self, query_vector, active_filters: Dict, k: int):
+        with STAGE_SECONDS.time(stage="cache_lookup"):
+            cached = self.cache.get_semantic(query_vector, active_filters, k)
+        if cached is not None:
+            QUERIES.inc(outcome="cache_hit")
+            logger.info(f"Served from query cache: {self.cache.stats()}")
+        return cached
+    
+    def _retrieved(self, question: str, active_filters: Dict, k: int, query_vector, chunks: List[Dict],
+                   segments: Optional[List[Dict]] = None):
+        """(early_answer, chunks, context) for a completed retrieval"""
+        if not chunks:
+            QUERIES.inc(outcome="no_results")
+            return "I couldn't find any relevant information to answer your question. Please try rephrasing or ask about a different topic related to financial complaints.", [], None
+        
+        context = {"question": question, "filters": active_filters, "k": k, "query_vector": query_vector,
+                   "segments": segments or []}
+        return None, chunks, context
+    
+    async def arun(self, question: str, k: int = 5, filters: Dict = None) -> Tuple[str, List[Dict]]:
+        """Async run; the generator call does not block the event loop"""
+        return (await self.arun_many([question], k, [filters]))[0]
+    
+    async def arun_many(self, questions: List[str], k: int = 5,
+                        filters: List[Dict] = None) -> List[Tuple[str, List[Dict]]]:
+        """Answer a batch of questions concurrently.
+        
+        All questions are embedded in one encode call and retrieved with one
+        multi-query FAISS search per distinct filter set (comparison segments
+        included); at most
+        ASYNC_MAX_CONCURRENCY generator calls run at once. Results come back in
+        the order of `questions`.
+        """
+        filters = filters or [None] * len(questions)
+        results: List[Tuple[str, List[Dict]]] = [None] * len(questions)
+        start = time.perf_counter()
+        IN_FLIGHT.inc(len(questions))
+        try:
+            # 1. Validation, filter extraction and exact cache hits, per question
+            pending = []
+            for pos, (question, question_filters) in enumerate(zip(questions, filters)):
+                early_answer, active_filters, segments = self._resolve_filters(question, question_filters)
+                if early_answer is None and self.cache is not None:
+                    cached = self._cached_exact(question, self._cache_filters(active_filters, segments), k)
+                    if cached is not None:
+                        results[pos] = cached
+                        continue
+                if early_answer is not None:
+                    results[pos] = (early_answer, [])
+                else:
+                    pending.append((pos, active_filters, segments))
             
-            # Simple theme detection (you could make this more sophisticated)
-            themes = self._detect_complaint_themes(text)
-            for theme in themes:
-                complaint_themes[theme] = complaint_themes.get(theme, 0) + 1
-        
-        # Sort by frequency
-        sorted_themes = sorted(complaint_themes.items(), key=lambda x: x[1], reverse=True)
-        
-        # Add theme information to metadata for the generator
-        for chunk in chunks:
-            chunk['metadata']['themes'] = self._detect_complaint_themes(chunk['text'].lower())
-        
-        logger.info(f"Detected complaint themes: {sorted_themes[:5]}")
-        return chunks
-    
-    def _detect_complaint_themes(self, text: str) -> List[str]:
-        """Detect common complaint themes in text"""
-        themes = []
-        text_lower = text.lower()
-        
-        # Credit card specific themes
-        if any(term in text_lower for term in ['fee', 'charge', 'annual fee', 'hidden fee']):
-            themes.append('hidden_fees')
-        if any(term in text_lower for term in ['interest', 'apr', 'rate increase']):
-            themes.append('interest_rates')
-        if any(term in text_lower for term in ['fraud', 'unauthorized', 'stolen', 'identity theft']):
-            themes.append('fraud')
-        if any(term in text_lower for term in ['service', 'customer service', 'representative', 'wait']):
-            themes.append('poor_service')
-        if any(term in text_lower for term in ['credit limit', 'limit decrease', 'credit line']):
-            themes.append('credit_limit_issues')
-        if any(term in text_lower for term in ['payment', 'late payment', 'due date']):
-            themes.append('payment_issues')
-        if any(term in text_lower for term in ['dispute', 'chargeback', 'billing error']):
-            themes.append('dispute_resolution')
-        if any(term in text_lower for term in ['application', 'denied', 'approval', 'credit score']):
-            themes.append('application_issues')
-        
-        return themes
\ No newline at end of file
+            # 2. One embedding call and batched search for everything left; CPU-bound, so off the loop
+            pending_questions = [questions[pos] for pos, _, _ in pending]
+            query_vectors = await asyncio.to_thread(self.retriever.embed_queries, pending_questions) if pending else []
+            
+            to_retrieve = []
+            for (pos, active_filters, segments), query_vector in zip(pending, query_vectors):
+                cached = (self._cached_semantic(query_vector, self._cache_filters(active_filters, segments), k)
+                          if self.cache is not None else None)
+                if cached is not None:
+                    results[pos] = cached
+                else:
+                    to_retrieve.append((pos, active_filters, segments, query_vector))
+            
+            # A comparison adds one search per segment, each with its share of k
+            searches = []
+            for item, (pos, active_filters, segments, _) in enumerate(to_retrieve):
+                if segments:
+                    searches.extend((item, {**active_filters, **segment}, segment_k)
+                                    for segment, segment_k in zip(segments, self._segment_ks(k, len(segments))))
+                else:
+                    searches.append((item, active_filters, k))
+            
+            retrieved = []
+            if searches:
+                found = await asyncio.to_thread(
+                    self.retriever.retrieve_many,
+                    [questions[to_retrieve[item][0]] for item, _, _ in searches],
+                    self._fetch_k(max(search_k for _, _, search_k in searches)),
+                    [search_filters for _, search_filters, _ in searches],
+                    np.array([to_retrieve[item][3] for item, _, _ in searches])
+                )
+                # Searches share the deepest k; each keeps its own
+                found = [self._segment_candidates(chunks, search_k) for (_, _, search_k), chunks in zip(searches, found)]
+                if self.reranker is not None:
+                    with STAGE_SECONDS.time(stage="rerank"):
+                        found = await asyncio.to_thread(
+                            lambda: [self.reranker.rerank(questions[to_retrieve[item][0]], chunks, search_k) if chunks else chunks
+                                     for (item, _, search_k), chunks in zip(searches, found)]
+                        )
+                
+                per_item: List[List[List[Dict]]] = [[] for _ in to_retrieve]
+                for (item, _, _), chunks in zip(searches, found):
+                    per_item[item].append(chunks)
+                retrieved = [self._label_segments(segments, item_found) if segments else item_found[0]
+                             for (_, _, segments, _), item_found in zip(to_retrieve, per_item)]
+            
+            # 3. Concurrent generation, bounded by the semaphore
+            semaphore = asyncio.Semaphore(max(1, getattr(self.config, 'ASYNC_MAX_CONCURRENCY', 8)))
+            generations = []
+            for (pos, active_filters, segments, query_vector), chunks in zip(to_retrieve, retrieved):
+                early_answer, chunks, context = self._retrieved(questions[pos], active_filters, k, query_vector,
+                                                                chunks, segments)
+                if early_answer is not None:
+                    results[pos] = (early_answer, chunks)
+                else:
+                    generations.append(self._agenerate(semaphore, pos, chunks, context, results))
+            await asyncio.gather(*generations)
+            
+            logger.info(f"RAG pipeline answered {len(questions)} questions ({len(generations)} generated)")
+            return results
+        
+        except Exception as e:
+            self._record_failure(sum(result is None for result in results))
+            logger.error(f"RAG pipeline failed: {str(e)}")
+            error = ("I'm sorry, I encountered an error processing your request. Please try again.", [])
+            return [result if result is not None else error for result in results]
+        finally:
+            IN_FLIGHT.dec(len(questions))
+            elapsed = time.perf_counter() - start
+            for _ in questions:
+                REQUEST_SECONDS.observe(elapsed, mode="async")
+    
+    async def _agenerate(self, semaphore: asyncio.Semaphore, pos: int, chunks: List[Dict],
+                         context: Dict, results: List):
+        """Generate one answer into results[pos]; sync generators run in a worker thread"""
+        prompt = self._build_prompt(chunks, context["question"], context["filters"], context["segments"])
+        async with semaphore:
+            with STAGE_SECONDS.time(stage="generation"):
+                if hasattr(self.generator, 'agenerate_answer'):
+                    answer = await self.generator.agenerate_answer(prompt)
+                else:
+                    answer = await asyncio.to_thread(self.generator.generate_answer, prompt)
+        self._cache_answer(context, answer, chunks)
+        self._record_answer(answer)
+        results[pos] = (answer, chunks)
+    
+    def _build_prompt(self, chunks: List[Dict], question: str, filters: Dict = None,
+                      segments: Optional[List[Dict]] = None) -> str:
+        with STAGE_SECONDS.time(stage="prompt_build"):
+            return self.generator.build_prompt(chunks, question, aggregates=self._aggregates(question, filters, segments))
+    
+    def _aggregates(self, question: str, filters: Dict, segments: Optional[List[Dict]] = None) -> str:
+        """Exact theme counts under the question's filters (per segment for comparisons), for prevalence and trend questions"""
+        scopes = [{**(filters or {}), **segment} for segment in segments] if segments else [filters]
+        if (self.theme_cube is None or not all(self.theme_cube.supports(scope) for scope in scopes)
+                or not (segments or self.validator.is_aggregate_question(question))):
+            return ""
+        return "\n\n".join(self.theme_cube.describe(scope) for scope in scopes)
+    
+    @staticmethod
+    def _record_answer(answer: str):
+        # Generators report their own failures as a "TECHNICAL ERROR" answer
+        QUERIES.inc(outcome="generation_error" if answer.startswith("TECHNICAL ERROR") else "answered")
+    
+    @staticmethod
+    def _record_failure(count: int = 1):
+        ERRORS.inc(component="pipeline")
+        QUERIES.inc(count, outcome="error")
+    
+    def _cache_answer(self, context: Dict, answer: str, chunks: List[Dict]):
+        # Failed generations are not worth repeating from cache
+        if self.cache is not None and context is not None and not answer.startswith("TECHNICAL ERROR"):
+            self.cache.put(context["question"], self._cache_filters(context["filters"], context["segments"]), context["k"],
+                           context["query_vector"], answer, chunks)
+    
+    def invalidate_cache(self):
+        """Forget cached answers, e.g. after the index was rebuilt"""
+        if self.cache is not None:
+            self.cache.invalidate()
+        self.theme_cube = ThemeCube.load(theme_cube_path(self.config))
+        self.reference_date = latest_indexed_date(self.config)
+        self._index_version = self._current_index_version()
+    
+    def _current_index_version(self) -> Tuple:
+        """Identity and size of the live index; changes whenever it is rebuilt or updated"""
+        index = getattr(self.retriever, 'index', None)
+        return (id(index), getattr(index, 'ntotal', None), len(getattr(self.retriever, 'metadata', ())))
+    
+    def _check_index_version(self):
+        if self._current_index_version() != self._index_version:
+            logger.info("Index changed since answers were cached")
+            self.invalidate_cache()
@@ -0,0 +1,122 @@
+import time
+import numpy as np
+from typing import Dict, List, Optional
+
+from src.utils.exceptions import RetrievalError
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Weight of the newest measurement in the running per-pair cost estimate
+COST_SMOOTHING = 0.3
+# Pairs in the first batch of every query, scored whatever the current cost
+# estimate so a pessimistic estimate keeps being corrected
+PROBE_BATCH_SIZE = 4
+
+
+class ComplaintReranker:
+    """Cross-encoder rerank stage between retrieval and prompt building.
+    
+    The pipeline over-fetches `candidate_count(k)` chunks, which are scored
+    as (question, chunk) pairs in batches on CPU, best retrieval rank first.
+    A running estimate of the cost per pair sizes both the candidate count
+    and each batch so one query stays within RERANK_LATENCY_BUDGET_MS;
+    candidates left unscored when the budget runs out keep retrieval order
+    behind the scored ones.
+    """
+    
+    def __init__(self, config, model=None):
+        self.config = config
+        self.max_candidates = config.RERANK_CANDIDATES
+        self.max_batch_size = config.RERANK_BATCH_SIZE
+        self.budget_ms = config.RERANK_LATENCY_BUDGET_MS
+        self._model = model
+        self._ms_per_pair: Optional[float] = None
+        self._warmed_up = False
+    
+    @property
+    def model(self):
+        """CrossEncoder, loaded on first use"""
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.config.RERANK_MODEL_NAME, device="cpu")
+            logger.info(f"Loaded reranker model: {self.config.RERANK_MODEL_NAME}")
+        return self._model
+    
+    def warm_up(self):
+        """Load the model and score one pair, keeping load and first-call overhead out of the cost estimate"""
+        if not self._warmed_up:
+            self.model.predict([("warm up", "warm up")], batch_size=1, show_progress_bar=False)
+            self._warmed_up = True
+    
+    def candidate_count(self, k: int) -> int:
+        """How many chunks to retrieve for a final top-k, given the measured scoring cost"""
+        if self._ms_per_pair is None:
+            return max(k, self.max_candidates)
+        affordable = int(self.budget_ms / self._ms_per_pair)
+        return max(k, min(self.max_candidates, affordable))
+    
+    def rerank(self, question: str, chunks: List[Dict], k: int,
+               stats: Optional[Dict[str, float]] = None) -> List[Dict]:
+        """Reorder chunks by cross-encoder relevance and keep the best k.
+        
+        Timings and counts of this call are written into `stats` when given.
+        """
+        try:
+            self.warm_up()
+            start = time.perf_counter()
+            scores = np.full(len(chunks), -np.inf, dtype='float32')
+            scored = 0
+            largest_batch = 0
+            
+            while scored < len(chunks):
+                remaining_ms = self.budget_ms - (time.perf_counter() - start) * 1000
+                if scored == 0:
+                    # Always run the probe batch so the cost estimate stays current
+                    batch_size = min(self.max_batch_size, PROBE_BATCH_SIZE)
+                elif remaining_ms <= 0:
+                    break
+                elif self._ms_per_pair is not None:
+                    # Never start a batch the remaining budget cannot pay for
+                    batch_size = int(min(self.max_batch_size, remaining_ms / self._ms_per_pair))
+                    if batch_size < 1:
+                        break
+                
+                batch = chunks[scored:scored + batch_size]
+                batch_start = time.perf_counter()
+                scores[scored:scored + len(batch)] = self.model.predict(
+                    [(question, chunk['text']) for chunk in batch],
+                    batch_size=len(batch), show_progress_bar=False
+                )
+                self._observe((time.perf_counter() - batch_start) * 1000 / len(batch))
+                scored += len(batch)
+                largest_batch = max(largest_batch, len(batch))
+            
+            # Stable sort: unscored candidates (-inf) keep their retrieval order at the end
+            order = np.argsort(-scores, kind="stable")[:k]
+            reranked = []
+            for idx in order:
+                chunk = dict(chunks[idx])
+                if np.isfinite(scores[idx]):
+                    chunk['rerank_score'] = float(scores[idx])
+                reranked.append(chunk)
+            
+            elapsed = time.perf_counter() - start
+            if stats is not None:
+                stats.update({
+                    "rerank_time": elapsed,
+                    "rerank_candidates": len(chunks),
+                    "rerank_scored": scored,
+                    "rerank_batch_size": largest_batch,
+                })
+            logger.info(f"Reranked {scored}/{len(chunks)} candidates in {elapsed * 1000:.1f}ms")
+            return reranked
+        
+        except Exception as e:
+            raise RetrievalError(f"Failed to rerank chunks: {str(e)}")
+    
+    def _observe(self, ms_per_pair: float):
+        if self._ms_per_pair is None:
+            self._ms_per_pair = ms_per_pair
+        else:
+            self._ms_per_pair = COST_SMOOTHING * ms_per_pair + (1 - COST_SMOOTHING) * self._ms_per_pair
@@ -0,0 +1,112 @@
+import json
+import math
+import time
+import random
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+def ranked_complaint_ids(chunks: List[Dict]) -> List[str]:
+    """Distinct complaint ids in retrieval order (several chunks can come from one complaint)"""
+    ranked, seen = [], set()
+    for chunk in chunks:
+        complaint_id = str(chunk['metadata'].get('complaint_id'))
+        if complaint_id not in seen:
+            seen.add(complaint_id)
+            ranked.append(complaint_id)
+    return ranked
+
+def recall_at_k(ranked: Sequence[str], relevant: set, k: int) -> float:
+    """Share of the relevant complaints found in the top k"""
+    if not relevant:
+        return 0.0
+    return len(set(ranked[:k]) & relevant) / len(relevant)
+
+def reciprocal_rank(ranked: Sequence[str], relevant: set) -> float:
+    """1 / rank of the first relevant complaint, 0 if none was retrieved"""
+    for rank, complaint_id in enumerate(ranked, start=1):
+        if complaint_id in relevant:
+            return 1.0 / rank
+    return 0.0
+
+def ndcg_at_k(ranked: Sequence[str], relevant: set, k: int) -> float:
+    """Binary-relevance nDCG over the top k"""
+    dcg = sum(1.0 / math.log2(rank + 1) for rank, complaint_id in enumerate(ranked[:k], start=1)
+              if complaint_id in relevant)
+    ideal = sum(1.0 / math.log2(rank + 1) for rank in range(1, min(len(relevant), k) + 1))
+    return dcg / ideal if ideal > 0 else 0.0
+
+def chunk_overlap(exact: List[Dict], approximate: List[Dict]) -> float:
+    """Share of the exact search's chunks that the approximate search also returned"""
+    if not exact:
+        return 1.0
+    key = lambda chunk: (str(chunk['metadata'].get('complaint_id')), chunk['text'])
+    return len({key(c) for c in exact} & {key(c) for c in approximate}) / len(exact)
+
+def load_labelled_queries(path: str) -> List[Dict[str, Any]]:
+    """Read a JSON list or JSONL file of {question, filters, relevant_complaint_ids}"""
+    with open(path) as f:
+        content = f.read().strip()
+    if content.startswith("["):
+        queries = json.loads(content)
+    else:
+        queries = [json.loads(line) for line in content.splitlines() if line.strip()]
+    
+    for query in queries:
+        query["filters"] = query.get("filters") or {}
+        query["relevant_complaint_ids"] = [str(c) for c in query["relevant_complaint_ids"]]
+    logger.info(f"Loaded {len(queries)} labelled queries from {path}")
+    return queries
+
+def make_known_item_queries(metadata, num_queries: int, seed: int = 42,
+                            words: int = 12) -> List[Dict[str, Any]]:
+    """Bootstrap a labelled set when none exists: a passage taken from a chunk
+    should retrieve the complaint it came from (known-item search)"""
+    rng = random.Random(seed)
+    live = metadata.live_mask() if hasattr(metadata, 'live_mask') else None
+    queries = []
+    for _ in range(num_queries * 10):
+        if len(queries) == num_queries:
+            break
+        row = rng.randrange(len(metadata))
+        if live is not None and not live[row]:
+            continue
+        item = metadata[row]
+        tokens = item['text_chunk'].split()
+        if len(tokens) < words:
+            continue
+        start = rng.randrange(len(tokens) - words + 1)
+        queries.append({
+            "question": " ".join(tokens[start:start + words]),
+            "filters": {},
+            "relevant_complaint_ids": [str(item['complaint_id'])],
+        })
+    return queries
+
+def evaluate_retriever(retriever, queries: List[Dict[str, Any]], k: int,
+                       exact_retriever: Optional[Any] = None) -> Dict[str, float]:
+    """Mean recall@k, MRR, nDCG@k and latency of retriever.retrieve_chunks over the labelled queries.
+    
+    With `exact_retriever` (a retriever over an IndexFlatL2 with the same
+    vectors), also reports how much of the exact top-k the retriever returns.
+    """
+    totals = {f"recall@{k}": 0.0, "mrr": 0.0, f"ndcg@{k}": 0.0, "ms_per_query": 0.0}
+    if exact_retriever is not None:
+        totals[f"overlap@{k}_vs_exact"] = 0.0
+    
+    for query in queries:
+        relevant = set(query["relevant_complaint_ids"])
+        start = time.perf_counter()
+        chunks = retriever.retrieve_chunks(query["question"], k, query["filters"])
+        totals["ms_per_query"] += (time.perf_counter() - start) * 1000
+        ranked = ranked_complaint_ids(chunks)
+        totals[f"recall@{k}"] += recall_at_k(ranked, relevant, k)
+        totals["mrr"] += reciprocal_rank(ranked, relevant)
+        totals[f"ndcg@{k}"] += ndcg_at_k(ranked, relevant, k)
+        if exact_retriever is not None:
+            exact = exact_retriever.retrieve_chunks(query["question"], k, query["filters"])
+            totals[f"overlap@{k}_vs_exact"] += chunk_overlap(exact, chunks)
+    
+    return {name: value / len(queries) if queries else 0.0 for name, value in totals.items()}
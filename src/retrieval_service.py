@@ -0,0 +1,352 @@
+import json
+import time
+import asyncio
+import threading
+import http.client
+from urllib.parse import urlparse
+from dataclasses import dataclass, field
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+from src.date_index import date_bounds
+from src.utils.exceptions import RetrievalError
+from src.utils.logger import setup_logger
+from src.utils.timing import PhaseTimer
+from src.utils.metrics import REGISTRY, STAGE_SECONDS, PROMETHEUS_CONTENT_TYPE
+
+logger = setup_logger(__name__)
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+BATCH_SIZE = REGISTRY.histogram(
+    "creditrust_service_batch_size", "Requests coalesced into one micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256)
+)
+
+
+@dataclass
+class _Request:
+    """One queued embed or retrieve request, resolved by the batch it lands in"""
+    question: str
+    k: int = 0
+    filters: Optional[Dict[str, Any]] = None
+    vector: Optional[np.ndarray] = None
+    embed_only: bool = False
+    future: asyncio.Future = field(default=None, repr=False)
+    result: Any = field(default=None, repr=False)
+
+
+class MicroBatcher:
+    """Coalesces concurrent requests into one model.encode and one retrieve_many call.
+    
+    A batch closes when it holds `max_batch_size` requests or `max_wait_ms`
+    after its first request arrived. While a batch runs (in a worker thread),
+    new requests queue up for the next one, so batches grow with load. When a
+    batch fails, its requests are retried one by one, so only the request
+    that caused the failure gets the error.
+    """
+    
+    def __init__(self, retriever, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.retriever = retriever
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.requests = 0
+        self.batches = 0
+    
+    async def submit(self, request: _Request):
+        _validate(request)
+        request.future = asyncio.get_running_loop().create_future()
+        await self.queue.put(request)
+        return await request.future
+    
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            try:
+                results = await asyncio.to_thread(self._process, batch)
+                for request, result in zip(batch, results):
+                    _resolve(request, result)
+            except Exception as e:
+                if len(batch) == 1:
+                    _resolve(batch[0], error=e)
+                else:
+                    logger.warning(f"Batch of {len(batch)} requests failed ({e}); retrying them one by one")
+                    for request in batch:
+                        try:
+                            _resolve(request, (await asyncio.to_thread(self._process, [request]))[0])
+                        except Exception as request_error:
+                            _resolve(request, error=request_error)
+            self.requests += len(batch)
+            self.batches += 1
+            BATCH_SIZE.observe(len(batch))
+    
+    def _process(self, batch: List[_Request]) -> List[Any]:
+        """Embed every request without a vector in one call, then search the retrieve requests together"""
+        missing = [request for request in batch if request.vector is None]
+        if missing:
+            vectors = self.retriever.embed_queries([request.question for request in missing])
+            for request, vector in zip(missing, vectors):
+                request.vector = vector
+        
+        searches = [request for request in batch if not request.embed_only]
+        if searches:
+            # One depth for the whole batch; each request keeps its own top k
+            k = max(request.k for request in searches)
+            found = self.retriever.retrieve_many(
+                [request.question for request in searches], k, [request.filters for request in searches],
+                np.array([request.vector for request in searches], dtype='float32')
+            )
+            for request, chunks in zip(searches, found):
+                request.result = chunks[:request.k]
+        return [request.vector if request.embed_only else request.result for request in batch]
+
+
+class RetrievalServer:
+    """Minimal asyncio HTTP/1.1 JSON server sharing one warm retriever between many clients.
+    
+    POST /retrieve       {"question", "k", "filters", "vector"?}  -> {"chunks": [...]}
+    POST /retrieve_many  {"questions", "k", "filters"?, "vectors"?} -> {"results": [[...], ...]}
+    POST /embed          {"questions"}                            -> {"vectors": [[...], ...]}
+    GET  /health                                                  -> batching statistics
+    GET  /metrics                                                 -> Prometheus text format
+    """
+    
+    def __init__(self, retriever, host: str = "127.0.0.1", port: int = 8765,
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.host = host
+        self.port = port
+        self.batcher = MicroBatcher(retriever, max_batch_size, max_wait_ms)
+        self.started = time.time()
+    
+    async def serve_forever(self):
+        server = await asyncio.start_server(self._handle, self.host, self.port)
+        logger.info(f"Retrieval server listening on http://{self.host}:{self.port} "
+                    f"(batches of up to {self.batcher.max_batch_size}, max wait {self.batcher.max_wait * 1000:.1f}ms)")
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.batcher.run())
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # Keep-alive: serve requests on the connection until the client closes it
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+                
+                status, payload = await self._route(method, path, body)
+                if isinstance(payload, str):
+                    data, content_type = payload.encode("utf-8"), PROMETHEUS_CONTENT_TYPE
+                else:
+                    data, content_type = json.dumps(payload, default=_json_default).encode("utf-8"), "application/json"
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                    f"Content-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _route(self, method: str, path: str, body: bytes):
+        try:
+            if method == "GET" and path == "/health":
+                return 200, self._health()
+            if method == "GET" and path == "/metrics":
+                return 200, REGISTRY.render_prometheus()
+            if method != "POST" or path not in ("/retrieve", "/retrieve_many", "/embed"):
+                return 404, {"error": f"No route for {method} {path}"}
+            
+            payload = json.loads(body or b"{}")
+            if path == "/retrieve":
+                vector = payload.get("vector")
+                chunks = await self.batcher.submit(_Request(
+                    payload["question"], int(payload.get("k", 5)), payload.get("filters"),
+                    None if vector is None else np.asarray(vector, dtype='float32')
+                ))
+                return 200, {"chunks": chunks}
+            
+            questions = payload["questions"]
+            if path == "/embed":
+                vectors = await asyncio.gather(*[self.batcher.submit(_Request(q, embed_only=True)) for q in questions])
+                return 200, {"vectors": [vector.tolist() for vector in vectors]}
+            
+            filters = payload.get("filters") or [None] * len(questions)
+            vectors = payload.get("vectors") or [None] * len(questions)
+            results = await asyncio.gather(*[
+                self.batcher.submit(_Request(question, int(payload.get("k", 5)), question_filters,
+                                             None if vector is None else np.asarray(vector, dtype='float32')))
+                for question, question_filters, vector in zip(questions, filters, vectors)
+            ])
+            return 200, {"results": results}
+        
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, {"error": f"Bad request: {str(e)}"}
+        except Exception as e:
+            logger.error(f"Retrieval request failed: {e}")
+            return 500, {"error": str(e)}
+    
+    def _health(self) -> Dict[str, Any]:
+        batcher = self.batcher
+        return {
+            "status": "ok",
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "requests": batcher.requests,
+            "batches": batcher.batches,
+            "mean_batch_size": round(batcher.requests / batcher.batches, 2) if batcher.batches else 0.0,
+        }
+
+
+class RetrievalClient:
+    """Thin client with ComplaintRetriever's interface, backed by a RetrievalServer.
+    
+    Lets app.py and main.py skip loading the model, index and metadata
+    themselves. Each thread keeps its own keep-alive connection.
+    """
+    
+    def __init__(self, base_url: str, timeout: float = 30.0):
+        parsed = urlparse(base_url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 80
+        self.timeout = timeout
+        self._local = threading.local()
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        return self.embed_queries([query])[0]
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        return np.asarray(self._post("/embed", {"questions": queries})["vectors"], dtype='float32')
+    
+    def retrieve_chunks(self, query: str, k: int = 5,
+                        filters: Optional[Dict[str, Any]] = None,
+                        query_vector: Optional[np.ndarray] = None) -> List[Dict]:
+        payload = {"question": query, "k": k, "filters": filters}
+        if query_vector is not None:
+            payload["vector"] = np.asarray(query_vector, dtype='float32').tolist()
+        return self._post("/retrieve", payload)["chunks"]
+    
+    def retrieve_many(self, queries: List[str], k: int = 5,
+                      filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+                      query_vectors: Optional[np.ndarray] = None) -> List[List[Dict]]:
+        payload = {"questions": queries, "k": k, "filters": filters}
+        if query_vectors is not None:
+            payload["vectors"] = np.asarray(query_vectors, dtype='float32').tolist()
+        return self._post("/retrieve_many", payload)["results"]
+    
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health", None)
+    
+    def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return self._request("POST", path, payload)
+    
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        body = None if payload is None else json.dumps(payload, default=_json_default).encode("utf-8")
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                # Retrieval happens in the server, so the client times the round trip as one stage
+                with STAGE_SECONDS.time(stage="retrieval_service"):
+                    connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                    response = connection.getresponse()
+                    result = json.loads(response.read())
+                if response.status != 200:
+                    raise RetrievalError(f"Retrieval server returned {response.status}: {result.get('error')}")
+                return result
+            except (ConnectionError, http.client.HTTPException, OSError) as e:
+                # A kept-alive connection the server already closed: reconnect once
+                self._local.connection = None
+                connection.close()
+                if attempt == 1:
+                    raise RetrievalError(f"Retrieval server at {self.host}:{self.port} unreachable: {str(e)}")
+    
+    def _connection(self) -> http.client.HTTPConnection:
+        if getattr(self._local, "connection", None) is None:
+            self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self._local.connection
+
+
+def open_retriever(config, rebuild: bool = False, timer: Optional[PhaseTimer] = None, use_service: bool = True):
+    """The retriever app.py and main.py should use.
+    
+    With RETRIEVAL_SERVICE_URL set, a RetrievalClient for the shared server
+    (no model or index is loaded in this process); otherwise the index is
+    loaded (or built) here and searched in-process, sharded when SHARD_COUNT > 1.
+    """
+    timer = timer or PhaseTimer()
+    if use_service and config.RETRIEVAL_SERVICE_URL and not rebuild:
+        with timer.phase("retrieval service"):
+            client = RetrievalClient(config.RETRIEVAL_SERVICE_URL)
+            # Fail at startup, not on the first question, when the server is down
+            client.health()
+        return client
+    
+    # Imported here: clients of a retrieval server need neither FAISS nor the embedding model
+    from src.indexer import ComplaintIndexer
+    from src.retriever import ComplaintRetriever
+    from src.sharded_retriever import ShardedComplaintRetriever
+    
+    indexer = ComplaintIndexer(config)
+    indexer.load_or_build(rebuild=rebuild, timer=timer)
+    with timer.phase("embedding model"):
+        model = indexer.model
+    with timer.phase("retriever"):
+        if config.SHARD_COUNT > 1:
+            # Shards are searched in worker processes and merged here
+            return ShardedComplaintRetriever(model, config)
+        return ComplaintRetriever(model, indexer.index, indexer.metadatas,
+                                  sparse_index=indexer.sparse_index,
+                                  hybrid_candidates=config.HYBRID_CANDIDATES, rrf_k=config.RRF_K,
+                                  date_index=indexer.date_index)
+
+
+def _resolve(request: _Request, result: Any = None, error: Optional[Exception] = None):
+    """Complete a request's future unless its client already gave up on it"""
+    if request.future.done():
+        return
+    if error is not None:
+        request.future.set_exception(error)
+    else:
+        request.future.set_result(result)
+
+
+def _validate(request: _Request):
+    """Reject a malformed request before it joins a batch; raises ValueError or TypeError"""
+    if request.filters is not None and not isinstance(request.filters, dict):
+        raise TypeError(f"filters must be an object, got {type(request.filters).__name__}")
+    date_bounds(request.filters)
+    if not request.embed_only and request.k < 1:
+        raise ValueError(f"k must be at least 1, got {request.k}")
+    if request.vector is not None and request.vector.ndim != 1:
+        raise ValueError(f"vector must be one-dimensional, got shape {request.vector.shape}")
+
+
+def _json_default(value: Any) -> Any:
+    """numpy scalars and arrays found in chunk metadata"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
@@ -1,63 +1,307 @@
 import numpy as np
-from typing import List, Dict, Any, Optional
-from sentence_transformers import SentenceTransformer
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 import faiss
 
+from src.date_index import DATE_FILTERS, DateIndex, date_bounds, epoch_day
+from src.metadata_store import INTERNAL_COLUMNS
+from src.query_cache import filters_key
+from src.sparse_index import BM25Index
+from src.themes import theme_names
+from src.vector_index import search_params, is_approximate
 from src.utils.exceptions import RetrievalError
 from src.utils.logger import setup_logger
+from src.utils.metrics import REGISTRY, STAGE_SECONDS, ERRORS
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
 
 logger = setup_logger(__name__)
 
+FILTER_REJECTED_RATIO = REGISTRY.histogram(
+    "creditrust_filter_rejected_ratio", "Share of indexed chunks excluded by a filtered query's filters",
+    buckets=(0.0, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 0.999, 1.0)
+)
+FILTER_NO_MATCH = REGISTRY.counter(
+    "creditrust_filter_no_match", "Filtered queries that no indexed chunk matched"
+)
+INDEX_CHUNKS = REGISTRY.gauge(
+    "creditrust_index_chunks", "Vectors in the searched FAISS index"
+)
+
 class ComplaintRetriever:
-    def __init__(self, embedding_model: SentenceTransformer, index, metadata: List[Dict]):
+    def __init__(self, embedding_model: "SentenceTransformer", index, metadata: List[Dict],
+                 sparse_index: Optional[BM25Index] = None, hybrid_candidates: int = 50, rrf_k: int = 60,
+                 date_index: Optional[DateIndex] = None):
         self.embedding_model = embedding_model
         self.index = index
         self.metadata = metadata
+        # With a BM25 index, dense and keyword results are fused (hybrid mode)
+        self.sparse_index = sparse_index
+        self.hybrid_candidates = hybrid_candidates
+        self.rrf_k = rrf_k
+        # Lazily built per-field codes used to resolve filters to index ids
+        self._field_codes: Dict[str, Any] = {}
+        # Sorted complaint dates for date_from / date_to; built from the metadata when not passed in
+        self._date_index = date_index
+        self._date_index_checked = date_index is not None
+        if index is not None:
+            INDEX_CHUNKS.set(index.ntotal)
     
     def embed_query(self, query: str) -> np.ndarray:
         """Embed a query string"""
-        return self.embedding_model.encode([query])[0]
+        with STAGE_SECONDS.time(stage="query_embedding"):
+            return self.embedding_model.encode([query])[0]
     
     def retrieve_chunks(self, query: str, k: int = 5, 
-                      filters: Optional[Dict[str, Any]] = None) -> List[Dict]:
-        """Retrieve relevant chunks with optional filtering"""
+                      filters: Optional[Dict[str, Any]] = None,
+                      query_vector: Optional[np.ndarray] = None) -> List[Dict]:
+        """Retrieve relevant chunks, applying metadata filters before the vector search.
+        
+        Pass `query_vector` when the query was already embedded to skip re-encoding it.
+        In hybrid mode `score` is the fused reciprocal-rank score (higher is
+        better) instead of the L2 distance.
+        """
         try:
-            # Semantic search
-            query_vector = self.embed_query(query).astype('float32')
+            # Resolve filters to the set of index ids allowed to match
+            candidate_mask = self._filter_candidates(filters)
+            if candidate_mask is not None and not candidate_mask.any():
+                logger.info(f"No indexed chunks match filters {filters}")
+                return []
             
-            # Search for results
-            distances, indices = self.index.search(
-                np.array([query_vector]), k * 2  # Get extra to allow filtering
-            )
-            
-            # Apply filters and format results
-            results = []
-            for i, idx in enumerate(indices[0]):
-                if idx < len(self.metadata) and idx >= 0:
-                    metadata_item = self.metadata[idx]
-                    
-                    if self._passes_filters(metadata_item, filters):
-                        results.append({
-                            'text': metadata_item['text_chunk'],
-                            'metadata': {k: v for k, v in metadata_item.items() if k != 'text_chunk'},
-                            'score': float(distances[0][i])
-                        })
-                    
-                    if len(results) >= k:
-                        break
+            # Semantic search restricted to the candidate ids
+            if query_vector is None:
+                query_vector = self.embed_query(query)
+            query_vector = np.asarray(query_vector, dtype='float32')
+            distances, indices = self._search(np.array([query_vector]), self._search_depth(k), candidate_mask)
+            results = self._rank(query, distances[0], indices[0], k, candidate_mask)
             
             logger.info(f"Retrieved {len(results)} chunks for query: '{query}'")
             return results
             
         except Exception as e:
+            ERRORS.inc(component="retriever")
+            raise RetrievalError(f"Failed to retrieve chunks: {str(e)}")
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed several query strings in one encode call"""
+        with STAGE_SECONDS.time(stage="query_embedding"):
+            return np.asarray(self.embedding_model.encode(queries), dtype='float32')
+    
+    def retrieve_many(self, queries: List[str], k: int = 5,
+                      filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+                      query_vectors: Optional[np.ndarray] = None) -> List[List[Dict]]:
+        """Batched retrieve_chunks: one embedding call and one FAISS search per distinct filter set.
+        
+        `filters` holds one filter dict (or None) per query.
+        """
+        try:
+            if not queries:
+                return []
+            filters = filters or [None] * len(queries)
+            if query_vectors is None:
+                query_vectors = self.embed_queries(queries)
+            query_vectors = np.asarray(query_vectors, dtype='float32')
+            
+            # Queries sharing a filter set share the candidate mask, so they go in one search
+            groups: Dict[str, List[int]] = {}
+            for pos, query_filters in enumerate(filters):
+                groups.setdefault(filters_key(query_filters), []).append(pos)
+            
+            results: List[List[Dict]] = [[] for _ in queries]
+            for positions in groups.values():
+                candidate_mask = self._filter_candidates(filters[positions[0]], len(positions))
+                if candidate_mask is not None and not candidate_mask.any():
+                    continue
+                distances, indices = self._search(query_vectors[positions], self._search_depth(k), candidate_mask)
+                for row, pos in enumerate(positions):
+                    results[pos] = self._rank(queries[pos], distances[row], indices[row], k, candidate_mask)
+            
+            logger.info(f"Retrieved chunks for {len(queries)} queries in {len(groups)} searches")
+            return results
+        
+        except Exception as e:
+            ERRORS.inc(component="retriever")
             raise RetrievalError(f"Failed to retrieve chunks: {str(e)}")
     
+    def _search_depth(self, k: int) -> int:
+        """Hybrid mode fuses deeper candidate lists than the k finally returned"""
+        return max(k, self.hybrid_candidates) if self.sparse_index is not None else k
+    
+    def _rank(self, query: str, distances: np.ndarray, indices: np.ndarray, k: int,
+              candidate_mask: Optional[np.ndarray]) -> List[Dict]:
+        """Final top-k for one query: dense hits as is, or fused with BM25 hits in hybrid mode"""
+        if self.sparse_index is None:
+            return self._to_results(distances, indices)
+        
+        with STAGE_SECONDS.time(stage="keyword_search"):
+            _, sparse_ids = self.sparse_index.search(query, self._search_depth(k), candidate_mask)
+        fused = self._reciprocal_rank_fusion([indices[indices >= 0], sparse_ids])
+        top = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        return self._to_results([score for _, score in top], [idx for idx, _ in top])
+    
+    def _reciprocal_rank_fusion(self, rankings: List[np.ndarray]) -> Dict[int, float]:
+        """Sum of 1 / (rrf_k + rank) over every ranking an id appears in"""
+        fused: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, idx in enumerate(ranking.tolist(), start=1):
+                fused[idx] = fused.get(idx, 0.0) + 1.0 / (self.rrf_k + rank)
+        return fused
+    
+    def _to_results(self, distances: np.ndarray, indices: np.ndarray) -> List[Dict]:
+        """Materialize one row of search output; only the returned rows are read from the metadata store"""
+        results = []
+        for distance, idx in zip(distances, indices):
+            if idx < len(self.metadata) and idx >= 0:
+                metadata_item = self.metadata[idx]
+                metadata = {k: v for k, v in metadata_item.items()
+                            if k != 'text_chunk' and k not in INTERNAL_COLUMNS}
+                if 'themes' in metadata:
+                    # Stored as a theme bitmask
+                    metadata['themes'] = theme_names(metadata['themes'])
+                results.append({
+                    'text': metadata_item['text_chunk'],
+                    'metadata': metadata,
+                    'score': float(distance)
+                })
+        return results
+    
+    def _search(self, query_vectors: np.ndarray, k: int,
+                candidate_mask: Optional[np.ndarray] = None):
+        """Run the FAISS search, optionally restricted to ids set in candidate_mask"""
+        with STAGE_SECONDS.time(stage="vector_search"):
+            return self._faiss_search(query_vectors, k, candidate_mask)
+    
+    def _faiss_search(self, query_vectors: np.ndarray, k: int, candidate_mask: Optional[np.ndarray]):
+        """Untimed body of _search"""
+        if candidate_mask is None:
+            return self.index.search(query_vectors, k)
+        
+        # The bitmap must stay referenced for the duration of the search
+        bitmap = np.packbits(candidate_mask, bitorder='little')
+        selector = faiss.IDSelectorBitmap(len(candidate_mask), faiss.swig_ptr(bitmap))
+        distances, indices = self.index.search(
+            query_vectors, k, params=search_params(self.index, selector)
+        )
+        
+        # Approximate indexes may visit too few matching ids under a selective
+        # filter; widen the search once so we still return k results
+        if is_approximate(self.index) and (indices < 0).any():
+            expected = min(k, int(candidate_mask.sum()))
+            if (indices >= 0).sum(axis=1).min() < expected:
+                distances, indices = self.index.search(
+                    query_vectors, k, params=search_params(self.index, selector, exhaustive=True, k=k)
+                )
+            # Graph indexes can still strand a handful of matches; score them exactly. An exhaustive IVF
+            # search visits every list, and IVF indexes cannot reconstruct vectors without a direct map
+            if isinstance(self.index, faiss.IndexHNSW) and (indices >= 0).sum(axis=1).min() < expected:
+                distances, indices = self._exact_search(query_vectors, k, np.flatnonzero(candidate_mask))
+        return distances, indices
+    
+    def _exact_search(self, query_vectors: np.ndarray, k: int, ids: np.ndarray):
+        """Brute-force L2 over a small candidate set using vectors stored in the index (flat or HNSW)"""
+        vectors = self.index.reconstruct_batch(ids.astype('int64'))
+        all_distances = ((query_vectors[:, None, :] - vectors[None, :, :]) ** 2).sum(axis=2)
+        top = np.argsort(all_distances, axis=1)[:, :k]
+        distances = np.full((len(query_vectors), k), np.inf, dtype='float32')
+        indices = np.full((len(query_vectors), k), -1, dtype='int64')
+        distances[:, :top.shape[1]] = np.take_along_axis(all_distances, top, axis=1)
+        indices[:, :top.shape[1]] = ids[top]
+        return distances, indices
+    
+    def _filter_candidates(self, filters: Optional[Dict[str, Any]], num_queries: int = 1) -> Optional[np.ndarray]:
+        """_candidate_mask, recording how much of the index the filters rejected"""
+        with STAGE_SECONDS.time(stage="filtering"):
+            mask = self._candidate_mask(filters)
+        if filters and mask is not None and len(mask):
+            rejected = 1.0 - float(mask.sum()) / len(mask)
+            for _ in range(num_queries):
+                FILTER_REJECTED_RATIO.observe(rejected)
+            if rejected == 1.0:
+                FILTER_NO_MATCH.inc(num_queries)
+        return mask
+    
+    def _candidate_mask(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Intersect the id masks of all filters; None means no restriction"""
+        # Chunks removed by incremental updates are always excluded
+        mask = self.metadata.live_mask() if hasattr(self.metadata, 'live_mask') else None
+        if not filters:
+            return mask
+        
+        n = self.index.ntotal
+        day_from, day_to = date_bounds(filters)
+        if day_from is not None or day_to is not None:
+            date_index = self.date_index
+            if date_index is not None:
+                # Two binary searches give the candidate rows of the whole range
+                date_mask = date_index.mask(day_from, day_to)[:n]
+                mask = date_mask if mask is None else mask & date_mask
+        
+        for key, value in filters.items():
+            if key in DATE_FILTERS:
+                continue
+            field = self._get_field_codes(key)
+            if field is None:
+                # Field not present in the metadata, filter does not apply
+                continue
+            codes, codes_by_value = field
+            value_mask = np.isin(codes[:n], codes_by_value.get(self._normalize(value), []))
+            mask = value_mask if mask is None else mask & value_mask
+        return mask
+    
+    @property
+    def date_index(self) -> Optional[DateIndex]:
+        """Date index of the metadata, None when it has no date field"""
+        if not self._date_index_checked:
+            self._date_index = DateIndex.from_metadata(self.metadata)
+            self._date_index_checked = True
+        return self._date_index
+    
+    def _get_field_codes(self, key: str):
+        """Dictionary-encoded view of a metadata field: (codes, {normalized value: [codes]})"""
+        if key not in self._field_codes:
+            if hasattr(self.metadata, 'categorical'):
+                # Columnar store: codes are already on disk
+                column = self.metadata.categorical(key)
+                if column is None:
+                    self._field_codes[key] = None
+                    return None
+                codes, categories = column
+            else:
+                # Plain list of dicts: encode the field in one pass
+                lookup: Dict[Any, int] = {}
+                codes = np.empty(len(self.metadata), dtype=np.int32)
+                for idx, metadata_item in enumerate(self.metadata):
+                    codes[idx] = lookup.setdefault(metadata_item.get(key), len(lookup))
+                if not lookup or list(lookup) == [None]:
+                    self._field_codes[key] = None
+                    return None
+                categories = list(lookup)
+            
+            codes_by_value: Dict[Any, List[int]] = {}
+            for code, value in enumerate(categories):
+                codes_by_value.setdefault(self._normalize(value), []).append(code)
+            self._field_codes[key] = (codes, codes_by_value)
+        return self._field_codes[key]
+    
+    @staticmethod
+    def _normalize(value: Any) -> Any:
+        """Filter values compare case-insensitively for strings"""
+        return value.lower() if isinstance(value, str) else value
+    
     def _passes_filters(self, metadata: Dict, filters: Optional[Dict]) -> bool:
         """Check if metadata passes all filters (case-insensitive)"""
         if not filters:
             return True
         
+        day_from, day_to = date_bounds(filters)
+        if (day_from is not None or day_to is not None) and 'date' in metadata:
+            day = epoch_day(metadata['date'])
+            if day is None or (day_from is not None and day < day_from) or (day_to is not None and day > day_to):
+                return False
+        
         for key, value in filters.items():
+            if key in DATE_FILTERS:
+                continue
             if key in metadata:
                 # Handle case-insensitive comparison for strings
                 meta_val = metadata[key]
@@ -66,4 +310,4 @@ class ComplaintRetriever:
                         return False
                 elif meta_val != value:
                     return False
-        return True
\ No newline at end of file
+        return True
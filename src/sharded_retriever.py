@@ -0,0 +1,224 @@
+import os
+import heapq
+import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from src.date_index import date_bounds, epoch_day
+from src.sharding import read_layout, shard_config
+from src.utils.exceptions import RetrievalError
+from src.utils.logger import setup_logger
+from src.utils.metrics import STAGE_SECONDS, ERRORS
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+logger = setup_logger(__name__)
+
+# The shard a worker process serves, opened once by its initializer
+_shard_retriever = None
+
+
+def _open_shard(config, num_threads: int):
+    """Worker initializer: load one shard's index, metadata and BM25 postings"""
+    global _shard_retriever
+    import faiss
+    from src.indexer import ComplaintIndexer
+    from src.retriever import ComplaintRetriever
+    
+    faiss.omp_set_num_threads(num_threads)
+    indexer = ComplaintIndexer(config)
+    indexer.load()
+    # Queries arrive already embedded, so workers never load the embedding model
+    _shard_retriever = ComplaintRetriever(None, indexer.index, indexer.metadatas,
+                                          sparse_index=indexer.sparse_index,
+                                          hybrid_candidates=config.HYBRID_CANDIDATES, rrf_k=config.RRF_K,
+                                          date_index=indexer.date_index)
+
+
+def _shard_size() -> int:
+    return _shard_retriever.index.ntotal
+
+
+def _search_shard(queries: List[str], k: int, filters: List[Optional[Dict[str, Any]]],
+                  query_vectors: np.ndarray) -> List[Tuple[List[Tuple], List[Tuple]]]:
+    """Per query, the shard's dense and (in hybrid mode) BM25 rankings as (score, row, chunk) lists.
+    
+    Rankings are returned unfused: reciprocal rank fusion only gives the
+    global answer when applied to the merged, global rankings.
+    """
+    retriever = _shard_retriever
+    depth = retriever._search_depth(k)
+    rankings = []
+    for query, query_filters, query_vector in zip(queries, filters, query_vectors):
+        candidate_mask = retriever._candidate_mask(query_filters)
+        if candidate_mask is not None and not candidate_mask.any():
+            rankings.append(([], []))
+            continue
+        distances, indices = retriever._search(query_vector[None, :], depth, candidate_mask)
+        keep = indices[0] >= 0
+        dense = _ranking(retriever, distances[0][keep], indices[0][keep])
+        sparse = []
+        if retriever.sparse_index is not None:
+            scores, ids = retriever.sparse_index.search(query, depth, candidate_mask)
+            sparse = _ranking(retriever, scores, ids)
+        rankings.append((dense, sparse))
+    return rankings
+
+
+def _ranking(retriever, scores: np.ndarray, ids: np.ndarray) -> List[Tuple]:
+    return [(float(score), int(idx), chunk)
+            for score, idx, chunk in zip(scores, ids, retriever._to_results(scores, ids))]
+
+
+class ShardedComplaintRetriever:
+    """ComplaintRetriever over an index split into shards (see ComplaintIndexer.build_shards).
+    
+    Every shard is served by its own worker process, standing in for a
+    separate node. Queries are embedded once here, scattered to the shards
+    that can hold matches, and each shard's rankings are merged with a heap
+    into the global top-k (hybrid mode fuses the merged dense and BM25
+    rankings). Market-sharded layouts skip shards that cannot match a
+    market filter.
+    """
+    
+    def __init__(self, embedding_model: "SentenceTransformer", config, layout: Optional[Dict[str, Any]] = None):
+        self.embedding_model = embedding_model
+        self.config = config
+        self.layout = layout or read_layout(config)
+        if self.layout is None:
+            raise RetrievalError(f"No sharded index at {config.VECTOR_STORE_PATH}; build it with SHARD_COUNT > 1")
+        self.shards = self.layout["shards"]
+        # Hybrid mode fuses the dense and BM25 rankings after merging them across shards
+        self.hybrid = config.RETRIEVAL_MODE.lower() == "hybrid"
+        
+        # spawn: forking a process that already runs FAISS/OpenMP threads can deadlock
+        context = multiprocessing.get_context("spawn")
+        num_threads = max(1, (os.cpu_count() or 1) // len(self.shards))
+        self._workers = [
+            ProcessPoolExecutor(max_workers=1, mp_context=context, initializer=_open_shard,
+                                initargs=(shard_config(config, shard["shard"]), num_threads))
+            for shard in self.shards
+        ]
+        try:
+            # Open every shard now, in parallel, so a broken shard fails at startup rather than on a query
+            sizes = [future.result() for future in [worker.submit(_shard_size) for worker in self._workers]]
+        except Exception as e:
+            self.close()
+            raise RetrievalError(f"Failed to open index shards: {str(e)}")
+        logger.info(f"Opened {len(self.shards)} index shards ({sum(sizes)} chunks) by {self.layout['shard_by']}")
+    
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a query string"""
+        with STAGE_SECONDS.time(stage="query_embedding"):
+            return self.embedding_model.encode([query])[0]
+    
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed several query strings in one encode call"""
+        with STAGE_SECONDS.time(stage="query_embedding"):
+            return np.asarray(self.embedding_model.encode(queries), dtype='float32')
+    
+    def retrieve_chunks(self, query: str, k: int = 5,
+                        filters: Optional[Dict[str, Any]] = None,
+                        query_vector: Optional[np.ndarray] = None) -> List[Dict]:
+        """Same contract as ComplaintRetriever.retrieve_chunks, searched across all shards"""
+        query_vectors = None if query_vector is None else np.asarray(query_vector, dtype='float32')[None, :]
+        return self.retrieve_many([query], k, [filters], query_vectors)[0]
+    
+    def retrieve_many(self, queries: List[str], k: int = 5,
+                      filters: Optional[List[Optional[Dict[str, Any]]]] = None,
+                      query_vectors: Optional[np.ndarray] = None) -> List[List[Dict]]:
+        """Batched retrieve_chunks: one request per shard carrying every query routed to it"""
+        try:
+            if not queries:
+                return []
+            filters = filters or [None] * len(queries)
+            if query_vectors is None:
+                query_vectors = self.embed_queries(queries)
+            query_vectors = np.asarray(query_vectors, dtype='float32')
+            
+            # Scatter: each shard gets the queries whose filters it can satisfy
+            routed: List[List[int]] = [[] for _ in self.shards]
+            for pos, query_filters in enumerate(filters):
+                for shard in self._shards_for(query_filters):
+                    routed[shard].append(pos)
+            futures = {
+                shard: self._workers[shard].submit(
+                    _search_shard, [queries[p] for p in positions], k,
+                    [filters[p] for p in positions], query_vectors[positions]
+                )
+                for shard, positions in enumerate(routed) if positions
+            }
+            
+            # Gather: every shard ranking is already sorted, so heap merges yield the global rankings
+            per_query: List[List[Tuple[int, List[Tuple], List[Tuple]]]] = [[] for _ in queries]
+            with STAGE_SECONDS.time(stage="shard_search"):
+                for shard, future in futures.items():
+                    for pos, (dense, sparse) in zip(routed[shard], future.result()):
+                        per_query[pos].append((shard, dense, sparse))
+            results = [self._merge(queries[pos], shard_rankings, k) for pos, shard_rankings in enumerate(per_query)]
+            
+            logger.info(f"Retrieved chunks for {len(queries)} queries from {len(futures)} shards")
+            return results
+        
+        except Exception as e:
+            ERRORS.inc(component="retriever")
+            raise RetrievalError(f"Failed to retrieve chunks: {str(e)}")
+    
+    def _merge(self, query: str, shard_rankings: List[Tuple[int, List[Tuple], List[Tuple]]], k: int) -> List[Dict]:
+        """Global top-k from per-shard rankings: nearest dense hits, or RRF over the merged rankings in hybrid mode"""
+        depth = max(k, self.config.HYBRID_CANDIDATES) if self.hybrid else k
+        dense = heapq.merge(*[[(score, (shard, row), chunk) for score, row, chunk in ranking]
+                              for shard, ranking, _ in shard_rankings], key=lambda hit: hit[0])
+        dense = list(itertools.islice(dense, depth))
+        if not self.hybrid:
+            return [chunk for _, _, chunk in dense]
+        
+        # BM25 scores use per-shard term statistics, so the merged keyword ranking is approximate
+        sparse = heapq.merge(*[[(score, (shard, row), chunk) for score, row, chunk in ranking]
+                               for shard, _, ranking in shard_rankings], key=lambda hit: -hit[0])
+        sparse = list(itertools.islice(sparse, depth))
+        
+        fused: Dict[Tuple[int, int], float] = {}
+        chunks: Dict[Tuple[int, int], Dict] = {}
+        for ranking in (dense, sparse):
+            for rank, (_, key, chunk) in enumerate(ranking, start=1):
+                fused[key] = fused.get(key, 0.0) + 1.0 / (self.config.RRF_K + rank)
+                chunks[key] = chunk
+        top = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [{**chunks[key], 'score': score} for key, score in top]
+    
+    def _shards_for(self, filters: Optional[Dict[str, Any]]) -> List[int]:
+        """Positions of the shards that may hold chunks matching the filters"""
+        positions = list(range(len(self.shards)))
+        market = (filters or {}).get('market')
+        if self.layout["shard_by"] == "market" and isinstance(market, str):
+            positions = [i for i in positions if market.lower() in self.shards[i]["markets"]]
+        
+        # Shards whose complaint dates all fall outside the range are skipped
+        day_from, day_to = date_bounds(filters)
+        if day_from is not None or day_to is not None:
+            positions = [i for i in positions if self._overlaps(self.shards[i].get("dates"), day_from, day_to)]
+        return positions
+    
+    @staticmethod
+    def _overlaps(dates: Optional[List[str]], day_from: Optional[int], day_to: Optional[int]) -> bool:
+        if not dates:
+            # Layouts written before shards recorded their date span
+            return True
+        earliest, latest = epoch_day(dates[0]), epoch_day(dates[1])
+        return (day_from is None or latest >= day_from) and (day_to is None or earliest <= day_to)
+    
+    def close(self):
+        """Stop the shard worker processes"""
+        for worker in self._workers:
+            worker.shutdown(wait=False, cancel_futures=True)
+        self._workers = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,78 @@
+import os
+import json
+import zlib
+import random
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from src.utils.exceptions import IndexingError
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+SHARD_BY_OPTIONS = ("complaint_id", "market")
+LAYOUT_FILE_SUFFIX = "_shards.json"
+
+
+def shard_config(config, shard: int):
+    """Config whose VECTOR_STORE_PATH points at one shard; each shard is a complete saved index"""
+    return replace(config, VECTOR_STORE_PATH=f"{config.VECTOR_STORE_PATH}_shard_{shard:03d}")
+
+
+def layout_path(config) -> str:
+    return config.VECTOR_STORE_PATH + LAYOUT_FILE_SUFFIX
+
+
+def assign_shards(df, num_shards: int, shard_by: str, markets: List[str]) -> np.ndarray:
+    """Shard number of every complaint row.
+    
+    "complaint_id" spreads rows evenly by a stable hash of the id, so every
+    version of a complaint lands in the same shard. "market" keeps each
+    market whole (markets are dealt round-robin over the shards), which lets
+    a market filter skip the other shards entirely.
+    """
+    if shard_by not in SHARD_BY_OPTIONS:
+        raise IndexingError(f"Unknown SHARD_BY '{shard_by}', expected one of {SHARD_BY_OPTIONS}")
+    if shard_by == "market":
+        shard_of_market = market_shards(markets, num_shards)
+        return np.array([shard_of_market.get(str(m).lower(), 0) for m in df['market']], dtype=np.int32)
+    
+    id_column = 'Complaint ID' if 'Complaint ID' in df.columns else 'complaint_id'
+    ids = df[id_column].astype(str) if id_column in df.columns else df.index.astype(str)
+    return np.array([zlib.crc32(cid.encode("utf-8")) % num_shards for cid in ids], dtype=np.int32)
+
+
+def market_shards(markets: List[str], num_shards: int) -> Dict[str, int]:
+    """Lowercased market -> shard, dealing markets round-robin"""
+    return {market.lower(): i % num_shards for i, market in enumerate(markets)}
+
+
+def with_markets(df, markets: List[str]):
+    """Give rows without a market column a simulated one (as indexing would) before partitioning by it"""
+    if 'market' in df.columns:
+        return df
+    return df.assign(market=random.choices(markets, k=len(df)))
+
+
+def write_layout(config, shards: List[Dict[str, Any]], manifest: Dict[str, Any]):
+    """Record the shard set; written after every shard so it only ever lists complete shards.
+    
+    num_shards is the configured SHARD_COUNT the complaints were partitioned
+    over; shards left empty by that partition are not built, so `shards`
+    and `populated_shards` can list fewer.
+    """
+    layout = {**manifest, "num_shards": config.SHARD_COUNT, "shard_by": config.SHARD_BY,
+              "populated_shards": [shard["shard"] for shard in shards], "shards": shards}
+    with open(layout_path(config) + ".tmp", "w") as f:
+        json.dump(layout, f, indent=2)
+    os.replace(layout_path(config) + ".tmp", layout_path(config))
+    logger.info(f"Saved {config.SHARD_COUNT}-shard layout ({len(shards)} populated) to {layout_path(config)}")
+
+
+def read_layout(config) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(layout_path(config)):
+        return None
+    with open(layout_path(config)) as f:
+        return json.load(f)
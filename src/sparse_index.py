@@ -0,0 +1,252 @@
+import os
+import re
+import json
+import math
+import shutil
+from array import array
+from collections import Counter
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.utils.exceptions import IndexingError
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are as at be been but by for from had has have he her his i if in into is it its me my
+no not of on or our she so that the their them then there they this to was we were what when
+which who will with would you your
+""".split())
+META_FILE = "bm25.json"
+
+# Postings of one term are stored best-first; a query reads at most this
+# many per term and segment, which bounds lookup cost for very common terms.
+# Filtered queries keep this many allowed postings, so a narrow filter still
+# finds its matches further down a long list
+DEFAULT_MAX_POSTINGS = 4096
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric terms, stopwords dropped"""
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class _Segment:
+    """Postings for a contiguous range of rows, laid out CSR-style by term"""
+    
+    def __init__(self, first_row: int, terms: List[str], offsets: np.ndarray,
+                 doc_ids: np.ndarray, term_freqs: np.ndarray, doc_lengths: np.ndarray):
+        self.first_row = first_row
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+    
+    def doc_freq(self, term: str) -> int:
+        term_id = self.term_ids.get(term)
+        return 0 if term_id is None else int(self.offsets[term_id + 1] - self.offsets[term_id])
+    
+    def postings(self, term: str, limit: int,
+                 candidate_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(row ids, term frequencies, document lengths) of the best `limit` postings.
+        
+        With a candidate mask, the postings of rows it rejects are dropped
+        before truncating, so up to `limit` allowed rows come back.
+        """
+        term_id = self.term_ids.get(term)
+        if term_id is None:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty
+        start = int(self.offsets[term_id])
+        end = int(self.offsets[term_id + 1])
+        if candidate_mask is None:
+            end = min(end, start + limit)
+        doc_ids = np.asarray(self.doc_ids[start:end], dtype=np.int64)
+        term_freqs = self.term_freqs[start:end]
+        if candidate_mask is not None:
+            keep = np.flatnonzero(candidate_mask[doc_ids])[:limit]
+            doc_ids, term_freqs = doc_ids[keep], term_freqs[keep]
+        return doc_ids, term_freqs, self.doc_lengths[doc_ids - self.first_row]
+
+
+class BM25Index:
+    """Sparse keyword index over chunk text, scored with Okapi BM25.
+    
+    Rows are the same ids as the FAISS index and the metadata store. Postings
+    live in flat numpy arrays (term offsets, row ids, term frequencies) that
+    are memory-mapped on load. Incremental updates add a segment per delta;
+    document frequencies and average length are combined across segments at
+    query time, so scores stay exact BM25.
+    """
+    
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_postings: int = DEFAULT_MAX_POSTINGS):
+        self.k1 = k1
+        self.b = b
+        self.max_postings = max_postings
+        self.segments: List[_Segment] = []
+        self.num_docs = 0
+        self.total_length = 0
+    
+    def __len__(self) -> int:
+        return self.num_docs
+    
+    def add_texts(self, texts: Iterable[str]):
+        """Index the next rows (ids continue after the current last row)"""
+        builder = BM25Builder(self.num_docs, self.k1, self.b)
+        builder.add_many(texts)
+        self._append_segment(builder.build_segment())
+    
+    def search(self, query: str, k: int,
+               candidate_mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (scores, row ids) for the query terms, best first"""
+        terms = set(tokenize(query))
+        if not terms or self.num_docs == 0:
+            return np.zeros(0, dtype='float32'), np.zeros(0, dtype=np.int64)
+        
+        avg_length = self.total_length / self.num_docs
+        all_ids, all_scores = [], []
+        for term in terms:
+            doc_freq = sum(segment.doc_freq(term) for segment in self.segments)
+            if doc_freq == 0:
+                continue
+            idf = math.log(1.0 + (self.num_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+            for segment in self.segments:
+                doc_ids, term_freqs, doc_lengths = segment.postings(term, self.max_postings, candidate_mask)
+                if not len(doc_ids):
+                    continue
+                tf = term_freqs.astype('float32')
+                norm = self.k1 * (1.0 - self.b + self.b * doc_lengths / avg_length)
+                all_ids.append(doc_ids)
+                all_scores.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+        
+        if not all_ids:
+            return np.zeros(0, dtype='float32'), np.zeros(0, dtype=np.int64)
+        doc_ids = np.concatenate(all_ids)
+        scores = np.concatenate(all_scores)
+        if len(all_ids) > 1:
+            # Sum the per-term contributions of each row
+            doc_ids, inverse = np.unique(doc_ids, return_inverse=True)
+            scores = np.bincount(inverse, weights=scores)
+        
+        k = min(k, len(doc_ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return scores[top].astype('float32'), doc_ids[top]
+    
+    def save(self, path: str):
+        """Write every segment to a directory, replacing any previous version"""
+        tmp_path = path + ".tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+        
+        for i, segment in enumerate(self.segments):
+            prefix = os.path.join(tmp_path, f"segment_{i:04d}")
+            np.save(prefix + ".offsets.npy", np.asarray(segment.offsets))
+            np.save(prefix + ".doc_ids.npy", np.asarray(segment.doc_ids))
+            np.save(prefix + ".term_freqs.npy", np.asarray(segment.term_freqs))
+            np.save(prefix + ".doc_lengths.npy", np.asarray(segment.doc_lengths))
+            with open(prefix + ".terms.json", "w") as f:
+                json.dump(segment.terms, f)
+        
+        with open(os.path.join(tmp_path, META_FILE), "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "num_docs": self.num_docs,
+                       "segments": [s.first_row for s in self.segments]}, f)
+        
+        # Swap the finished directory into place
+        old_path = path + ".old"
+        if os.path.exists(path):
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+    
+    @classmethod
+    def load(cls, path: str, max_postings: int = DEFAULT_MAX_POSTINGS) -> "BM25Index":
+        """Open a saved index with all postings memory-mapped"""
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            raise IndexingError(f"BM25 index not found: {path}")
+        with open(meta_path) as f:
+            meta = json.load(f)
+        
+        index = cls(meta["k1"], meta["b"], max_postings)
+        for i, first_row in enumerate(meta["segments"]):
+            prefix = os.path.join(path, f"segment_{i:04d}")
+            with open(prefix + ".terms.json") as f:
+                terms = json.load(f)
+            index._append_segment(_Segment(
+                first_row, terms,
+                np.load(prefix + ".offsets.npy", mmap_mode="r"),
+                np.load(prefix + ".doc_ids.npy", mmap_mode="r"),
+                np.load(prefix + ".term_freqs.npy", mmap_mode="r"),
+                np.load(prefix + ".doc_lengths.npy", mmap_mode="r"),
+            ))
+        return index
+    
+    def _append_segment(self, segment: _Segment):
+        if segment.first_row != self.num_docs:
+            raise IndexingError(f"BM25 segment starts at row {segment.first_row}, expected {self.num_docs}")
+        self.segments.append(segment)
+        self.num_docs += len(segment.doc_lengths)
+        self.total_length += int(np.sum(segment.doc_lengths, dtype=np.int64))
+
+
+class BM25Builder:
+    """Accumulates term counts in typed arrays during a streaming index build"""
+    
+    def __init__(self, first_row: int = 0, k1: float = 1.2, b: float = 0.75,
+                 max_postings: int = DEFAULT_MAX_POSTINGS):
+        self.first_row = first_row
+        self.k1 = k1
+        self.b = b
+        self.max_postings = max_postings
+        self._term_ids: Dict[str, int] = {}
+        self._posting_terms = array("I")
+        self._posting_docs = array("q")
+        self._posting_freqs = array("H")
+        self._doc_lengths = array("i")
+    
+    def add_many(self, texts: Iterable[str]):
+        for text in texts:
+            tokens = tokenize(text)
+            row = self.first_row + len(self._doc_lengths)
+            for term, count in Counter(tokens).items():
+                self._posting_terms.append(self._term_ids.setdefault(term, len(self._term_ids)))
+                self._posting_docs.append(row)
+                self._posting_freqs.append(min(count, 65535))
+            self._doc_lengths.append(len(tokens))
+    
+    def build(self) -> BM25Index:
+        """Freeze the buffers into a single-segment BM25Index"""
+        if self.first_row:
+            raise IndexingError("BM25Builder.build() starts a new index; use BM25Index.add_texts to extend one")
+        index = BM25Index(self.k1, self.b, self.max_postings)
+        index._append_segment(self.build_segment())
+        return index
+    
+    def build_segment(self) -> _Segment:
+        """Sort postings by term, best-scoring documents first within each term"""
+        terms = np.frombuffer(self._posting_terms, dtype=np.uint32)
+        doc_ids = np.frombuffer(self._posting_docs, dtype=np.int64)
+        freqs = np.frombuffer(self._posting_freqs, dtype=np.uint16)
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.int32).copy()
+        
+        # Within a term, idf is constant, so the tf/length part alone orders documents by score
+        avg_length = max(1.0, float(doc_lengths.mean())) if len(doc_lengths) else 1.0
+        lengths = doc_lengths[doc_ids - self.first_row] if len(doc_ids) else doc_lengths[:0]
+        tf = freqs.astype('float32')
+        partial = tf / (tf + self.k1 * (1.0 - self.b + self.b * lengths / avg_length))
+        order = np.lexsort((-partial, terms))
+        
+        offsets = np.zeros(len(self._term_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self._term_ids)), out=offsets[1:])
+        return _Segment(
+            self.first_row, list(self._term_ids), offsets,
+            doc_ids[order].astype(np.int32 if self.first_row + len(doc_lengths) < 2 ** 31 else np.int64),
+            freqs[order].copy(), doc_lengths
+        )
@@ -0,0 +1,271 @@
+import os
+import re
+from collections import deque
+from datetime import timedelta
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.date_index import DATE_FILTERS, parse_date
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Complaint themes and the keywords that flag them; a theme's bit is its position here
+THEMES: Dict[str, List[str]] = {
+    'hidden_fees': ['fee', 'charge', 'annual fee', 'hidden fee'],
+    'interest_rates': ['interest', 'apr', 'rate increase'],
+    'fraud': ['fraud', 'unauthorized', 'stolen', 'identity theft'],
+    'poor_service': ['service', 'customer service', 'representative', 'wait'],
+    'credit_limit_issues': ['credit limit', 'limit decrease', 'credit line'],
+    'payment_issues': ['payment', 'late payment', 'due date'],
+    'dispute_resolution': ['dispute', 'chargeback', 'billing error'],
+    'application_issues': ['application', 'denied', 'approval', 'credit score'],
+}
+
+# Filters the cube can answer exactly (date ranges only in whole months); any other filter needs the chunk-level search
+CUBE_FILTERS = ("product", "market")
+UNKNOWN = "Unknown"
+
+
+def theme_cube_path(config) -> str:
+    return config.VECTOR_STORE_PATH + "_themes.npz"
+
+
+class ThemeMatcher:
+    """Aho-Corasick automaton over every theme keyword.
+    
+    One pass over a chunk's characters finds all keyword occurrences,
+    overlapping ones included, so the cost does not grow with the number of
+    themes or keywords. The result is a bitmask with bit i set for theme i.
+    """
+    
+    def __init__(self, themes: Dict[str, List[str]] = THEMES):
+        self.names = list(themes)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[int] = [0]
+        for bit, terms in enumerate(themes.values()):
+            for term in terms:
+                state = 0
+                for char in term.lower():
+                    if char not in self._goto[state]:
+                        self._goto.append({})
+                        self._output.append(0)
+                        self._goto[state][char] = len(self._goto) - 1
+                    state = self._goto[state][char]
+                self._output[state] |= 1 << bit
+        
+        # Failure links, breadth first; each state also reports the keywords that end in its suffixes
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] |= self._output[self._fail[child]]
+    
+    def match(self, text: str) -> int:
+        """Bitmask of the themes whose keywords occur in the text (case-insensitive)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        state, mask = 0, 0
+        for char in text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            mask |= output[state]
+        return mask
+    
+    def theme_names(self, mask: Optional[int]) -> List[str]:
+        return theme_names(mask, self.names)
+
+
+def theme_names(mask: Optional[int], names: Sequence[str] = tuple(THEMES)) -> List[str]:
+    """Decode a theme bitmask into theme names"""
+    if not mask:
+        return []
+    return [name for bit, name in enumerate(names) if mask >> bit & 1]
+
+
+def month_of(value: Any) -> str:
+    """YYYY-MM of an ISO (2023-05-14...) or US (05/14/2023) date, UNKNOWN otherwise"""
+    text = str(value) if value is not None else ""
+    iso = re.match(r'^(\d{4})-(\d{2})', text)
+    if iso:
+        return f"{iso.group(1)}-{iso.group(2)}"
+    us = re.match(r'^(\d{1,2})/\d{1,2}/(\d{4})', text)
+    if us:
+        return f"{us.group(2)}-{int(us.group(1)):02d}"
+    return UNKNOWN
+
+
+class ThemeCube:
+    """Complaint counts by product x market x month, in total and per theme.
+    
+    Counted per complaint (a complaint has a theme if any of its chunks
+    does) over all live indexed chunks, so "top issues" answers and
+    dashboard charts use exact counts instead of the handful of retrieved
+    chunks. Every query is a slice-and-sum over a few thousand cells.
+    """
+    
+    def __init__(self, products: Sequence[str], markets: Sequence[str], months: Sequence[str],
+                 themes: Sequence[str], totals: np.ndarray, theme_counts: np.ndarray):
+        self.products = [str(p) for p in products]
+        self.markets = [str(m) for m in markets]
+        self.months = [str(m) for m in months]
+        self.themes = [str(t) for t in themes]
+        # totals[product, market, month]; theme_counts[product, market, month, theme]
+        self.totals = np.asarray(totals, dtype=np.int64)
+        self.theme_counts = np.asarray(theme_counts, dtype=np.int64)
+    
+    @classmethod
+    def from_store(cls, store) -> Optional["ThemeCube"]:
+        """Aggregate a MetadataStore's live rows; None if it was built without theme tags"""
+        themes_column = store.categorical('themes')
+        if themes_column is None:
+            return None
+        live = store.live_mask()
+        rows = np.flatnonzero(live) if live is not None else np.arange(len(store))
+        
+        theme_codes, theme_values = themes_column
+        masks = np.array([int(v or 0) for v in theme_values], dtype=np.int64)[np.asarray(theme_codes)[rows]]
+        
+        # Collapse chunks to complaints: OR of the chunk themes, attributes of the first chunk
+        id_column = store.categorical('complaint_id')
+        if id_column is not None and len(rows):
+            complaint_codes = np.asarray(id_column[0])[rows]
+            order = np.argsort(complaint_codes, kind="stable")
+            sorted_codes = complaint_codes[order]
+            starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+            masks = np.bitwise_or.reduceat(masks[order], starts)
+            rows = rows[order[starts]]
+        
+        products, product_idx = cls._axis(store, 'product', rows, str)
+        markets, market_idx = cls._axis(store, 'market', rows, str)
+        months, month_idx = cls._axis(store, 'date', rows, month_of)
+        
+        shape = (len(products), len(markets), len(months))
+        flat = np.ravel_multi_index((product_idx, market_idx, month_idx), shape) if len(rows) else np.zeros(0, np.int64)
+        size = int(np.prod(shape))
+        totals = np.bincount(flat, minlength=size).reshape(shape)
+        theme_counts = np.stack([
+            np.bincount(flat[(masks >> bit) & 1 == 1], minlength=size).reshape(shape)
+            for bit in range(len(THEMES))
+        ], axis=-1)
+        return cls(products, markets, months, list(THEMES), totals, theme_counts)
+    
+    @staticmethod
+    def _axis(store, name: str, rows: np.ndarray, label):
+        """Sorted distinct labels of a column and the label position of every row"""
+        column = store.categorical(name)
+        if column is None:
+            return np.array([UNKNOWN]), np.zeros(len(rows), dtype=np.int64)
+        codes, categories = column
+        labels = [label(value) if value is not None else UNKNOWN for value in categories]
+        axis, inverse = np.unique(np.array(labels, dtype=str), return_inverse=True)
+        return axis, inverse[np.asarray(codes)[rows]]
+    
+    @classmethod
+    def merge(cls, cubes: List["ThemeCube"]) -> "ThemeCube":
+        """Sum cubes over disjoint sets of complaints (e.g. index shards)"""
+        products = sorted({p for cube in cubes for p in cube.products})
+        markets = sorted({m for cube in cubes for m in cube.markets})
+        months = sorted({m for cube in cubes for m in cube.months})
+        themes = cubes[0].themes
+        totals = np.zeros((len(products), len(markets), len(months)), dtype=np.int64)
+        theme_counts = np.zeros(totals.shape + (len(themes),), dtype=np.int64)
+        for cube in cubes:
+            at = np.ix_([products.index(p) for p in cube.products], [markets.index(m) for m in cube.markets],
+                        [months.index(m) for m in cube.months])
+            totals[at] += cube.totals
+            theme_counts[at] += cube.theme_counts
+        return cls(products, markets, months, themes, totals, theme_counts)
+    
+    def save(self, path: str):
+        """Write the cube aside, then swap it into place"""
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, products=np.array(self.products, dtype=str), markets=np.array(self.markets, dtype=str),
+                     months=np.array(self.months, dtype=str), themes=np.array(self.themes, dtype=str),
+                     totals=self.totals, theme_counts=self.theme_counts)
+        os.replace(path + ".tmp", path)
+    
+    @classmethod
+    def load(cls, path: str) -> Optional["ThemeCube"]:
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data["products"].tolist(), data["markets"].tolist(), data["months"].tolist(),
+                       data["themes"].tolist(), data["totals"], data["theme_counts"])
+    
+    def supports(self, filters: Optional[Dict[str, Any]]) -> bool:
+        """Whether the cube can count complaints under these filters"""
+        filters = filters or {}
+        if not all(key in CUBE_FILTERS or key in DATE_FILTERS for key in filters):
+            return False
+        # Months are the finest grain, so a date range must start and end on month boundaries
+        date_from, date_to = parse_date(filters.get('date_from')), parse_date(filters.get('date_to'))
+        if filters.get('date_from') is not None and (date_from is None or date_from.day != 1):
+            return False
+        if filters.get('date_to') is not None and (date_to is None or (date_to + timedelta(days=1)).day != 1):
+            return False
+        return True
+    
+    def _slice(self, filters: Optional[Dict[str, Any]]):
+        filters = filters or {}
+        return np.ix_(self._positions(self.products, filters.get('product')),
+                      self._positions(self.markets, filters.get('market')),
+                      self._month_positions(filters))
+    
+    def _month_positions(self, filters: Dict[str, Any]) -> np.ndarray:
+        date_from, date_to = filters.get('date_from'), filters.get('date_to')
+        if date_from is None and date_to is None:
+            return np.arange(len(self.months))
+        first = month_of(date_from) if date_from is not None else None
+        last = month_of(date_to) if date_to is not None else None
+        return np.array([i for i, month in enumerate(self.months)
+                         if month != UNKNOWN and (first is None or month >= first) and (last is None or month <= last)],
+                        dtype=np.int64)
+    
+    @staticmethod
+    def _positions(labels: List[str], value: Any) -> np.ndarray:
+        if value is None:
+            return np.arange(len(labels))
+        return np.array([i for i, label in enumerate(labels) if label.lower() == str(value).lower()], dtype=np.int64)
+    
+    def total(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        """Complaints matching the product / market filters"""
+        return int(self.totals[self._slice(filters)].sum())
+    
+    def theme_totals(self, filters: Optional[Dict[str, Any]] = None) -> Dict[str, int]:
+        """Complaints per theme, most frequent first (a complaint can count towards several themes)"""
+        counts = self.theme_counts[self._slice(filters)].sum(axis=(0, 1, 2))
+        return dict(sorted(zip(self.themes, counts.tolist()), key=lambda item: item[1], reverse=True))
+    
+    def monthly(self, filters: Optional[Dict[str, Any]] = None, theme: Optional[str] = None) -> Dict[str, int]:
+        """Complaints per month, for one theme or in total"""
+        if theme is None:
+            counts = self.totals[self._slice(filters)].sum(axis=(0, 1))
+        else:
+            counts = self.theme_counts[self._slice(filters)][..., self.themes.index(theme)].sum(axis=(0, 1))
+        months = [self.months[i] for i in self._month_positions(filters or {})]
+        return dict(zip(months, counts.tolist()))
+    
+    def describe(self, filters: Optional[Dict[str, Any]] = None, top_n: int = 5, recent_months: int = 6) -> str:
+        """Plain-text summary of the exact counts, for the LLM prompt"""
+        total = self.total(filters)
+        scope = ", ".join(f"{key}={value}" for key, value in (filters or {}).items()) or "all products and markets"
+        if total == 0:
+            return f"No indexed complaints for {scope}."
+        
+        lines = [f"Indexed complaints for {scope}: {total}"]
+        for theme, count in list(self.theme_totals(filters).items())[:top_n]:
+            if count:
+                lines.append(f"- {theme.replace('_', ' ')}: {count} complaints ({count / total:.0%})")
+        months = [(month, count) for month, count in self.monthly(filters).items() if month != UNKNOWN]
+        if months:
+            lines.append("Complaints per month (most recent): " +
+                         ", ".join(f"{month}: {count}" for month, count in months[-recent_months:]))
+        return "\n".join(lines)
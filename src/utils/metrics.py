@@ -0,0 +1,260 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Seconds; wide enough for a sub-millisecond FAISS search and a multi-second Gemini call
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labelnames: Sequence[str], labels: Dict[str, str]) -> LabelKey:
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {tuple(labelnames)}, got {tuple(labels)}")
+    return tuple((name, str(labels[name])) for name in labelnames)
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = [(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in pairs]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class _Metric:
+    """Named metric with an optional fixed set of label names; one value (or histogram) per label set"""
+    kind = ""
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelKey, object] = {}
+    
+    def _expose(self) -> List[str]:
+        raise NotImplementedError
+    
+    def expose(self) -> List[str]:
+        """Prometheus text exposition lines"""
+        with self._lock:
+            samples = self._expose()
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + samples
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests or errors"""
+    kind = "counter"
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def values(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+    
+    def _expose(self) -> List[str]:
+        return [f"{self.name}_total{_format_labels(key)} {value:g}" for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, e.g. requests in flight or index size"""
+    kind = "gauge"
+    
+    def set(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = float(value)
+    
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+    
+    def values(self) -> Dict[LabelKey, float]:
+        with self._lock:
+            return dict(self._values)
+    
+    def _expose(self) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {value:g}" for key, value in sorted(self._values.items())]
+
+
+class _HistogramValue:
+    __slots__ = ("counts", "sum", "count")
+    
+    def __init__(self, num_buckets: int):
+        # One slot per bucket upper bound plus the +Inf overflow
+        self.counts = [0] * (num_buckets + 1)
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations; quantiles are estimated from the buckets"""
+    kind = "histogram"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value: float, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            hist = self._values.get(key)
+            if hist is None:
+                hist = self._values[key] = _HistogramValue(len(self.buckets))
+            hist.counts[bisect.bisect_left(self.buckets, value)] += 1
+            hist.sum += value
+            hist.count += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the block, also when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def summary(self) -> Dict[LabelKey, Dict[str, float]]:
+        """Count, mean and estimated p50/p95/p99 per label set"""
+        with self._lock:
+            snapshot = {key: (list(hist.counts), hist.sum, hist.count) for key, hist in self._values.items()}
+        return {
+            key: {
+                "count": count,
+                "mean": total / count if count else 0.0,
+                "p50": self._quantile(counts, count, 0.50),
+                "p95": self._quantile(counts, count, 0.95),
+                "p99": self._quantile(counts, count, 0.99),
+            }
+            for key, (counts, total, count) in snapshot.items()
+        }
+    
+    def _quantile(self, counts: List[int], count: int, q: float) -> float:
+        """Linear interpolation inside the bucket holding the q-th observation (as histogram_quantile does)"""
+        if count == 0:
+            return 0.0
+        rank = q * count
+        cumulative = 0
+        for i, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    # Overflow bucket: the largest finite bound is the best estimate available
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+    
+    def _expose(self) -> List[str]:
+        lines = []
+        for key, hist in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), hist.counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {hist.sum:.6g}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {hist.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics, rendered for Prometheus or summarized for the diagnostics panel"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+    
+    def _register(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs):
+        """Create the metric, or return the one already registered under that name"""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+    
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+    
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in sorted(self.metrics(), key=lambda m: m.name):
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+# Shared by every instrumented module in the process
+REGISTRY = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency of each request stage; the stage label shows which one drives p95
+STAGE_SECONDS = REGISTRY.histogram(
+    "creditrust_stage_seconds", "Latency of one RAG request stage", ["stage"]
+)
+ERRORS = REGISTRY.counter(
+    "creditrust_errors", "Failures by component", ["component"]
+)
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY):
+    """Serve GET /metrics from a daemon thread; returns the server, or None if the port is taken.
+    
+    Listens on localhost only unless `host` (Config.METRICS_HOST) names a wider interface.
+    """
+    
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the log
+            pass
+    
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        logger.warning(f"Metrics endpoint not started on port {port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info(f"Prometheus metrics at http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,28 @@
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class PhaseTimer:
+    """Wall-clock time of named phases, e.g. the steps of application startup"""
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+    
+    @contextmanager
+    def phase(self, name: str):
+        phase_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - phase_start
+    
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.start
+    
+    def report(self) -> str:
+        """One line, e.g. "imports 0.41s, index 0.12s (total 0.55s)" """
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases.items())
+        return f"{phases} (total {self.total:.2f}s)"
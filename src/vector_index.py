@@ -0,0 +1,132 @@
+import faiss
+import numpy as np
+from typing import Optional
+
+from src.utils.exceptions import IndexingError
+from src.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+# How flat, ivf_flat and hnsw indexes store vectors: 4, 2 or 1 byte(s) per dimension
+INDEX_STORAGE = ("float32", "fp16", "sq8")
+SQ_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "sq8": faiss.ScalarQuantizer.QT_8bit}
+
+# FAISS wants at least this many training points per IVF centroid / PQ code
+MIN_POINTS_PER_CENTROID = 39
+
+
+def create_index(dim: int, config, num_vectors: int) -> faiss.Index:
+    """Create an empty FAISS index of the type selected by Config.INDEX_TYPE"""
+    index_type = config.INDEX_TYPE.lower()
+    if index_type not in INDEX_TYPES:
+        raise IndexingError(f"Unknown INDEX_TYPE '{config.INDEX_TYPE}', expected one of {INDEX_TYPES}")
+    storage = config.INDEX_STORAGE.lower()
+    if storage not in INDEX_STORAGE:
+        raise IndexingError(f"Unknown INDEX_STORAGE '{config.INDEX_STORAGE}', expected one of {INDEX_STORAGE}")
+    qtype = SQ_TYPES.get(storage)
+    
+    if index_type == "flat":
+        if qtype is not None:
+            return faiss.IndexScalarQuantizer(dim, qtype, faiss.METRIC_L2)
+        return faiss.IndexFlatL2(dim)
+    
+    if index_type == "hnsw":
+        if qtype is not None:
+            index = faiss.IndexHNSWSQ(dim, qtype, config.HNSW_M)
+        else:
+            index = faiss.IndexHNSWFlat(dim, config.HNSW_M)
+        index.hnsw.efConstruction = config.HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = config.HNSW_EF_SEARCH
+        return index
+    
+    # IVF variants: shrink nlist on small corpora so every centroid gets enough training points
+    nlist = max(1, min(config.IVF_NLIST, num_vectors // MIN_POINTS_PER_CENTROID))
+    if nlist < config.IVF_NLIST:
+        logger.warning(f"Reducing IVF nlist from {config.IVF_NLIST} to {nlist} for {num_vectors} vectors")
+    quantizer = faiss.IndexFlatL2(dim)
+    
+    if index_type == "ivf_flat":
+        if qtype is not None:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype, faiss.METRIC_L2)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist)
+    else:
+        if qtype is not None:
+            logger.warning(f"INDEX_STORAGE={storage} has no effect on ivf_pq, whose PQ codes are already compressed")
+        pq_m = _largest_divisor(dim, config.PQ_M)
+        if num_vectors < 2 ** config.PQ_NBITS:
+            logger.warning(f"Only {num_vectors} vectors, too few to train PQ; falling back to flat index")
+            return faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, config.PQ_NBITS)
+    
+    index.nprobe = min(config.IVF_NPROBE, nlist)
+    return index
+
+
+def train_index(index: faiss.Index, embeddings: np.ndarray, config) -> None:
+    """Train the index on a random sample of the embeddings if it needs training"""
+    if index.is_trained:
+        return
+    
+    sample_size = min(len(embeddings), config.INDEX_TRAIN_SAMPLE)
+    if sample_size < len(embeddings):
+        rng = np.random.default_rng(42)
+        sample = embeddings[rng.choice(len(embeddings), sample_size, replace=False)]
+    else:
+        sample = embeddings
+    
+    logger.info(f"Training {config.INDEX_TYPE} index on {sample_size} vectors...")
+    index.train(np.ascontiguousarray(sample, dtype='float32'))
+
+
+def buffer_dtype(config) -> str:
+    """dtype for embeddings held before they reach the index.
+    
+    float16 when the index stores vectors at reduced precision anyway, which
+    halves the training buffer and per-batch arrays of a build; the index
+    still receives float32.
+    """
+    return 'float32' if config.INDEX_STORAGE.lower() == "float32" else 'float16'
+
+
+def configure_search(index: faiss.Index, config) -> None:
+    """Apply runtime search knobs (nprobe / efSearch) from Config to a loaded index"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(config.IVF_NPROBE, ivf.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config.HNSW_EF_SEARCH
+
+
+def search_params(index: faiss.Index, selector: Optional[faiss.IDSelector] = None,
+                  exhaustive: bool = False, k: int = 0) -> faiss.SearchParameters:
+    """Build search parameters of the right type for the index.
+    
+    `exhaustive` widens the search (all IVF lists, larger efSearch) for the
+    retry when a selective filter left the approximate search short of k hits.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        nprobe = ivf.nlist if exhaustive else ivf.nprobe
+        return faiss.SearchParametersIVF(sel=selector, nprobe=nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        ef_search = index.hnsw.efSearch
+        if exhaustive:
+            ef_search = max(ef_search * 8, k * 4)
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=ef_search)
+    return faiss.SearchParameters(sel=selector)
+
+
+def is_approximate(index: faiss.Index) -> bool:
+    """True if the index can miss true neighbours (anything but a full-precision flat scan)"""
+    return not isinstance(index, faiss.IndexFlat)
+
+
+def _largest_divisor(dim: int, upper: int) -> int:
+    """Largest PQ sub-quantizer count <= upper that divides the dimension"""
+    for m in range(min(upper, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
@@ -0,0 +1,24 @@
+from dataclasses import replace
+
+import pytest
+
+from benchmarks.corpus import HashEmbeddingModel, make_corpus
+from src.config import Config
+
+
+@pytest.fixture
+def config(tmp_path):
+    """Default Config with every index and cache file under the test's tmp dir"""
+    return replace(Config(), VECTOR_STORE_PATH=str(tmp_path / "index" / "complaints"),
+                   EMBEDDING_CACHE_PATH="", DATA_PATH=str(tmp_path / "complaints.csv"),
+                   BUILD_BATCH_ROWS=64, INDEX_AUTO_REBUILD=True)
+
+
+@pytest.fixture
+def model():
+    return HashEmbeddingModel(dim=32)
+
+
+@pytest.fixture
+def corpus():
+    return make_corpus(120)
@@ -0,0 +1,61 @@
+from dataclasses import replace
+
+import pytest
+
+from src.indexer import ComplaintIndexer
+from src.retriever import ComplaintRetriever
+
+
+@pytest.fixture
+def dedup_config(config):
+    return replace(config, DEDUP_ENABLED=True, RETRIEVAL_MODE="hybrid")
+
+
+@pytest.fixture
+def duplicated_corpus(corpus):
+    """Complaints 1-3 share one narrative, product, market and date; 1 is indexed, 2 and 3 are its near-duplicates"""
+    for column in ("Product", "market", "Date received", "cleaned_narrative"):
+        corpus.loc[1:2, column] = corpus.loc[0, column]
+    return corpus
+
+
+def retrieved_ids(indexer, model, query, k=5):
+    retriever = ComplaintRetriever(model, indexer.index, indexer.metadatas, sparse_index=indexer.sparse_index)
+    return [chunk["metadata"]["complaint_id"] for chunk in retriever.retrieve_chunks(query, k)]
+
+
+def test_near_duplicates_are_counted_on_the_kept_chunk(dedup_config, model, duplicated_corpus):
+    indexer = ComplaintIndexer(dedup_config, model=model)
+    indexer.build_index(duplicated_corpus)
+
+    assert indexer.index.ntotal == len(duplicated_corpus) - 2
+    assert sorted(str(row["complaint_id"]) for row in indexer.duplicates) == ["2", "3"]
+    [kept] = indexer._live_rows_for([1])
+    assert indexer.metadatas.row(int(kept))["duplicates"] == 2
+
+
+def test_removing_a_kept_chunk_promotes_a_near_duplicate(dedup_config, model, duplicated_corpus):
+    indexer = ComplaintIndexer(dedup_config, model=model)
+    indexer.build_index(duplicated_corpus)
+    indexer.save()
+    narrative = duplicated_corpus.loc[0, "cleaned_narrative"]
+
+    indexer.remove_complaints([1])
+    # Promoted into both the vector and the BM25 index, still standing for the remaining near-duplicate
+    assert indexer.index.ntotal == len(indexer.sparse_index) == len(duplicated_corpus) - 1
+    [promoted] = indexer._live_rows_for([2])
+    assert indexer.metadatas.row(int(promoted))["duplicates"] == 1
+    assert retrieved_ids(indexer, model, narrative)[0] == 2
+
+    # The promotion is part of the persisted delta
+    reloaded = ComplaintIndexer(dedup_config, model=model)
+    reloaded.load()
+    assert retrieved_ids(reloaded, model, narrative)[0] == 2
+
+    # Removing the promoted chunk promotes the last near-duplicate, which stands for no others
+    reloaded.remove_complaints([2])
+    [last] = reloaded._live_rows_for([3])
+    assert reloaded.metadatas.row(int(last))["duplicates"] == 0
+    assert retrieved_ids(reloaded, model, narrative)[0] == 3
+    # Every complaint not removed is counted once
+    assert sum(reloaded._counted_store().value_counts("product").values()) == len(duplicated_corpus) - 2
@@ -0,0 +1,52 @@
+import numpy as np
+
+from src.embedding_cache import EmbeddingCache, text_key
+
+DIM = 8
+
+
+def vector(i):
+    return np.full(DIM, i, dtype='float32')
+
+
+def open_cache(tmp_path, entries=10):
+    return EmbeddingCache(str(tmp_path), "test-model", DIM, dtype="float32", max_bytes=entries * DIM * 4)
+
+
+def test_full_cache_evicts_least_recently_used(tmp_path):
+    cache = open_cache(tmp_path)
+    keys = [text_key(f"chunk {i}") for i in range(10)]
+    cache.put_many(keys, np.stack([vector(i) for i in range(10)]))
+    # Touch all but chunk 0, which is then the least recently used
+    cache.get_many(keys[1:])
+    
+    cache.put_many([text_key("chunk 10")], vector(10)[None, :])
+    _, missing = cache.get_many(keys)
+    assert missing == [0]
+    assert len(cache) == 10
+
+
+def test_evicted_keys_never_map_to_reused_slots_after_reload(tmp_path):
+    cache = open_cache(tmp_path)
+    keys = [text_key(f"chunk {i}") for i in range(12)]
+    cache.put_many(keys[:10], np.stack([vector(i) for i in range(10)]))
+    cache.flush()
+    # Evicts chunk 0 and reuses its slot; the process then dies without flushing
+    cache.put_many(keys[10:11], vector(10)[None, :])
+    
+    reloaded = open_cache(tmp_path)
+    vectors, missing = reloaded.get_many(keys[:11])
+    for pos in set(range(11)) - set(missing):
+        assert np.array_equal(vectors[pos], vector(pos))
+    assert 0 in missing
+
+
+def test_cache_persists_across_instances(tmp_path):
+    cache = open_cache(tmp_path, entries=100)
+    keys = [text_key(f"chunk {i}") for i in range(5)]
+    cache.put_many(keys, np.stack([vector(i) for i in range(5)]))
+    cache.flush()
+    
+    vectors, missing = open_cache(tmp_path, entries=100).get_many(keys)
+    assert missing == []
+    assert np.array_equal(vectors, np.stack([vector(i) for i in range(5)]))
@@ -0,0 +1,66 @@
+from dataclasses import replace
+
+import pytest
+
+from src.index_manifest import INDEX_CURRENT, INDEX_DATA_CHANGED, INDEX_INCOMPATIBLE, check_manifest, read_manifest
+from src.indexer import ComplaintIndexer
+from src.utils.exceptions import IndexingError
+
+
+def stored_ids(indexer):
+    return set(indexer._stored_narrative_hashes())
+
+
+def test_changed_data_file_removes_complaints_no_longer_in_it(config, model, corpus):
+    corpus.iloc[:100].to_csv(config.DATA_PATH, index=False)
+    assert ComplaintIndexer(config, model=model).load_or_build() != INDEX_CURRENT
+    
+    # Drop 20 complaints, add 20 new ones
+    corpus.iloc[20:].to_csv(config.DATA_PATH, index=False)
+    assert check_manifest(config, read_manifest(config))[0] == INDEX_DATA_CHANGED
+    indexer = ComplaintIndexer(config, model=model)
+    assert indexer.load_or_build() == INDEX_DATA_CHANGED
+    
+    assert stored_ids(indexer) == {str(cid) for cid in corpus["Complaint ID"].iloc[20:]}
+    manifest = read_manifest(config)
+    assert manifest["chunks"] == indexer.live_chunks() < indexer.index.ntotal
+    assert check_manifest(config, manifest)[0] == INDEX_CURRENT
+
+
+def test_other_data_path_needs_a_rebuild(config, model, corpus, tmp_path):
+    corpus.to_csv(config.DATA_PATH, index=False)
+    ComplaintIndexer(config, model=model).load_or_build()
+    
+    other = replace(config, DATA_PATH=str(tmp_path / "other.csv"), INDEX_AUTO_REBUILD=False)
+    corpus.iloc[:50].to_csv(other.DATA_PATH, index=False)
+    assert check_manifest(other, read_manifest(other))[0] == INDEX_INCOMPATIBLE
+    with pytest.raises(IndexingError):
+        ComplaintIndexer(other, model=model).load_or_build()
+
+
+def test_command_line_updates_keep_the_manifest_current(config, model, corpus, tmp_path):
+    corpus.iloc[:100].to_csv(config.DATA_PATH, index=False)
+    ComplaintIndexer(config, model=model).load_or_build()
+    indexer = ComplaintIndexer(config, model=model)
+    indexer.load()
+    
+    indexer.remove_and_record([1, 2])
+    assert read_manifest(config)["chunks"] == indexer.live_chunks()
+    
+    drop = str(tmp_path / "drop.csv")
+    corpus.iloc[100:].to_csv(drop, index=False)
+    assert indexer.ingest(drop)["new"] == 20
+    assert read_manifest(config)["chunks"] == indexer.live_chunks()
+    assert check_manifest(config, read_manifest(config))[0] == INDEX_CURRENT
+    
+    # Ingesting the data file itself records its fingerprint, as a restart would
+    corpus.iloc[50:].to_csv(config.DATA_PATH, index=False)
+    indexer.ingest(config.DATA_PATH)
+    assert stored_ids(indexer) == {str(cid) for cid in corpus["Complaint ID"].iloc[50:]}
+    assert check_manifest(config, read_manifest(config))[0] == INDEX_CURRENT
+
+
+def test_command_line_updates_refuse_sharded_indexes(config, capsys):
+    from main import update_index
+    update_index(replace(config, SHARD_COUNT=2), remove_ids=["1"])
+    assert "sharded index" in capsys.readouterr().out
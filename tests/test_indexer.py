@@ -0,0 +1,68 @@
+import numpy as np
+
+from src.indexer import ComplaintIndexer
+from src.retriever import ComplaintRetriever
+
+
+def live_ids(indexer):
+    return set(indexer._stored_narrative_hashes())
+
+
+def retrieved_ids(indexer, model, query, k=10, filters=None):
+    retriever = ComplaintRetriever(model, indexer.index, indexer.metadatas, sparse_index=indexer.sparse_index)
+    return [str(chunk["metadata"]["complaint_id"]) for chunk in retriever.retrieve_chunks(query, k, filters)]
+
+
+def saved_index(config, model, corpus):
+    indexer = ComplaintIndexer(config, model=model)
+    indexer.build_index(corpus)
+    indexer.save()
+    return indexer
+
+
+def test_add_complaints_embeds_only_new_and_changed(config, model, corpus):
+    indexer = saved_index(config, model, corpus.iloc[:100])
+    update = corpus.iloc[90:].copy()
+    update.loc[90, "cleaned_narrative"] = "completely new narrative about a frozen savings account"
+    
+    stats = indexer.add_complaints(update)
+    assert (stats["new"], stats["changed"], stats["unchanged"]) == (20, 1, 9)
+    assert stats["chunks_removed"] == 1 and stats["chunks_added"] == 21
+    assert live_ids(indexer) == {str(cid) for cid in corpus["Complaint ID"]}
+    assert indexer.live_chunks() == len(corpus)
+    
+    # The superseded chunk is tombstoned: only the new text of complaint 91 can be retrieved
+    assert retrieved_ids(indexer, model, "frozen savings account", k=1) == ["91"]
+    old_text = corpus.loc[90, "cleaned_narrative"]
+    retriever = ComplaintRetriever(model, indexer.index, indexer.metadatas)
+    assert old_text not in [chunk["text"] for chunk in retriever.retrieve_chunks(old_text, len(corpus))]
+
+
+def test_deltas_replay_on_load_and_fold_into_a_full_save(config, model, corpus):
+    indexer = saved_index(config, model, corpus.iloc[:100])
+    indexer.add_complaints(corpus.iloc[100:])
+    indexer.remove_complaints([1, 2, 3])
+    assert len(indexer._delta_dirs()) == 2
+    
+    reloaded = ComplaintIndexer(config, model=model)
+    reloaded.load()
+    assert reloaded.index.ntotal == indexer.index.ntotal
+    assert np.array_equal(reloaded.metadatas.deleted, indexer.metadatas.deleted)
+    assert live_ids(reloaded) == {str(cid) for cid in corpus["Complaint ID"].iloc[3:]}
+    assert not {"1", "2", "3"} & set(retrieved_ids(reloaded, model, corpus.loc[0, "cleaned_narrative"], k=len(corpus)))
+    
+    reloaded.save()
+    assert reloaded._delta_dirs() == []
+    again = ComplaintIndexer(config, model=model)
+    again.load()
+    assert live_ids(again) == live_ids(reloaded)
+
+
+def test_filters_never_return_tombstoned_chunks(config, model, corpus):
+    indexer = saved_index(config, model, corpus)
+    market = corpus.loc[0, "market"]
+    in_market = [str(cid) for cid in corpus.loc[corpus["market"] == market, "Complaint ID"]]
+    indexer.remove_complaints(in_market[:3])
+    
+    found = retrieved_ids(indexer, model, "payment", k=len(corpus), filters={"market": market})
+    assert set(found) == set(in_market[3:])
@@ -0,0 +1,47 @@
+from datetime import date
+
+from src.query_validator import QueryValidator
+
+TODAY = date(2024, 6, 1)
+
+
+def test_word_starting_with_month_abbreviation_is_not_a_month():
+    validator = QueryValidator(None)
+    filters = validator.extract_filters("Top issues in the Rwanda market 2024", TODAY)
+    assert filters == {"market": "Rwanda"}
+
+
+def test_verb_starting_with_month_abbreviation_is_not_a_month():
+    validator = QueryValidator(None)
+    assert validator.extract_date_range("Why have loan approvals declined 2023", TODAY) == {}
+
+
+def test_bare_number_without_date_context_is_not_a_year():
+    validator = QueryValidator(None)
+    assert validator.extract_date_range("Top 2000 complaints", TODAY) == {}
+
+
+def test_named_months_and_years_in_context_still_parse():
+    validator = QueryValidator(None)
+    assert validator.extract_date_range("Issues in Sept. 2023", TODAY) == {
+        "date_from": "2023-09-01", "date_to": "2023-09-30"}
+    assert validator.extract_date_range("Complaints during 2022 and 2023", TODAY) == {
+        "date_from": "2022-01-01", "date_to": "2023-12-31"}
+    assert validator.extract_date_range("Fraud reports since 2022", TODAY) == {"date_from": "2022-01-01"}
+
+
+def test_compared_periods_are_segments_not_a_filter():
+    validator = QueryValidator(None)
+    question = "Fraud complaints in 2019 vs 2020"
+    assert validator.extract_date_range(question, TODAY) == {}
+    assert validator.extract_segments(question) == [
+        {"date_from": "2019-01-01", "date_to": "2019-12-31"},
+        {"date_from": "2020-01-01", "date_to": "2020-12-31"},
+    ]
+
+
+def test_compared_periods_combine_with_compared_markets():
+    validator = QueryValidator(None)
+    segments = validator.extract_segments("Kenya and Uganda fees in May 2023 compared to June 2023")
+    assert len(segments) == 4
+    assert {"market": "Uganda", "date_from": "2023-06-01", "date_to": "2023-06-30"} in segments
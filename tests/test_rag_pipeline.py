@@ -0,0 +1,114 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.generator import BusinessAnswerGenerator
+from src.rag_pipeline import RAGPipeline
+
+QUESTION_OK = "What are the most common complaints about hidden fees?"
+QUESTION_CUT = "What are the most common complaints about late payments?"
+
+
+class FakeRetriever:
+    def embed_query(self, question):
+        return np.ones(4, dtype='float32')
+    
+    def retrieve_chunks(self, question, k, filters=None, query_vector=None):
+        return [{"text": f"excerpt about {question}", "metadata": {"product": "Credit Cards"}, "score": 1.0}]
+
+
+class FakeClient:
+    """Streams two pieces; prompts about late payments fail after the first one"""
+    
+    def __init__(self):
+        self.models = SimpleNamespace(generate_content_stream=self._stream)
+    
+    def _stream(self, model, contents):
+        yield SimpleNamespace(text="Summary of the issue. ")
+        if "late payments" in contents:
+            raise ConnectionError("stream dropped")
+        yield SimpleNamespace(text="Recommended action.")
+
+
+def make_pipeline(config):
+    generator = BusinessAnswerGenerator(config)
+    generator._client = FakeClient()
+    return RAGPipeline(FakeRetriever(), generator, config)
+
+
+def test_overlapping_streams_cache_only_the_complete_answer(config):
+    pipeline = make_pipeline(config)
+    cut_metrics, ok_metrics = {}, {}
+    cut_stream, _ = pipeline.run_stream(QUESTION_CUT, 5, None, cut_metrics)
+    first_piece = next(cut_stream)
+    
+    # A second session's stream runs to completion while the first is still open
+    ok_stream, _ = pipeline.run_stream(QUESTION_OK, 5, None, ok_metrics)
+    assert "".join(ok_stream) == "Summary of the issue. Recommended action."
+    assert first_piece + "".join(cut_stream) == "Summary of the issue."
+    
+    assert pipeline.cache.get_exact(QUESTION_OK, {}, 5) is not None
+    assert pipeline.cache.get_exact(QUESTION_CUT, {}, 5) is None
+    assert ok_metrics["generation_time"] is not None and cut_metrics["generation_time"] is not None
+
+
+def test_stream_returns_its_own_result(config):
+    generator = BusinessAnswerGenerator(config)
+    generator._client = FakeClient()
+    stream = generator.generate_answer_stream("prompt about late payments")
+    pieces = []
+    try:
+        while True:
+            pieces.append(next(stream))
+    except StopIteration as stop:
+        result = stop.value
+    assert not result.complete
+    assert result.text == "".join(pieces) == "Summary of the issue."
+
+
+def test_cached_answers_are_dropped_when_the_index_changes(config):
+    pipeline = make_pipeline(config)
+    pipeline.retriever.index = SimpleNamespace(ntotal=100)
+    pipeline.retriever.metadata = [{}] * 100
+    pipeline.invalidate_cache()
+    
+    "".join(pipeline.run_stream(QUESTION_OK, 5)[0])
+    assert pipeline._cached_exact(QUESTION_OK, {}, 5) is not None
+    # Case, spacing and trailing punctuation map to the same entry
+    assert pipeline._cached_exact("  what are the most common complaints about HIDDEN fees ", {}, 5) is not None
+    
+    # An incremental update grows the index: the cached answer predates it
+    pipeline.retriever.index.ntotal = 120
+    pipeline.retriever.metadata = [{}] * 120
+    assert pipeline._cached_exact(QUESTION_OK, {}, 5) is None
+    assert pipeline.cache.stats()["entries"] == 0
+    
+    # Reloading the index swaps the FAISS object even at the same size
+    "".join(pipeline.run_stream(QUESTION_OK, 5)[0])
+    pipeline.retriever.index = SimpleNamespace(ntotal=120)
+    assert pipeline._cached_exact(QUESTION_OK, {}, 5) is None
+
+
+class SegmentRetriever(FakeRetriever):
+    """Returns k chunks for every search, labelled with the market it was filtered to"""
+    
+    def embed_queries(self, questions):
+        return np.ones((len(questions), 4), dtype='float32')
+    
+    def retrieve_many(self, questions, k, filters, query_vectors=None):
+        return [[{"text": f"excerpt {i}", "metadata": {"market": f.get("market")}, "score": 1.0} for i in range(k)]
+                for f in filters]
+
+
+def test_comparisons_split_k_between_segments(config):
+    pipeline = make_pipeline(config)
+    pipeline.retriever = SegmentRetriever()
+    question = "Compare complaints about fees in Kenya, Uganda and Tanzania"
+    
+    _, chunks = pipeline.run_stream(question, 5)
+    assert [chunk["segment"] for chunk in chunks] == ["Kenya", "Kenya", "Uganda", "Uganda", "Tanzania"]
+    
+    pipeline.invalidate_cache()
+    [(_, chunks)] = asyncio.run(pipeline.arun_many([question], 4))
+    assert [chunk["segment"] for chunk in chunks] == ["Kenya", "Kenya", "Uganda", "Tanzania"]
@@ -0,0 +1,60 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from src.retrieval_service import MicroBatcher, _Request
+
+
+class FlakyRetriever:
+    """Fails any batch containing the question "boom"; records every batch it is asked for"""
+    
+    def __init__(self):
+        self.batches = []
+    
+    def embed_queries(self, queries):
+        return np.ones((len(queries), 4), dtype='float32')
+    
+    def retrieve_many(self, queries, k, filters, query_vectors):
+        self.batches.append(list(queries))
+        if "boom" in queries:
+            raise RuntimeError("search failed")
+        return [[{"text": query, "rank": i} for i in range(k)] for query in queries]
+
+
+async def submit_all(batcher, requests):
+    worker = asyncio.create_task(batcher.run())
+    try:
+        return await asyncio.gather(*(batcher.submit(request) for request in requests), return_exceptions=True)
+    finally:
+        worker.cancel()
+
+
+def test_a_failing_request_does_not_fail_its_batch():
+    retriever = FlakyRetriever()
+    batcher = MicroBatcher(retriever, max_batch_size=8, max_wait_ms=50)
+    requests = [_Request("fees", k=2), _Request("boom", k=2), _Request("fraud", k=3)]
+    
+    fees, boom, fraud = asyncio.run(submit_all(batcher, requests))
+    assert [chunk["text"] for chunk in fees] == ["fees", "fees"]
+    assert len(fraud) == 3
+    assert isinstance(boom, RuntimeError)
+    # One failed batch, then each request on its own
+    assert retriever.batches[0] == ["fees", "boom", "fraud"]
+    assert sorted(map(tuple, retriever.batches[1:])) == [("boom",), ("fees",), ("fraud",)]
+
+
+@pytest.mark.parametrize("request_", [
+    _Request("fees", k=0),
+    _Request("fees", k=2, filters=["market", "Kenya"]),
+    _Request("fees", k=2, filters={"date_from": "not a date"}),
+    _Request("fees", k=2, vector=np.ones((2, 4), dtype='float32')),
+])
+def test_malformed_requests_are_rejected_before_batching(request_):
+    retriever = FlakyRetriever()
+    batcher = MicroBatcher(retriever, max_batch_size=8, max_wait_ms=50)
+    
+    bad, good = asyncio.run(submit_all(batcher, [request_, _Request("fraud", k=1)]))
+    assert isinstance(bad, (ValueError, TypeError))
+    assert len(good) == 1
+    assert retriever.batches == [["fraud"]]
@@ -0,0 +1,38 @@
+from dataclasses import replace
+
+import pytest
+
+from src.indexer import ComplaintIndexer
+from src.retriever import ComplaintRetriever
+
+
+def build_retriever(config, model, corpus):
+    indexer = ComplaintIndexer(config, model=model)
+    indexer.build_index(corpus)
+    return ComplaintRetriever(model, indexer.index, indexer.metadatas, sparse_index=indexer.sparse_index), indexer
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf_flat", "hnsw"])
+def test_filtered_search_returns_every_match(config, model, corpus, index_type):
+    # One IVF list probed, a tiny HNSW beam: the filtered search must widen itself to find all matches
+    config = replace(config, INDEX_TYPE=index_type, IVF_NLIST=8, IVF_NPROBE=1, HNSW_EF_SEARCH=4)
+    retriever, indexer = build_retriever(config, model, corpus)
+    filters = {"market": "Kenya", "product": "Credit Cards"}
+    expected = {row for row in range(len(indexer.metadatas))
+                if indexer.metadatas[row]["market"] == "Kenya" and indexer.metadatas[row]["product"] == "Credit Cards"}
+    assert expected
+
+    results = retriever.retrieve_chunks("annual fee never disclosed", k=len(expected) + 5, filters=filters)
+    assert {(chunk["metadata"]["market"], chunk["metadata"]["product"]) for chunk in results} == {("Kenya", "Credit Cards")}
+    assert len(results) == len(expected)
+
+
+def test_hybrid_search_applies_filters_to_both_rankings(config, model, corpus):
+    config = replace(config, RETRIEVAL_MODE="hybrid", BM25_MAX_POSTINGS=4)
+    retriever, indexer = build_retriever(config, model, corpus)
+    assert indexer.sparse_index is not None
+    
+    results = retriever.retrieve_chunks("fee charged", k=10, filters={"market": "Uganda", "date_from": "2023-01-01"})
+    assert results
+    assert all(chunk["metadata"]["market"] == "Uganda" and chunk["metadata"]["date"] >= "2023-01-01"
+               for chunk in results)
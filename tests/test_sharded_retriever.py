@@ -0,0 +1,37 @@
+from dataclasses import replace
+
+import pytest
+
+from src.indexer import ComplaintIndexer
+from src.retriever import ComplaintRetriever
+from src.sharded_retriever import ShardedComplaintRetriever
+
+QUERIES = ["annual fee never disclosed", "money transfer pending", "app crashes when paying"]
+
+
+def ranked_ids(chunks):
+    return [chunk["metadata"]["complaint_id"] for chunk in chunks]
+
+
+@pytest.fixture
+def single(config, model, corpus):
+    indexer = ComplaintIndexer(config, model=model)
+    indexer.build_index(corpus)
+    return ComplaintRetriever(model, indexer.index, indexer.metadatas)
+
+
+@pytest.mark.parametrize("shard_by", ["complaint_id", "market"])
+def test_merged_shards_rank_like_one_index(config, model, corpus, single, shard_by):
+    config = replace(config, SHARD_COUNT=3, SHARD_BY=shard_by)
+    ComplaintIndexer(config, model=model).build_shards(corpus)
+    
+    with ShardedComplaintRetriever(model, config) as sharded:
+        assert sharded.layout["num_shards"] == 3
+        for filters in (None, {"market": "Kenya"}, {"product": "Credit Cards", "date_from": "2022-01-01"}):
+            merged = sharded.retrieve_many(QUERIES, 8, [filters] * len(QUERIES))
+            for query, chunks in zip(QUERIES, merged):
+                assert ranked_ids(chunks) == ranked_ids(single.retrieve_chunks(query, 8, filters))
+        
+        if shard_by == "market":
+            # Only the Kenya shard can match
+            assert len(sharded._shards_for({"market": "Kenya"})) == 1
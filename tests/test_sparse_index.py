@@ -0,0 +1,44 @@
+import numpy as np
+
+from src.sparse_index import BM25Builder, BM25Index
+
+
+def build(texts, max_postings=4096):
+    builder = BM25Builder(max_postings=max_postings)
+    builder.add_many(texts)
+    return builder.build()
+
+
+def test_filtered_search_finds_matches_past_the_postings_limit():
+    # Every row mentions "fee"; the only row the filter allows ranks last
+    texts = [f"fee fee fee statement {i}" for i in range(50)] + ["fee charged once with a long explanation"]
+    index = build(texts, max_postings=10)
+    mask = np.zeros(len(texts), dtype=bool)
+    mask[50] = True
+    
+    scores, ids = index.search("fee", 5, candidate_mask=mask)
+    assert ids.tolist() == [50]
+    assert len(index.search("fee", 50)[1]) == 10
+
+
+def test_added_segments_continue_row_ids_and_share_statistics():
+    texts = ["late payment fee", "app crashes on login", "transfer pending for days", "late transfer"]
+    whole = build(texts)
+    split = build(texts[:2])
+    split.add_texts(texts[2:])
+    
+    for query in ("late", "transfer pending", "app"):
+        whole_scores, whole_ids = whole.search(query, 4)
+        split_scores, split_ids = split.search(query, 4)
+        assert split_ids.tolist() == whole_ids.tolist()
+        assert np.allclose(split_scores, whole_scores)
+
+
+def test_saved_index_loads_with_the_same_results(tmp_path):
+    index = build(["late payment fee", "app crashes on login"])
+    index.add_texts(["late transfer"])
+    index.save(str(tmp_path / "bm25"))
+    
+    loaded = BM25Index.load(str(tmp_path / "bm25"))
+    assert len(loaded) == 3
+    assert loaded.search("late", 3)[1].tolist() == index.search("late", 3)[1].tolist()